@@ -3,11 +3,15 @@ import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, storage, firestore
 import os
-import time
+from datetime import timedelta
+from progress_monitor import ProgressMonitor, format_stage_stats
+from document_registry import sha256_of_file, find_processed, link_to_existing
+from resumable_upload import create_session, upload_chunks, UploadSessionExpired
 
 # --- 최종 설정 ---
 #SERVICE_ACCOUNT_FILE = 'serviceAccountKey.json'
 BUCKET_NAME = 'edaero-insight-2026.firebasestorage.app' # RUCAS LEE님의 설정으로 수정했습니다.
+MONITOR_TIMEOUT = 60 * 60  # 진행 상황 모니터링 최대 시간(초)
 # ------------------------------------
 
 # Firebase 초기화 로직 변경
@@ -36,41 +40,82 @@ uploaded_file = st.file_uploader("분석할 PDF 파일을 선택하세요.", typ
 if uploaded_file is not None:
     st.success(f"'{uploaded_file.name}' 파일이 로드되었습니다.")
     
+    force_reprocess = st.checkbox("같은 내용의 파일을 처리한 기록이 있어도 다시 처리하기")
+
     if st.button("🚀 데이터 처리 시작"):
-        # 1. 파일 업로드
-        with st.spinner(f"'{uploaded_file.name}' 파일을 Firebase Storage에 업로드하는 중..."):
+        bucket = storage.bucket()
+        doc_ref = db.collection('progress').document(uploaded_file.name)
+
+        # 0. 내용 해시로 이미 처리된 문서인지 확인 (파일 이름이 달라도 바이트가 같으면 같은 문서)
+        file_hash = sha256_of_file(uploaded_file)
+        existing = None if force_reprocess else find_processed(db, file_hash)
+        if existing:
+            link_to_existing(db, file_hash, uploaded_file.name, existing)
+            st.info(f"♻️ 이미 처리된 문서입니다 ('{existing.get('file_name')}'). 다시 처리하지 않고 기존 결과를 연결했습니다.")
+            result_path = existing.get('result_path')
+            if result_path:
+                try:
+                    result_url = bucket.blob(result_path).generate_signed_url(expiration=timedelta(hours=1))
+                    st.markdown(f"📄 [기존 결과 파일 열기]({result_url})")
+                except Exception:
+                    st.markdown(f"📄 기존 결과 파일: `gs://{bucket.name}/{result_path}`")
+            st.stop()
+
+        # 이전 실행의 진행 문서가 남아 있으면 바로 '완료'로 보일 수 있으므로 먼저 초기화합니다.
+        doc_ref.set({'status': '업로드 중...', 'progress': 0, 'timestamp': firestore.SERVER_TIMESTAMP})
+
+        # 1. 파일 업로드 (청크 단위 재개 가능 업로드)
+        upload_bar = st.progress(0, text=f"'{uploaded_file.name}' 파일을 Firebase Storage에 업로드하는 중...")
+        try:
+            blob = bucket.blob(uploaded_file.name)
+            blob.metadata = {'sha256': file_hash, 'force_reprocess': str(force_reprocess).lower()}
+            total_size = uploaded_file.size
+
+            # 세션 URL을 보관해 두었다가, 업로드가 중간에 실패해 다시 시도하면 이어서 올립니다.
+            sessions = st.session_state.setdefault('upload_sessions', {})
+            session_key = f"{file_hash}:{uploaded_file.name}"
+            if session_key not in sessions:
+                sessions[session_key] = create_session(blob, total_size)
+
+            def show_upload_progress(uploaded, total):
+                upload_bar.progress(int(uploaded / total * 100), text=f"업로드 중... {uploaded / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB")
+
             try:
-                bucket = storage.bucket()
-                blob = bucket.blob(uploaded_file.name)
-                # Streamlit의 UploadedFile 객체를 바이트로 읽어서 업로드
-                uploaded_file.seek(0)
-                blob.upload_from_file(uploaded_file, content_type='application/pdf')
-                st.success("✅ 파일 업로드 성공! Cloud Function이 데이터 처리를 시작할 것입니다 (다음 단계에서 구현).")
-            except Exception as e:
-                st.error(f"파일 업로드 중 오류가 발생했습니다: {e}")
-                st.stop()
+                upload_chunks(sessions[session_key], uploaded_file, total_size, on_progress=show_upload_progress)
+            except UploadSessionExpired:
+                sessions[session_key] = create_session(blob, total_size)
+                upload_chunks(sessions[session_key], uploaded_file, total_size, on_progress=show_upload_progress)
+            sessions.pop(session_key, None)
+            st.success("✅ 파일 업로드 성공! Cloud Function이 데이터 처리를 시작합니다.")
+        except Exception as e:
+            st.error(f"파일 업로드 중 오류가 발생했습니다: {e} (다시 시도하면 업로드된 부분부터 이어서 올립니다.)")
+            st.stop()
 
         st.markdown("---")
         st.subheader("2. 데이터 처리 현황")
 
-        # 2. Firestore에서 진행 상황 실시간 모니터링
+        # 2. Firestore 진행 문서의 변경을 실시간(on_snapshot)으로 받아 표시
         progress_bar = st.progress(0, text="작업 대기 중...")
-        
-        doc_ref = db.collection('progress').document(uploaded_file.name)
+        status_placeholder = st.empty()
+        stats_placeholder = st.empty()
 
-        # 문서가 생성될 때까지 잠시 대기
-        time.sleep(5) 
+        monitor = ProgressMonitor(doc_ref).start()
+        try:
+            for progress_data in monitor.updates(timeout=MONITOR_TIMEOUT):
+                if progress_data is None:
+                    status_placeholder.info("데이터 처리 시작을 기다리는 중입니다...")
+                    continue
 
-        while True:
-            doc = doc_ref.get()
-            if doc.exists:
-                progress_data = doc.to_dict()
                 progress = progress_data.get('progress', 0)
                 status = progress_data.get('status', '상태 정보 없음')
-                
+                stage_stats = format_stage_stats(progress_data)
+                if stage_stats:
+                    stats_placeholder.caption(" · ".join(stage_stats))
+
                 if progress >= 0:
-                    progress_bar.progress(progress, text=status)
-                else: 
+                    status_placeholder.empty()
+                    progress_bar.progress(min(progress, 100), text=status)
+                else:
                     progress_bar.progress(100, text="오류 발생")
                     st.error(status)
                     break
@@ -79,6 +124,6 @@ if uploaded_file is not None:
                     st.success("🎉 모든 작업이 성공적으로 완료되었습니다!")
                     break
             else:
-                st.info("데이터 처리 시작을 기다리는 중입니다...")
-            
-            time.sleep(2)
\ No newline at end of file
+                st.warning("진행 상황 모니터링 시간이 초과되었습니다. 잠시 후 페이지를 새로고침해주세요.")
+        finally:
+            monitor.stop()
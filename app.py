@@ -4,6 +4,8 @@ import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 import streamlit as st
 import chatbot_engine
+import tracing
+from rate_scheduler import Overloaded
 
 # --- 설정 ---
 PDF_URL = "https://firebasestorage.googleapis.com/v0/b/edaero-insight-2026.firebasestorage.app/o/2026_%EC%84%9C%EC%9A%B8%EC%8B%9C%EB%A6%BD%EB%8C%80%ED%95%99%EA%B5%90_%EC%A0%95%EC%8B%9C.pdf?alt=media&token=ccf53490-8cdd-469e-ae70-47ead5664dbc"
@@ -12,18 +14,51 @@ PDF_URL = "https://firebasestorage.googleapis.com/v0/b/edaero-insight-2026.fireb
 st.set_page_config(page_title="edaeroAI", layout="wide")
 st.title("🤖 edaeroAI - 대학추천 AI 컨설턴트")
 
-# AI 리소스 로딩
-structured_collection, raw_collection, genai_alias = chatbot_engine.load_ai_resources()
+# --- 점수 시뮬레이터 (사이드바) ---
+score_simulator = chatbot_engine.load_score_simulator()
+with st.sidebar:
+    st.header("📊 내 점수로 어디가 유리할까?")
+    if score_simulator is None:
+        st.info("점수 시뮬레이터 데이터가 없습니다. build_score_matrix.py를 먼저 실행해주세요.")
+    else:
+        with st.form("score_simulator"):
+            st.caption("과목별 백분위(0~100)를 입력하세요. 응시하지 않은 과목은 비워두세요.")
+            student_scores = {}
+            for subject in score_simulator.subjects:
+                value = st.number_input(subject, min_value=0.0, max_value=100.0, value=None, step=1.0)
+                if value is not None:
+                    student_scores[subject] = value
+            top_k = st.slider("표시할 학과 수", min_value=5, max_value=50, value=20)
+            submitted = st.form_submit_button("환산 점수 계산")
+
+        if submitted:
+            results = chatbot_engine.simulate_admission_scores(student_scores, score_simulator, top_k=top_k)
+            if results:
+                st.dataframe(
+                    [{"대학": r["university"], "학과": r["major"], "모집군": r["recruitment_unit"],
+                      "전형": r["selection_category"], "환산 점수": r["score"]} for r in results],
+                    hide_index=True,
+                )
+            else:
+                st.warning("입력한 과목으로 계산할 수 있는 학과가 없습니다.")
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "conversation" not in st.session_state:
+    # 직전 질문의 학과와 검색 결과를 기억해 후속 질문("그럼 수능 반영비율은?")에 다시 씁니다.
+    st.session_state.conversation = chatbot_engine.ConversationState()
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
+# 첫 화면을 그린 뒤 chromadb와 모델 클라이언트를 백그라운드에서 미리 불러옵니다.
+chatbot_engine.preload_ai_resources()
+
 if prompt := st.chat_input("입시 요강에 대해 무엇이든 물어보세요."):
-    if not all([structured_collection, raw_collection, genai_alias]):
+    # DB 연결은 질문을 받았을 때만 합니다. (사이드바 계산 등 다른 재실행에서는 건너뜀)
+    structured_collection, raw_collection, provider = chatbot_engine.load_ai_resources()
+    if not all([structured_collection, raw_collection, provider]):
         st.error("AI 리소스 로딩에 실패했습니다. 환경 변수와 DB 경로를 확인해주세요.")
     else:
         st.session_state.messages.append({"role": "user", "content": prompt})
@@ -32,7 +67,12 @@ if prompt := st.chat_input("입시 요강에 대해 무엇이든 물어보세요
 
         with st.chat_message("assistant"):
             with st.spinner("edaeroAI가 분석 중입니다..."):
-                response_stream, sources = chatbot_engine.get_ai_response(prompt, structured_collection, raw_collection, genai_alias)
+                try:
+                    response_stream, sources = chatbot_engine.get_ai_response(
+                        prompt, structured_collection, raw_collection, provider, state=st.session_state.conversation)
+                except Overloaded as e:
+                    # 문서 수집 등으로 요청 한도가 꽉 찬 경우, 오래 기다리게 하지 않고 바로 안내합니다.
+                    response_stream, sources = iter([f"⚠️ {e}"]), []
                 
                 # --- 👇 여기가 핵심적인 변경 사항입니다! 👇 ---
                 # st.write_stream 대신 수동으로 스트림을 처리합니다.
@@ -40,7 +80,7 @@ if prompt := st.chat_input("입시 요강에 대해 무엇이든 물어보세요
                 full_response = ""
                 try:
                     for chunk in response_stream:
-                        full_response += chunk.text
+                        full_response += chunk
                         message_placeholder.markdown(full_response + "▌")
                     message_placeholder.markdown(full_response)
                 except Exception as e:
@@ -57,7 +97,11 @@ if prompt := st.chat_input("입시 요강에 대해 무엇이든 물어보세요
                         if page_number:
                             link = f"{PDF_URL}#page={page_number}"
                             source_info += f"- [{source['text']}]({link})\n"
+                            if source.get("excerpt"):
+                                # 페이지 저장소에서 읽은 원문 일부를 출처 바로 아래에 보여줍니다.
+                                source_info += f"    > {source['excerpt']}\n"
                     st.markdown(source_info)
                     response_text += source_info
 
-        st.session_state.messages.append({"role": "assistant", "content": response_text})
\ No newline at end of file
+        st.session_state.messages.append({"role": "assistant", "content": response_text})
+        tracing.flush()
\ No newline at end of file
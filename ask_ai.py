@@ -1,13 +1,13 @@
-import os
 import json
 import chromadb
-import google.generativeai as genai
+import collection_alias
+import model_provider
+from rate_scheduler import INTERACTIVE
 
 # --- 설정 ---
 DB_PATH = "chroma_db"
 STRUCTURED_COLLECTION = "structured_data"
 RAW_COLLECTION = "raw_chunks_semantic"
-EMBEDDING_MODEL = 'models/text-embedding-004'
 GENERATIVE_MODEL = 'gemini-2.5-flash'
 KEYWORD_MODEL = 'gemini-2.5-flash'
 # ------------------------------------
@@ -15,8 +15,7 @@ KEYWORD_MODEL = 'gemini-2.5-flash'
 def initialize_services():
     """API 키 서비스를 초기화합니다."""
     try:
-        GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-        genai.configure(api_key=GOOGLE_API_KEY)
+        model_provider.get_provider()
         print("✅ Gemini API 키가 성공적으로 설정되었습니다.")
         return True
     except KeyError:
@@ -25,11 +24,12 @@ def initialize_services():
 
 def main():
     """하이브리드 검색(Python 필터링+벡터)을 사용하는 챗봇 메인 함수"""
+    provider = model_provider.get_provider()
     client = chromadb.PersistentClient(path=DB_PATH)
     
     try:
-        structured_collection = client.get_collection(name=STRUCTURED_COLLECTION)
-        raw_collection = client.get_collection(name=RAW_COLLECTION)
+        structured_collection = collection_alias.open_collection(client, DB_PATH, STRUCTURED_COLLECTION)
+        raw_collection = collection_alias.open_collection(client, DB_PATH, RAW_COLLECTION)
         # (NEW) 시작할 때 구조화된 DB 전체를 미리 불러옵니다.
         print("사전 데이터 로딩 중...")
         all_structured_data = structured_collection.get()
@@ -51,14 +51,13 @@ def main():
             break
 
         # 1. Gemini를 이용해 질문에서 '학과명' 키워드 추출
-        keyword_extractor_model = genai.GenerativeModel(KEYWORD_MODEL)
         keyword_prompt = f"다음 질문에서 대학 '학과명' 또는 '전공명'을 정확히 하나만 추출해줘. 만약 학과명이 언급되지 않았다면, '없음'이라고만 대답해줘. 질문: \"{query}\""
-        response = keyword_extractor_model.generate_content(keyword_prompt)
+        response = provider.generate(keyword_prompt, model=KEYWORD_MODEL, priority=INTERACTIVE)
         major_keyword = response.text.strip().replace(".", "")
         print(f"--- [디버깅] 추출된 학과 키워드: {major_keyword} ---")
 
         # 2. 키워드 존재 여부에 따라 검색 전략 변경
-        query_embedding = genai.embed_content(model=EMBEDDING_MODEL, content=query, task_type="retrieval_query")['embedding']
+        query_embedding = provider.embed(query, task_type="retrieval_query", priority=INTERACTIVE)
 
         if major_keyword != "없음":
             print("--- [디버깅] '정확 검색(Python 필터링)'을 수행합니다. ---")
@@ -118,8 +117,7 @@ def main():
         """
         
         # 5. Gemini 모델을 통해 최종 답변 생성
-        model = genai.GenerativeModel(GENERATIVE_MODEL)
-        final_response = model.generate_content(prompt)
+        final_response = provider.generate(prompt, model=GENERATIVE_MODEL, priority=INTERACTIVE)
 
         print("\n[edaeroAI]:")
         print(final_response.text)
@@ -0,0 +1,209 @@
+# benchmark.py
+"""
+Gemini 호출 없이 edaeroAI 파이프라인의 속도를 측정하는 오프라인 벤치마크입니다.
+
+저장소에 포함된 원본 텍스트/최종 JSON을 학과 정보 추출 → DB 구축 → 질의응답 단계에 그대로 흘려보내고,
+생성/임베딩은 지연 시간을 설정할 수 있는 오프라인 백엔드(model_provider.OfflineProvider)로 대체합니다.
+결과는 커밋 간 비교가 가능하도록 JSON 파일로 저장합니다.
+
+사용 예:
+    python benchmark.py --users 1 4 8 --gen-latency 0.2 --output bench_new.json --compare bench_old.json
+"""
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import model_provider
+import tracing
+
+# --- 설정 ---
+RAW_TEXT_FILE = 'result_2026_서울시립대학교_정시_raw_text_v4.txt'
+FINAL_JSON_FILE = 'result_2026_서울시립대학교_정시_final.json'
+DEFAULT_OUTPUT = 'benchmark_results.json'
+QUESTIONS = [
+    "행정학과 정시 모집인원은 몇 명이야?",
+    "컴퓨터과학부 수능 반영비율 알려줘",
+    "경영학부는 몇 군에서 뽑아?",
+    "원서접수 기간이 언제야?",
+    "음악학과 피아노전공 실기고사는 어떻게 봐?",
+    "영어 등급별 점수는 어떻게 반영돼?",
+    "기회균형전형 지원 자격이 뭐야?",
+    "전자전기컴퓨터공학부 수학 반영비율은?",
+]
+# ------------------------------------
+
+
+# --- 측정 도우미 ---
+
+def percentile(values, q):
+    """nearest-rank 방식의 백분위수"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(durations_ms):
+    return {
+        "count": len(durations_ms),
+        "p50_ms": round(percentile(durations_ms, 50), 3),
+        "p95_ms": round(percentile(durations_ms, 95), 3),
+        "mean_ms": round(sum(durations_ms) / len(durations_ms), 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+# --- 단계별 벤치마크 ---
+
+def load_pipeline_modules(provider, db_path):
+    """파이프라인 모듈을 불러와 모델 제공자와 DB 경로를 오프라인 백엔드/임시 디렉토리로 바꿉니다."""
+    # build_raw_db.py는 import 시점에 제공자를 만들므로, 그 전에 오프라인 백엔드를 지정합니다.
+    model_provider.set_provider(provider)
+    import main as ingestion
+    import build_raw_db
+    import build_structured_db
+    import chatbot_engine
+
+    build_raw_db.provider = provider
+    build_raw_db.DB_PATH = build_structured_db.DB_PATH = chatbot_engine.DB_PATH = db_path
+    build_raw_db.COLLECTION_NAME = chatbot_engine.RAW_COLLECTION
+    build_raw_db.RAW_TEXT_FILE = RAW_TEXT_FILE
+    build_structured_db.FINAL_JSON_FILE = FINAL_JSON_FILE
+    return ingestion, build_raw_db, build_structured_db, chatbot_engine
+
+
+def run_query(chatbot_engine, provider, structured_collection, raw_collection, query):
+    """질문 하나를 처리하고 (첫 토큰까지 걸린 시간, 전체 시간)을 ms 단위로 반환합니다."""
+    start = time.perf_counter()
+    response_stream, _ = chatbot_engine.get_ai_response(query, structured_collection, raw_collection, provider)
+    first_token = None
+    for _ in response_stream:
+        if first_token is None:
+            first_token = (time.perf_counter() - start) * 1000
+    return first_token, (time.perf_counter() - start) * 1000
+
+
+def run_benchmark(args):
+    provider = model_provider.OfflineProvider(args.gen_latency, args.embed_latency, args.chunk_latency, args.stream_chunks)
+    if args.trace:
+        tracing.enable()
+        tracing.reset()
+    db_path = tempfile.mkdtemp(prefix="edaero_bench_")
+    stages = {}
+    try:
+        ingestion, build_raw_db, build_structured_db, chatbot_engine = load_pipeline_modules(provider, db_path)
+        with open(RAW_TEXT_FILE, 'r', encoding='utf-8') as f:
+            full_text = f.read()
+
+        print("🧪 [1/3] 수집 단계 (학과 정보 추출) 측정 중...")
+        stages["ingest_department_info"] = []
+        for _ in range(args.repeat):
+            department_info, elapsed = timed(ingestion.structure_department_info_by_chunks, full_text, None, "benchmark.pdf")
+            stages["ingest_department_info"].append(elapsed)
+        print(f"  - 추출된 학과 수: {len(department_info)}")
+
+        print("🧪 [2/3] DB 구축 단계 측정 중...")
+        stages["index_raw"], stages["index_structured"] = [], []
+        for _ in range(args.repeat):
+            stages["index_raw"].append(timed(build_raw_db.build_raw_chunks_db)[1])
+            stages["index_structured"].append(timed(build_structured_db.build_structured_db)[1])
+
+        print("🧪 [3/3] 질의응답 단계 측정 중...")
+        structured_collection, raw_collection, _ = chatbot_engine.load_ai_resources()
+        concurrency = []
+        stages["query_first_token"], stages["query_total"] = [], []
+        for users in args.users:
+            workload = QUESTIONS * args.rounds
+            wall_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=users) as pool:
+                results = list(pool.map(
+                    lambda q: run_query(chatbot_engine, provider, structured_collection, raw_collection, q),
+                    [q for _ in range(users) for q in workload],
+                ))
+            wall = time.perf_counter() - wall_start
+            totals = [r[1] for r in results]
+            if users == 1:
+                stages["query_first_token"].extend(r[0] for r in results)
+                stages["query_total"].extend(totals)
+            concurrency.append({
+                "users": users,
+                "queries": len(results),
+                "wall_s": round(wall, 3),
+                "throughput_qps": round(len(results) / wall, 3),
+                **{k: v for k, v in summarize(totals).items() if k != "count"},
+            })
+            print(f"  - 동시 사용자 {users}명: {len(results) / wall:.2f} 질문/초")
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "stages": {name: summarize(values) for name, values in stages.items() if values},
+        "concurrency": concurrency,
+    }
+    if args.trace:
+        # get_ai_response 등 내부의 세부 단계(키워드 추출, 임베딩, Chroma 검색 ...)별 집계
+        result["spans"] = tracing.summary()
+    return result
+
+
+def print_report(result, baseline=None):
+    print(f"\n--- 벤치마크 결과 (commit {result['commit']}) ---")
+    for name, stats in result["stages"].items():
+        line = f"{name:<24} p50 {stats['p50_ms']:>10.1f}ms   p95 {stats['p95_ms']:>10.1f}ms"
+        if baseline and name in baseline.get("stages", {}):
+            before = baseline["stages"][name]["p50_ms"]
+            line += f"   (p50 {((stats['p50_ms'] - before) / before * 100) if before else 0:+.1f}% vs {baseline['commit']})"
+        print(line)
+    for name, stats in result.get("spans", {}).items():
+        print(f"  span {name:<28} x{stats['count']:<5} mean {stats['mean_ms']:>9.2f}ms")
+    for row in result["concurrency"]:
+        print(f"users={row['users']:<3} {row['throughput_qps']:>8.2f} q/s   p50 {row['p50_ms']:.1f}ms   p95 {row['p95_ms']:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="edaeroAI 오프라인 지연 시간 벤치마크")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 8], help="동시 사용자 수 목록")
+    parser.add_argument("--rounds", type=int, default=1, help="사용자당 질문 세트 반복 횟수")
+    parser.add_argument("--repeat", type=int, default=1, help="수집/DB 구축 단계 반복 횟수")
+    parser.add_argument("--gen-latency", type=float, default=0.0, help="생성 호출 1회당 주입할 지연(초)")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="임베딩 호출 1회당 주입할 지연(초)")
+    parser.add_argument("--chunk-latency", type=float, default=0.0, help="스트리밍 청크당 주입할 지연(초)")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="스트리밍 응답을 나눌 청크 수")
+    parser.add_argument("--trace", action="store_true", help="tracing span 집계를 결과에 포함")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="결과 JSON 파일 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    print(f"\n✨ 결과가 '{args.output}' 파일로 저장되었습니다.")
+
+if __name__ == "__main__":
+    sys.exit(main())
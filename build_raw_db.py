@@ -1,48 +1,56 @@
 # build_raw_db.py
-import os
-import re
 import chromadb
-import google.generativeai as genai
+import collection_alias
+import model_provider
+import page_store
+import tracing
 
 # --- 설정 ---
 RAW_TEXT_FILE = 'result_2026_서울시립대학교_정시_raw_text_v4.txt' # main.py 실행 후 생성된 파일
 DB_PATH = "chroma_db"
-COLLECTION_NAME = "raw_chunks" # 새로운 컬렉션 이름
-EMBEDDING_MODEL = 'models/text-embedding-004'
+COLLECTION_NAME = "raw_chunks" # 새로운 컬렉션 이름 (별칭, 실제 컬렉션은 버전별로 새로 만듭니다)
 # ------------------------------------
 
 try:
-    GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-    genai.configure(api_key=GOOGLE_API_KEY)
+    provider = model_provider.get_provider()
 except KeyError:
     print("❌ 에러: GOOGLE_API_KEY 환경 변수를 설정해주세요.")
     exit()
 
 def build_raw_chunks_db():
     print(f"'{RAW_TEXT_FILE}' 파일을 읽어 원본 텍스트 DB를 구축합니다...")
-    with open(RAW_TEXT_FILE, 'r', encoding='utf-8') as f:
-        full_text = f.read()
-        
-    pages = re.split(r'--- Page \d+ ---', full_text)
-    documents = [p.strip() for p in pages if p.strip()]
-    metadatas = [{"source_page": i+1} for i in range(len(documents))]
-    ids = [f"page_{i+1}" for i in range(len(documents))]
+    with tracing.span("build.read", file=RAW_TEXT_FILE) as s:
+        with open(RAW_TEXT_FILE, 'r', encoding='utf-8') as f:
+            full_text = f.read()
+            
+        # 빈 페이지를 빼도 출처가 어긋나지 않도록 원래 페이지 번호를 그대로 씁니다.
+        pages = page_store.split_pages(full_text)
+        documents = [text for _, text in pages]
+        s.set(chars=len(full_text), documents=len(documents))
+    metadatas = [{"source_page": num} for num, _ in pages]
+    ids = [f"page_{num}" for num, _ in pages]
 
     client = chromadb.PersistentClient(path=DB_PATH)
-    # get_or_create_collection을 사용하면 기존에 있어도 오류 없이 가져옵니다.
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    # 새 버전 컬렉션을 다 채운 뒤에 별칭을 바꾸므로, 구축하는 동안에도 채팅은 이전 버전을 조회합니다.
+    collection = collection_alias.create_version(client, COLLECTION_NAME)
     
-    print(f"'{COLLECTION_NAME}' 컬렉션에 페이지별 텍스트 임베딩 및 추가를 시작합니다...")
-    embeddings = genai.embed_content(
-        model=EMBEDDING_MODEL, content=documents, task_type="retrieval_document"
-    )
+    print(f"'{collection.name}' 컬렉션에 페이지별 텍스트 임베딩 및 추가를 시작합니다...")
+    with tracing.span("build.embed", documents=len(documents), chars=sum(len(d) for d in documents)):
+        embeddings = provider.embed(documents, task_type="retrieval_document")
     
-    # id가 이미 존재할 경우를 대비해 upsert 사용
-    collection.upsert(
-        embeddings=embeddings['embedding'], documents=documents, metadatas=metadatas, ids=ids
-    )
+    with tracing.span("build.upsert", documents=len(documents)):
+        collection.add(
+            embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids
+        )
+
+    previous, removed = collection_alias.promote(client, DB_PATH, COLLECTION_NAME, collection.name)
+    print(f"🔀 '{COLLECTION_NAME}' 별칭을 '{previous or COLLECTION_NAME}' → '{collection.name}'(으)로 교체했습니다.")
+    if removed:
+        print(f"🧹 오래된 버전 {len(removed)}개를 삭제했습니다: {', '.join(removed)}")
     
     print(f"✨ '{COLLECTION_NAME}' DB 구축 완료! 총 {collection.count()}개의 페이지가 저장되었습니다.")
 
 if __name__ == "__main__":
-    build_raw_chunks_db()
\ No newline at end of file
+    with tracing.span("build.raw_db"):
+        build_raw_chunks_db()
+    tracing.flush()
\ No newline at end of file
@@ -0,0 +1,29 @@
+# build_score_matrix.py
+import glob
+from score_simulator import SCORE_MATRIX_FILE, SUBJECTS, build_weight_matrix, save_weight_matrix
+
+# --- 설정 ---
+# main.py를 통해 생성된 모든 대학의 최종 JSON 파일을 한번에 읽습니다.
+FINAL_JSON_PATTERN = 'result_*_final.json'
+# ------------------------------------
+
+def build_score_matrix():
+    """모든 결과 JSON의 수능 반영비율을 '학과 × 과목' 가중치 행렬로 만들어 저장합니다."""
+    result_files = sorted(glob.glob(FINAL_JSON_PATTERN))
+    if not result_files:
+        print(f"❌ 에러: '{FINAL_JSON_PATTERN}' 패턴에 맞는 파일을 찾을 수 없습니다.")
+        return
+
+    print(f"총 {len(result_files)}개의 결과 파일에서 수능 반영비율을 분석합니다...")
+    weights, labels, skipped, incomplete = build_weight_matrix(result_files)
+    save_weight_matrix(SCORE_MATRIX_FILE, weights, labels)
+
+    print(f"  - 반영비율 해석 실패로 제외된 항목: {skipped}개")
+    if incomplete:
+        print(f"  - ❗️ 과목별 반영비율의 합이 100%가 아니어서 제외된 항목: {len(incomplete)}개")
+        for major, total in incomplete:
+            print(f"      {major}: 합계 {total:g}%")
+    print(f"✨ '{SCORE_MATRIX_FILE}' 생성 완료! {weights.shape[0]}개 학과 × {len(SUBJECTS)}개 과목 ({', '.join(SUBJECTS)})")
+
+if __name__ == "__main__":
+    build_score_matrix()
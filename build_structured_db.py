@@ -1,21 +1,27 @@
 import os
 import json
+import argparse
 import chromadb
-import google.generativeai as genai
+import canonicalize
+import collection_alias
+import model_provider
+import record_stream
+import tracing
 
 # --- 설정 ---
 # main.py를 통해 최종 생성된 JSON 파일의 정확한 이름을 입력해주세요.
 FINAL_JSON_FILE = 'result_2026_서울시립대학교_정시_final.json' 
+# canonicalize.py로 중복을 합친 파일(result_..._canonical.json)이 있으면 그 파일을 우선 사용합니다.
 DB_PATH = "chroma_db"
-COLLECTION_NAME = "structured_data" # 구조화된 데이터 전용 컬렉션
-EMBEDDING_MODEL = 'models/text-embedding-004'
+COLLECTION_NAME = "structured_data" # 구조화된 데이터 전용 컬렉션 (별칭, 실제 컬렉션은 버전별로 새로 만듭니다)
+BATCH_SIZE = 100
+SERVICE_ACCOUNT_FILE = 'serviceAccountKey.json'  # --follow gs://... 로 Storage 스트림을 따라갈 때 사용
 # ------------------------------------
 
 def initialize_services():
     """API 키 서비스를 초기화합니다."""
     try:
-        GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-        genai.configure(api_key=GOOGLE_API_KEY)
+        model_provider.get_provider()
         print("✅ Gemini API 키가 성공적으로 설정되었습니다.")
         return True
     except KeyError:
@@ -26,12 +32,16 @@ def initialize_services():
 
 def build_structured_db():
     """JSON 파일을 읽어 '시맨틱 컨텍스트'를 포함한 구조화된 DB를 구축합니다."""
-    print(f"'{FINAL_JSON_FILE}' 파일을 읽어 구조화된 DB를 구축합니다...")
+    source_file = canonicalize.canonical_path(FINAL_JSON_FILE)
+    if not os.path.exists(source_file):
+        print(f"❗️ '{source_file}' 파일이 없어 중복 병합 전 파일을 사용합니다. (python canonicalize.py로 생성)")
+        source_file = FINAL_JSON_FILE
+    print(f"'{source_file}' 파일을 읽어 구조화된 DB를 구축합니다...")
     try:
-        with open(FINAL_JSON_FILE, 'r', encoding='utf-8') as f:
+        with open(source_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
     except FileNotFoundError:
-        print(f"❌ 에러: '{FINAL_JSON_FILE}' 파일을 찾을 수 없습니다. 파일 이름을 확인해주세요.")
+        print(f"❌ 에러: '{source_file}' 파일을 찾을 수 없습니다. 파일 이름을 확인해주세요.")
         return
 
     department_info = data.get("department_info", [])
@@ -39,16 +49,35 @@ def build_structured_db():
         print("❌ JSON 파일에서 'department_info' 데이터를 찾을 수 없습니다.")
         return
 
-    client = chromadb.PersistentClient(path=DB_PATH)
-    
-    if COLLECTION_NAME in [c.name for c in client.list_collections()]:
-        client.delete_collection(name=COLLECTION_NAME)
-        print(f"기존 '{COLLECTION_NAME}' 컬렉션을 삭제했습니다.")
-    collection = client.create_collection(name=COLLECTION_NAME)
+    provider = model_provider.get_provider()
+    client, collection = _new_version()
+    print(f"'{collection.name}' 컬렉션에 총 {len(department_info)}개의 데이터 임베딩 및 추가를 시작합니다...")
     
-    documents, metadatas, ids = [], [], []
-    for i, item in enumerate(department_info):
-    # 검색을 위한 '핵심 키워드'만으로 document를 구성합니다.
+    for i in range(0, len(department_info), BATCH_SIZE):
+        index_records(collection, provider, department_info[i:i+BATCH_SIZE], start_id=i)
+        print(f"  - {i+len(department_info[i:i+BATCH_SIZE])}/{len(department_info)}개 문서 처리 완료...")
+
+    _promote(client, collection)
+    print(f"\n✨ '{COLLECTION_NAME}' DB 구축 완료! 총 {collection.count()}개의 학과 정보가 저장되었습니다.")
+
+def _new_version():
+    """새 버전 컬렉션을 만듭니다. 다 채우기 전까지 채팅은 계속 이전 버전을 조회합니다."""
+    client = chromadb.PersistentClient(path=DB_PATH)
+    return client, collection_alias.create_version(client, COLLECTION_NAME)
+
+def _promote(client, collection):
+    """별칭을 새 버전으로 바꾸고 오래된 버전을 정리합니다."""
+    previous, removed = collection_alias.promote(client, DB_PATH, COLLECTION_NAME, collection.name)
+    print(f"🔀 '{COLLECTION_NAME}' 별칭을 '{previous or COLLECTION_NAME}' → '{collection.name}'(으)로 교체했습니다.")
+    if removed:
+        print(f"🧹 오래된 버전 {len(removed)}개를 삭제했습니다: {', '.join(removed)}")
+
+def index_records(collection, provider, records, start_id=0, ids=None):
+    """학과 레코드들을 임베딩하여 컬렉션에 추가합니다. id는 start_id부터 차례로 붙습니다. (ids를 주면 그 id로 덮어씀)"""
+    documents, metadatas = [], []
+    ids = ids or [f"dept_{i}" for i in range(start_id, start_id + len(records))]
+    for item in records:
+        # 검색을 위한 '핵심 키워드'만으로 document를 구성합니다.
         content = (
             f"학과명: {item.get('major') or ''}. "
             f"모집단위: {item.get('recruitment_unit') or ''}. "
@@ -59,30 +88,94 @@ def build_structured_db():
         # 답변 생성을 위한 전체 데이터는 metadata에 보관합니다.
         safe_item = {str(k): str(v or '') for k, v in item.items()}
         metadatas.append(safe_item)
-        ids.append(f"dept_{i}")
 
-    print(f"'{COLLECTION_NAME}' 컬렉션에 총 {len(documents)}개의 데이터 임베딩 및 추가를 시작합니다...")
+    with tracing.span("build.embed", documents=len(documents), chars=sum(len(d) for d in documents)):
+        embeddings = provider.embed(documents, task_type="retrieval_document")
     
-    batch_size = 100
-    for i in range(0, len(documents), batch_size):
-        batch_documents = documents[i:i+batch_size]
-        batch_metadatas = metadatas[i:i+batch_size]
-        batch_ids = ids[i:i+batch_size]
-
-        embeddings = genai.embed_content(
-            model=EMBEDDING_MODEL, content=batch_documents, task_type="retrieval_document"
+    with tracing.span("build.upsert", documents=len(documents)):
+        collection.upsert(
+            embeddings=embeddings, 
+            documents=documents, 
+            metadatas=metadatas, 
+            ids=ids
         )
-        
-        collection.add(
-            embeddings=embeddings['embedding'], 
-            documents=batch_documents, 
-            metadatas=batch_metadatas, 
-            ids=batch_ids
-        )
-        print(f"  - {i+len(batch_documents)}/{len(documents)}개 문서 처리 완료...")
 
+def _open_stream(source):
+    """로컬 NDJSON 경로는 그대로, 'gs://버킷/경로'는 Storage blob으로 엽니다."""
+    if not source.startswith("gs://"):
+        return source
+    from google.cloud import storage
+    bucket_name, blob_name = source[len("gs://"):].split("/", 1)
+    client = storage.Client.from_service_account_json(SERVICE_ACCOUNT_FILE)
+    return client.bucket(bucket_name).blob(blob_name)
+
+def follow_structured_db(source, poll_interval=record_stream.POLL_INTERVAL):
+    """main.py가 쓰고 있는 NDJSON 스트림을 따라가며, 도착한 학과 레코드부터 임베딩하여 DB에 추가합니다.
+
+    새 레코드가 BATCH_SIZE만큼 쌓이거나 스트림이 잠시 멈추면 그때까지 쌓인 레코드를 바로 새 버전 컬렉션에 색인하므로,
+    임베딩이 추출과 함께 진행됩니다. build_structured_db()가 읽는 canonical JSON과 같도록, 색인할 때마다
+    지금까지 받은 레코드 전체를 canonicalize.py로 다시 정규화하고 바뀐 레코드만 다시 임베딩합니다.
+
+    별칭은 스트림 끝('_eof')까지 모두 색인한 뒤에 교체하며, 그 전까지 채팅은 이전 버전을 그대로 조회합니다.
+    ('_eof' 전에 중단되면 별칭과 이전 버전 모두 그대로 남습니다.)
+    """
+    print(f"'{source}' 스트림을 따라가며 구조화된 DB를 구축합니다... (Ctrl+C로 중단)")
+    provider = model_provider.get_provider()
+    client, collection = _new_version()
+
+    received, indexed, new = [], {}, 0
+    try:
+        for record in record_stream.follow_records(_open_stream(source), poll_interval=poll_interval):
+            if record is not None and not record_stream.is_control(record):
+                received.append(record)
+                new += 1
+            if new and (record is None or new >= BATCH_SIZE):
+                _sync_records(collection, provider, indexed, received)
+                new = 0
+                print(f"  - 지금까지 {len(received)}개 레코드 수신, 중복을 합친 {len(indexed)}개 학과 색인 완료...")
+    except record_stream.StreamAborted as e:
+        print(f"❌ {e}")
+        print(f"   '{collection.name}'은(는) 별칭으로 교체하지 않았습니다. 채팅은 이전 버전을 계속 조회합니다.")
+        return
+    if new:
+        _sync_records(collection, provider, indexed, received)
+
+    # follow_records는 '_eof' 줄을 만났을 때만 정상 종료하므로, 여기서 교체하면 다 채운 버전만 서비스됩니다.
+    _promote(client, collection)
+
+    # 채팅이 질문에서 학과명을 찾을 때 쓰는 별칭 표도 이번 스트림 기준으로 바꿉니다.
+    canonicalize.save_alias_table(canonicalize.ALIAS_TABLE_FILE, _alias_table(received))
     print(f"\n✨ '{COLLECTION_NAME}' DB 구축 완료! 총 {collection.count()}개의 학과 정보가 저장되었습니다.")
 
+def _alias_table(records):
+    return canonicalize.build_alias_table(r.get('major') for r in records)
+
+def _sync_records(collection, provider, indexed, received):
+    """받은 레코드 전체를 정규화(학과명 별칭 통일 + (학과, 모집군, 전형) 병합)하여 컬렉션과 맞춥니다.
+
+    indexed는 {위치: 색인한 레코드}입니다. 새로 생기거나 병합으로 바뀐 위치만 다시 임베딩하고,
+    병합으로 줄어든 뒤쪽 위치는 지웁니다.
+    """
+    records = canonicalize.canonicalize_records(received, _alias_table(received))
+    changed = [i for i, record in enumerate(records) if indexed.get(i) != record]
+    for start in range(0, len(changed), BATCH_SIZE):
+        batch = changed[start:start + BATCH_SIZE]
+        index_records(collection, provider, [records[i] for i in batch], ids=[f"dept_{i}" for i in batch])
+    stale = [f"dept_{i}" for i in indexed if i >= len(records)]
+    if stale:
+        collection.delete(ids=stale)
+    indexed.clear()
+    indexed.update(enumerate(records))
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="학과별 정보로 구조화된 DB를 구축합니다.")
+    parser.add_argument("--follow", metavar="NDJSON", help="추출 중인 NDJSON 스트림(로컬 경로 또는 gs://버킷/경로)을 따라가며 색인")
+    args = parser.parse_args()
+
     if initialize_services():
-        build_structured_db()
\ No newline at end of file
+        with tracing.span("build.structured_db"):
+            if args.follow:
+                follow_structured_db(args.follow)
+            else:
+                build_structured_db()
+        tracing.flush()
\ No newline at end of file
@@ -1,19 +1,17 @@
-import os
 import json
 import chromadb
-import google.generativeai as genai
+import model_provider
+import tracing
 
 # --- 설정 ---
 JSON_FILE_PATH = 'result_2026_서울대학교_정시.json'
 DB_PATH = "chroma_db"
 COLLECTION_NAME = "admissions_2026"
-EMBEDDING_MODEL = 'models/text-embedding-004'
 # ------------------------------------
 
 # 1. API 키 설정
 try:
-    GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-    genai.configure(api_key=GOOGLE_API_KEY)
+    provider = model_provider.get_provider()
     print("✅ Gemini API 키가 성공적으로 설정되었습니다.")
 except KeyError:
     print("❌ 에러: GOOGLE_API_KEY 환경 변수를 설정해주세요.")
@@ -69,28 +67,28 @@ def build_vector_db():
 
     # 3. 데이터 임베딩 및 DB에 추가
     # Gemini API를 사용하여 documents 리스트 전체를 한번에 임베딩
-    embeddings = genai.embed_content(
-        model=EMBEDDING_MODEL,
-        content=documents,
-        task_type="retrieval_document" # 문서 검색용 임베딩
-    )
+    with tracing.span("build.embed", documents=len(documents), chars=sum(len(d) for d in documents)):
+        embeddings = provider.embed(documents, task_type="retrieval_document") # 문서 검색용 임베딩
 
     # --- 👇 여기에 디버깅 코드를 추가해주세요 👇 ---
     print("\n--- 디버깅 정보 ---")
     print(f"ID 리스트 길이: {len(ids)}")
     print(f"메타데이터 리스트 길이: {len(metadatas)}")
     print(f"문서 리스트 길이: {len(documents)}")
-    print(f"임베딩 리스트 길이: {len(embeddings['embedding'])}")
+    print(f"임베딩 리스트 길이: {len(embeddings)}")
     print("--------------------\n")
 
-    collection.add(
-        embeddings=embeddings['embedding'],
-        documents=documents,
-        metadatas=metadatas,
-        ids=ids
-    )
+    with tracing.span("build.upsert", documents=len(documents)):
+        collection.add(
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
+        )
 
     print(f"\n✨ Vector DB 구축 완료! 총 {collection.count()}개의 항목이 추가되었습니다.")
 
 if __name__ == "__main__":
-    build_vector_db()
\ No newline at end of file
+    with tracing.span("build.vector_db"):
+        build_vector_db()
+    tracing.flush()
\ No newline at end of file
@@ -0,0 +1,248 @@
+# canonicalize.py
+"""
+추출 결과(department_info)의 학과명을 정규화하고, 같은 모집단위의 중복 레코드를 하나로 합칩니다.
+
+main.py가 만든 최종 JSON과 build_structured_db.py 사이에서 실행하는 단계입니다.
+같은 학과가 '경제학부'/'경제학과', '음악학과 작곡전공'/'음악학과 (작곡전공)'처럼 여러 모양으로 나오거나,
+청크·페이지 경계에서 같은 모집단위가 두 번 추출되면 그대로 임베딩되어 색인과 프롬프트 자리를 차지합니다.
+
+    python canonicalize.py [result_..._final.json]
+    → result_..._canonical.json   (중복을 합친 결과, build_structured_db.py가 우선 사용)
+    → major_aliases.json          (대표 학과명/별칭 표, chatbot_engine이 모델 호출 없이 학과명을 찾는 데 사용)
+
+1. 학과명 키: 공백·괄호를 지우고 끝의 '학과/학부/전공' 등을 뗀 문자열 ('음악학과 (작곡전공)' → '음악학과작곡')
+2. 키가 다르더라도 글자 3-gram 유사도가 SIMILARITY_THRESHOLD 이상이면 같은 학과로 묶습니다. (OCR 오타 대응)
+3. (학과, 모집군, 전형) 키가 같은 레코드를 하나로 합치고, source_page는 '4, 23'처럼 모두 남깁니다.
+"""
+import os
+import re
+import sys
+import json
+from collections import Counter, defaultdict
+
+# --- 설정 ---
+FINAL_JSON_FILE = 'result_2026_서울시립대학교_정시_final.json'
+ALIAS_TABLE_FILE = 'major_aliases.json'
+SIMILARITY_THRESHOLD = 0.8  # 3-gram 자카드 유사도가 이 값 이상이면 같은 학과로 봅니다.
+# ------------------------------------
+
+# 긴 것부터 떼어내야 '학부'가 '부'로 잘리지 않습니다.
+MAJOR_SUFFIXES = ("학과", "학부", "전공", "과", "부")
+_NOISE = re.compile(r"[\s()\[\]<>·.,/]+")
+_UNIT_GROUP = re.compile(r"([가-힣])\s*>?\s*군")
+
+
+def compact(text):
+    """공백과 괄호·구두점을 지운 문자열 ('음악학과 (작곡전공)' → '음악학과작곡전공')"""
+    return _NOISE.sub("", str(text or ""))
+
+
+def major_key(major):
+    """학과명 비교용 키. 끝의 '학과/학부/전공' 등을 뗍니다. ('경제학부', '경제학과' → '경제')"""
+    key = compact(major)
+    for suffix in MAJOR_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix) + 1:
+            return key[:-len(suffix)]
+    return key
+
+
+def unit_key(recruitment_unit):
+    """모집단위(모집군) 비교용 키. ('<가>군 예체능계열' → '가군')"""
+    match = _UNIT_GROUP.search(str(recruitment_unit or ""))
+    return f"{match.group(1)}군" if match else compact(recruitment_unit)
+
+
+def _trigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """글자 3-gram 역색인으로 비슷한 문자열을 빠르게 찾습니다.
+
+    전체 쌍을 비교하지 않고, 3-gram을 하나 이상 공유하는 후보만 자카드 유사도를 계산합니다.
+    """
+
+    def __init__(self):
+        self._grams = {}
+        self._postings = defaultdict(set)
+
+    def add(self, key):
+        if key in self._grams:
+            return
+        grams = _trigrams(key)
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def most_similar(self, key, threshold=SIMILARITY_THRESHOLD):
+        """(가장 비슷한 키, 유사도)를 반환합니다. threshold 이상인 키가 없으면 (None, 0.0)."""
+        grams = _trigrams(key)
+        shared = Counter(other for gram in grams for other in self._postings.get(gram, ()))
+        best, best_score = None, 0.0
+        for other, common in shared.items():
+            if other == key:
+                continue
+            score = common / (len(grams) + len(self._grams[other]) - common)
+            if score > best_score:
+                best, best_score = other, score
+        return (best, best_score) if best_score >= threshold else (None, 0.0)
+
+
+def build_alias_table(majors, threshold=SIMILARITY_THRESHOLD):
+    """학과명 목록을 {표기: 대표 학과명} 별칭 표로 묶습니다.
+
+    키가 같거나 3-gram 유사도가 threshold 이상인 표기를 한 묶음으로 보고,
+    묶음 안에서 가장 많이 나온 표기(같으면 먼저 나온 표기)를 대표 학과명으로 씁니다.
+    """
+    counts = Counter(m for m in majors if m)
+    group_of, index = {}, TrigramIndex()
+    # 많이 나온 키부터 묶어야 드문 오타 표기가 대표 키 쪽으로 붙습니다.
+    key_counts = Counter()
+    for major, count in counts.items():
+        key_counts[major_key(major)] += count
+    for key, _ in key_counts.most_common():
+        similar, _ = index.most_similar(key, threshold)
+        group_of[key] = group_of[similar] if similar else key
+        index.add(key)
+
+    forms_by_group = defaultdict(Counter)
+    for major, count in counts.items():
+        forms_by_group[group_of[major_key(major)]][major] += count
+    aliases = {}
+    for forms in forms_by_group.values():
+        canonical = forms.most_common(1)[0][0]
+        for form in forms:
+            aliases[form] = canonical
+    return aliases
+
+
+def _merge_values(a, b):
+    if a in (None, "", [], {}):
+        return b
+    if isinstance(a, dict) and isinstance(b, dict):
+        merged = dict(a)
+        for k, v in b.items():
+            merged[k] = _merge_values(merged.get(k), v)
+        return merged
+    return a
+
+
+def _merge_pages(*values):
+    pages = []
+    for value in values:
+        for page in re.findall(r"\d+", str(value or "")):
+            if int(page) not in pages:
+                pages.append(int(page))
+    return ", ".join(str(p) for p in sorted(pages)) if len(pages) > 1 else (pages[0] if pages else values[0])
+
+
+def canonicalize_records(records, aliases):
+    """학과명을 대표 학과명으로 바꾸고, (학과, 모집군, 전형) 키가 같은 레코드를 합칩니다.
+
+    먼저 나온 레코드의 값이 우선이고, 비어 있는 필드만 뒤 레코드로 채웁니다. 순서는 처음 나온 순서를 유지합니다.
+    """
+    merged = {}
+    for record in records:
+        record = dict(record)
+        record['major'] = aliases.get(record.get('major'), record.get('major'))
+        key = (major_key(record['major']), unit_key(record.get('recruitment_unit')),
+               compact(record.get('selection_category')))
+        if key not in merged:
+            merged[key] = record
+            continue
+        first = merged[key]
+        pages = _merge_pages(first.get('source_page'), record.get('source_page'))
+        merged[key] = _merge_values(first, record)
+        merged[key]['source_page'] = pages
+    return list(merged.values())
+
+
+def canonical_path(final_json_path):
+    """'result_..._final.json' → 'result_..._canonical.json'"""
+    stem = final_json_path[:-len('_final.json')] if final_json_path.endswith('_final.json') else os.path.splitext(final_json_path)[0]
+    return f"{stem}_canonical.json"
+
+
+def canonicalize_file(final_json_path, output_path=None, alias_path=ALIAS_TABLE_FILE):
+    """최종 JSON을 정규화하여 canonical JSON과 별칭 표를 저장합니다. (원본 레코드 수, 합친 뒤 레코드 수)를 반환합니다."""
+    with open(final_json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    records = data.get("department_info", [])
+    aliases = build_alias_table(r.get('major') for r in records)
+    canonical = canonicalize_records(records, aliases)
+
+    output_path = output_path or canonical_path(final_json_path)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({**data, "department_info": canonical}, f, ensure_ascii=False, indent=2)
+    save_alias_table(alias_path, aliases)
+    return len(records), len(canonical)
+
+
+# --- 별칭 표 (질문에서 학과명 찾기) ---
+
+def save_alias_table(path, aliases):
+    table = defaultdict(list)
+    for form, canonical in aliases.items():
+        table[canonical].append(form)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"canonical": {c: sorted(forms) for c, forms in sorted(table.items())}}, f, ensure_ascii=False, indent=2)
+
+
+class AliasTable:
+    """대표 학과명/별칭 표. 질문 문장이나 모델이 뽑은 키워드를 대표 학과명으로 바꿉니다."""
+
+    def __init__(self, canonical):
+        self.canonical = canonical
+        self._by_key = {}
+        self._index = TrigramIndex()
+        # 질문 안에서 찾을 문자열: 표기 그대로 + 키에 '학과/학부/전공'을 붙인 모양
+        self._mentions = {}
+        for name, forms in canonical.items():
+            for form in [name, *forms]:
+                key = major_key(form)
+                self._by_key.setdefault(key, name)
+                self._index.add(key)
+                self._mentions.setdefault(compact(form), name)
+                for suffix in MAJOR_SUFFIXES[:3]:
+                    self._mentions.setdefault(key + suffix, name)
+        self._longest_first = sorted(self._mentions, key=len, reverse=True)
+
+    def resolve(self, name):
+        """학과명(모델이 뽑은 키워드 등)을 대표 학과명으로 바꿉니다. 찾지 못하면 None."""
+        key = major_key(name)
+        if key in self._by_key:
+            return self._by_key[key]
+        similar, _ = self._index.most_similar(key)
+        return self._by_key[similar] if similar else None
+
+    def find_in_query(self, query):
+        """질문 문장에 나온 학과명을 찾아 대표 학과명으로 반환합니다. 없으면 None.
+
+        '행정학과'와 '도시행정학과'처럼 한 이름이 다른 이름에 포함될 수 있으므로 가장 긴 표기부터 맞춰봅니다.
+        """
+        text = compact(query)
+        for mention in self._longest_first:
+            if mention in text:
+                return self._mentions[mention]
+        return None
+
+
+def load_alias_table(path=ALIAS_TABLE_FILE):
+    """별칭 표를 불러옵니다. 파일이 없으면 None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return AliasTable(json.load(f).get("canonical", {}))
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else FINAL_JSON_FILE
+    print(f"'{source}' 파일의 학과명을 정규화하고 중복 레코드를 합칩니다...")
+    try:
+        before, after = canonicalize_file(source)
+    except FileNotFoundError:
+        print(f"❌ 에러: '{source}' 파일을 찾을 수 없습니다. 파일 이름을 확인해주세요.")
+        sys.exit(1)
+    print(f"  - 레코드 {before}개 → {after}개 ({before - after}개 중복 병합)")
+    print(f"✨ '{canonical_path(source)}', '{ALIAS_TABLE_FILE}' 생성 완료!")
@@ -1,109 +1,264 @@
 import os
+import re
 import json
-import chromadb
-import google.generativeai as genai
+import time
+import threading
 import streamlit as st
+import canonicalize
+import collection_alias
+import compressed_index
+import model_provider
+import page_store
+import score_simulator
+import tracing
+from rate_scheduler import INTERACTIVE
 
 # --- 설정 ---
 DB_PATH = "chroma_db"
-STRUCTURED_COLLECTION = "structured_data"
+STRUCTURED_COLLECTION = "structured_data"  # 별칭 (collection_alias.py가 실제 버전 컬렉션으로 바꿔 줍니다)
 RAW_COLLECTION = "raw_chunks_semantic"
-EMBEDDING_MODEL = 'models/text-embedding-004'
 GENERATIVE_MODEL = 'gemini-2.5-flash'
 KEYWORD_MODEL = 'gemini-2.5-flash'
+FOLLOWUP_RAW_RESULTS = 2  # 후속 질문에서 원본 텍스트를 추가로 찾는 개수
+MAX_RAW_EVIDENCE = 8  # 대화 동안 쌓아두는 원본 텍스트 근거의 최대 개수
+RAW_TEXT_FILE = 'result_2026_서울시립대학교_정시_raw_text_v4.txt'  # 원본 텍스트 청크를 만든 파일 (build_raw_db.py와 같게)
+# 출처 발췌용 페이지 저장소. 청크와 같은 텍스트에서 발췌하도록 RAW_TEXT_FILE에서 이름을 정합니다. (python page_store.py RAW_TEXT_FILE로 생성)
+PAGE_STORE_FILE = page_store.store_path(RAW_TEXT_FILE)
+# 'compressed'면 원본 텍스트 검색에 compressed_index.py로 만든 압축 색인을 씁니다. (색인이 없으면 Chroma로 검색)
+RAW_INDEX_MODE = os.environ.get("EDAERO_RAW_INDEX", "chroma")
 # ------------------------------------
 
+# "그럼 ...", "그 학과는 ..." 처럼 앞 질문을 이어받는 말로 시작하는 질문 ('또래', '그리고는'처럼 더 긴 낱말의 앞부분은 제외)
+FOLLOWUP_PATTERN = re.compile(r"((그럼|그러면|그렇다면|그리고|또|거기(서|는|도|에서)?)(?![가-힣])"
+                              r"|그\s*(학과|전공|학부|과)|이\s*(학과|전공|학부)|해당\s*(학과|전공|학부))")
+# "어느 학과가 ...", "다른 학과는?" 처럼 특정 학과를 묻지 않는 질문은 후속 질문으로 보지 않습니다.
+GENERAL_QUESTION_PATTERN = re.compile(r"(어느|어떤|무슨|모든|전체|다른)\s*(학과|전공|학부)|학과들")
+# 질문에 적힌 학과명 ('컴퓨터공학과는' → '컴퓨터공학과'). 별칭 표에 없는 학과도 찾기 위해 씁니다.
+MAJOR_TOKEN_PATTERN = re.compile(r"([가-힣]+)(학과|학부|전공)")
+# 학과명이 아니라 앞 학과를 가리키거나 전공 종류를 뜻하는 앞말 ('그학과', '복수전공')
+NON_MAJOR_PREFIXES = {"그", "이", "해당", "같은", "복수", "이중", "부", "연계", "융합"}
+
 # Streamlit의 캐싱 기능으로 AI 모델과 DB를 한번만 로드하게 하여 속도를 높입니다.
 #@st.cache_resource
 def load_ai_resources():
     """앱 실행 시 한번만 AI 리소스를 로드하는 함수"""
     print("AI 리소스를 로딩합니다...")
     try:
-        GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-        genai.configure(api_key=GOOGLE_API_KEY)
+        provider = model_provider.get_provider()
     except KeyError:
         st.error("GOOGLE_API_KEY 환경 변수가 설정되지 않았습니다! 터미널을 재시작하고 다시 설정해주세요.")
         return None, None, None
 
     try:
+        import chromadb
+
         client = chromadb.PersistentClient(path=DB_PATH)
-        structured_collection = client.get_collection(name=STRUCTURED_COLLECTION)
-        raw_collection = client.get_collection(name=RAW_COLLECTION)
+        # 질문마다 별칭을 다시 읽으므로, DB를 다시 구축해 별칭이 바뀌면 다음 질문부터 새 버전을 조회합니다.
+        structured_collection = collection_alias.open_collection(client, DB_PATH, STRUCTURED_COLLECTION)
+        raw_collection = collection_alias.open_collection(client, DB_PATH, RAW_COLLECTION)
+        if RAW_INDEX_MODE == 'compressed':
+            raw_collection = _with_compressed_index(raw_collection)
         print("✅ DB 컬렉션 연결 완료.")
     except Exception as e:
         st.error(f"DB 컬렉션 연결에 실패했습니다: {e}")
         return None, None, None
         
     print("✅ AI 리소스 로딩 완료.")
-    return structured_collection, raw_collection, genai
+    return structured_collection, raw_collection, provider
 
-def get_ai_response(query, structured_collection, raw_collection, genai_alias):
-    """사용자의 질문에 대한 AI의 최종 답변을 생성합니다."""
-    # 1. Gemini를 이용해 질문에서 '학과명' 키워드 추출
-    keyword_extractor_model = genai_alias.GenerativeModel(KEYWORD_MODEL)
-    keyword_prompt = f"다음 질문에서 대학 '학과명' 또는 '전공명'을 정확히 하나만 추출해줘. 만약 학과명이 언급되지 않았다면, '없음'이라고만 대답해줘. 질문: \"{query}\""
-    response = keyword_extractor_model.generate_content(keyword_prompt)
-    major_keyword = response.text.strip().replace(".", "")
 
-    # 2. 키워드 존재 여부에 따라 검색 전략 변경
-    if major_keyword != "없음":
-        # '정확 검색': 메타데이터 필터링
-        all_data = structured_collection.get() # .get()은 전체 데이터를 가져옴
-        matching_docs = []
-        matching_metas = []
-        matching_ids = []
-        for i, meta in enumerate(all_data['metadatas']):
-            if major_keyword.replace(" ", "") in (meta.get('major') or '').replace(" ", ""):
-                matching_docs.append(all_data['documents'][i])
-                matching_metas.append(meta)
-                matching_ids.append(all_data['ids'][i])
-        structured_results = {'ids': [matching_ids], 'documents': [matching_docs], 'metadatas': [matching_metas]}
-        
-        query_embedding = genai_alias.embed_content(model=EMBEDDING_MODEL, content=query, task_type="retrieval_query")['embedding']
-        raw_results = raw_collection.query(query_embeddings=[query_embedding], n_results=3)
-    else:
-        # '유사도 검색': 벡터 검색
-        query_embedding = genai_alias.embed_content(model=EMBEDDING_MODEL, content=query, task_type="retrieval_query")['embedding']
-        structured_results = structured_collection.query(query_embeddings=[query_embedding], n_results=10)
-        raw_results = raw_collection.query(query_embeddings=[query_embedding], n_results=5)
-
-    # 3. 검색된 모든 정보를 종합하여 '참고 자료' 생성
-    context = "--- [핵심 요약 정보 (구조화된 데이터)] ---\n"
-    sources = [] # 이제 딕셔너리를 저장합니다: {'text': '...', 'page': ...}
-
-    if structured_results['metadatas'] and structured_results['metadatas'][0]:
-        context += "\n".join([json.dumps(m, ensure_ascii=False) for m in structured_results['metadatas'][0]])
-        for meta in structured_results['metadatas'][0]:
-            page_str = meta.get('source_page', 'N/A')
+_missing_index_warned = set()
+
+def _with_compressed_index(raw_collection):
+    """서비스 중인 버전의 압축 색인이 있으면 검색만 압축 색인으로 하도록 감쌉니다."""
+    wrapped = compressed_index.wrap_collection(raw_collection, DB_PATH)
+    if wrapped is None:
+        if raw_collection.name not in _missing_index_warned:
+            _missing_index_warned.add(raw_collection.name)
+            print(f"❗️ '{raw_collection.name}'의 압축 색인이 없어 Chroma로 검색합니다. (python compressed_index.py build)")
+        return raw_collection
+    return wrapped
+
+
+# chromadb는 import에만 1초 가까이 걸리므로, 첫 화면을 먼저 그린 뒤 백그라운드에서 미리 불러옵니다.
+_preload_thread = None
+
+def preload_ai_resources():
+    """chromadb와 모델 클라이언트를 백그라운드 스레드에서 미리 불러옵니다. (프로세스당 한 번만 실행)"""
+    global _preload_thread
+    if _preload_thread is None:
+        _preload_thread = threading.Thread(target=_preload, daemon=True)
+        _preload_thread.start()
+
+def _preload():
+    try:
+        import chromadb
+        model_provider.get_provider()
+    except Exception:
+        pass  # 오류는 질문을 받을 때 load_ai_resources()가 화면에 표시합니다.
+
+_alias_table = None
+
+def _get_alias_table():
+    """대표 학과명/별칭 표를 한 번만 불러옵니다. 파일이 없으면 None (항상 Gemini로 학과명을 추출)."""
+    global _alias_table
+    with tracing.span("query.alias_table") as s:
+        s.set(cache_hit=_alias_table is not None)
+        if _alias_table is None:
+            _alias_table = canonicalize.load_alias_table() or False
+    return _alias_table or None
+
+_page_store = None
+
+def _get_page_store():
+    """출처 발췌에 쓰는 페이지 저장소를 한 번만 엽니다. 파일이 없으면 None (발췌 없이 페이지 번호만 표시)."""
+    global _page_store
+    with tracing.span("query.page_store") as s:
+        s.set(cache_hit=_page_store is not None)
+        if _page_store is None:
             try:
-                # 페이지 번호가 '23, 33' 같은 형태일 수 있으므로 첫 페이지만 사용
-                page_num = int(str(page_str).split(',')[0].strip())
-                sources.append({
-                    "text": f"정형 데이터: {meta.get('major', '정보')} (p.{page_str})",
-                    "page": page_num
-                })
-            except (ValueError, IndexError):
-                continue # 페이지 번호를 숫자로 변환할 수 없으면 건너뜁니다.
-
-    context += "\n\n--- [관련 원본 텍스트 (추가 정보)] ---\n"
-    if raw_results['documents'] and raw_results['documents'][0]:
-        context += "\n".join(raw_results['documents'][0])
-        for meta in raw_results['metadatas'][0]:
-             page_num = meta.get('source_page', 0)
-             sources.append({
-                 "text": f"원본 텍스트: Chunk from p.{page_num}",
-                 "page": page_num
-             })
-    
-    # 4. 최종 답변 생성을 위한 '탐정 프롬프트' 구성
-    prompt = f"""
+                _page_store = page_store.PageStore(PAGE_STORE_FILE)
+            except (OSError, ValueError):
+                _page_store = False
+    return _page_store or None
+
+def _excerpt(page_num, around=None):
+    store = _get_page_store()
+    return store.excerpt(page_num, around=around) if store else ""
+
+class ConversationState:
+    """한 대화(세션)에서 확정된 학과와 검색해 둔 근거 자료를 기억합니다. (app.py가 st.session_state에 보관)
+
+    후속 질문("그럼 수능 반영비율은?")이 같은 학과에 대한 것이면 키워드 추출과 정형 데이터 검색을 건너뛰고
+    기억해 둔 근거를 다시 쓰며, 원본 텍스트만 새 질문으로 조금 더 찾아 근거에 덧붙입니다.
+    """
+
+    def __init__(self):
+        self.major = None               # 마지막으로 확정된 학과명 (없으면 None)
+        self.last_query = None
+        self.structured_results = None
+        self.raw_results = None
+
+    def is_followup(self, query, mentioned_major=None, alias_table=None):
+        """질문이 기억해 둔 학과에 대한 후속 질문인지 판단합니다.
+
+        별칭 표에 없는 학과명('그럼 컴퓨터공학과는?')이 적혀 있어도 기억해 둔 학과가 아니면 새 질문으로 봅니다.
+        """
+        if not self.major:
+            return False
+        if mentioned_major:
+            return mentioned_major == self.major
+        if GENERAL_QUESTION_PATTERN.search(query):
+            return False
+        for prefix, suffix in MAJOR_TOKEN_PATTERN.findall(query):
+            if prefix not in NON_MAJOR_PREFIXES and not self._is_current_major(prefix + suffix, alias_table):
+                return False
+        return bool(FOLLOWUP_PATTERN.match(query.strip()))
+
+    def _is_current_major(self, name, alias_table=None):
+        if canonicalize.major_key(name) == canonicalize.major_key(self.major):
+            return True
+        return alias_table is not None and alias_table.resolve(name) == self.major
+
+    def remember(self, major, query, structured_results, raw_results):
+        self.major = major
+        self.last_query = query
+        self.structured_results = structured_results
+        self.raw_results = _evidence(raw_results)
+
+    def extend_raw(self, raw_results):
+        """새로 찾은 원본 텍스트 중 아직 없는 것만 앞쪽에 덧붙이고, 근거가 MAX_RAW_EVIDENCE개를 넘지 않게 자릅니다."""
+        known = set(self.raw_results['ids'][0])
+        new = _evidence(raw_results)
+        keep = [i for i, id_ in enumerate(new['ids'][0]) if id_ not in known]
+        for key in ('ids', 'documents', 'metadatas'):
+            merged = [new[key][0][i] for i in keep] + self.raw_results[key][0]
+            self.raw_results[key] = [merged[:MAX_RAW_EVIDENCE]]
+        return len(keep)
+
+    def clear(self):
+        self.__init__()
+
+def _evidence(results):
+    """Chroma 검색 결과에서 답변에 쓰는 ids/documents/metadatas만 복사합니다."""
+    return {key: [list(results[key][0]) if results[key] else []] for key in ('ids', 'documents', 'metadatas')}
+
+def get_ai_response(query, structured_collection, raw_collection, provider, state=None):
+    """사용자의 질문에 대한 AI의 최종 답변을 생성합니다.
+
+    state(ConversationState)를 넘기면 같은 학과에 대한 후속 질문은 이전 검색 결과를 다시 씁니다.
+    """
+    with tracing.span("query", query_chars=len(query)) as query_span:
+        alias_table = _get_alias_table()
+        mentioned_major = alias_table.find_in_query(query) if alias_table else None
+        followup = state is not None and state.is_followup(query, mentioned_major, alias_table)
+        query_span.set(followup=followup)
+        if state is not None:
+            # 대화 상태에 기억해 둔 학과/검색 결과를 다시 썼는지 (후속 질문이면 적중)
+            query_span.set(cache_hit=followup)
+
+        if followup:
+            # 후속 질문: 학과와 정형 데이터는 그대로 쓰고, 원본 텍스트만 새 질문으로 조금 더 찾아 덧붙입니다.
+            major_keyword = state.major
+            query_span.set(exact_match=True)
+            with tracing.span("query.embedding", chars=len(query)):
+                query_embedding = provider.embed(query, task_type="retrieval_query", priority=INTERACTIVE)
+            with tracing.span("query.chroma_raw", n_results=FOLLOWUP_RAW_RESULTS) as s:
+                added = state.extend_raw(raw_collection.query(query_embeddings=[query_embedding], n_results=FOLLOWUP_RAW_RESULTS))
+                s.set(added=added)
+            structured_results, raw_results = state.structured_results, state.raw_results
+            target = f"{query} (이전 질문 '{state.last_query}'에 이어서, 대상: {major_keyword})"
+            state.last_query = query
+        else:
+            major_keyword, structured_results, raw_results = _retrieve(
+                query, mentioned_major, alias_table, structured_collection, raw_collection, provider, query_span)
+            target = query
+            if state is not None:
+                if major_keyword != "없음":
+                    state.remember(major_keyword, query, structured_results, raw_results)
+                else:
+                    state.clear()  # 학과가 없는 일반 질문 뒤에는 이어서 물을 대상이 없습니다.
+
+        # 3. 검색된 모든 정보를 종합하여 '참고 자료' 생성
+        context = "--- [핵심 요약 정보 (구조화된 데이터)] ---\n"
+        sources = [] # 이제 딕셔너리를 저장합니다: {'text': '...', 'page': ...}
+
+        if structured_results['metadatas'] and structured_results['metadatas'][0]:
+            context += "\n".join([json.dumps(m, ensure_ascii=False) for m in structured_results['metadatas'][0]])
+            for meta in structured_results['metadatas'][0]:
+                page_str = meta.get('source_page', 'N/A')
+                try:
+                    # 페이지 번호가 '23, 33' 같은 형태일 수 있으므로 첫 페이지만 사용
+                    page_num = int(str(page_str).split(',')[0].strip())
+                    sources.append({
+                        "text": f"정형 데이터: {meta.get('major', '정보')} (p.{page_str})",
+                        "page": page_num,
+                        "excerpt": _excerpt(page_num, around=meta.get('major')),
+                    })
+                except (ValueError, IndexError):
+                    continue # 페이지 번호를 숫자로 변환할 수 없으면 건너뜁니다.
+
+        context += "\n\n--- [관련 원본 텍스트 (추가 정보)] ---\n"
+        if raw_results['documents'] and raw_results['documents'][0]:
+            context += "\n".join(raw_results['documents'][0])
+            for doc, meta in zip(raw_results['documents'][0], raw_results['metadatas'][0]):
+                 page_num = meta.get('source_page', 0)
+                 sources.append({
+                     "text": f"원본 텍스트: Chunk from p.{page_num}",
+                     "page": page_num,
+                     # 청크 첫머리가 나오는 위치를 페이지에서 찾아 발췌합니다.
+                     "excerpt": _excerpt(int(page_num or 0), around=" ".join(doc.split())[:20]),
+                 })
+
+        # 4. 최종 답변 생성을 위한 '탐정 프롬프트' 구성
+        prompt = f"""
     당신은 대한민국 최고의 입시 전문가 'edaeroAI'이며, 탐정처럼 주어진 정보를 분석하여 질문에 답해야 한다.
 
     **[임무]**
     주어진 '[참고 자료]'를 바탕으로 사용자의 '[질문]'에 대해 가장 정확한 답변을 찾아내라.
 
     **[작업 절차]**
-    1.  **타겟 확정:** 사용자의 '[질문]'에서 핵심적인 대상(학과, 전형 이름 등)이 무엇인지 명확히 파악한다. 현재 질문의 핵심 타겟은 '{query}' 이다.
+    1.  **타겟 확정:** 사용자의 '[질문]'에서 핵심적인 대상(학과, 전형 이름 등)이 무엇인지 명확히 파악한다. 현재 질문의 핵심 타겟은 '{target}' 이다.
     2.  **자료 수색:** '[참고 자료]' 전체를 꼼꼼히 읽는다. 특히 '[핵심 요약 정보]' 섹션을 주목한다.
     3.  **증거 확보:** 참고 자료의 각 항목 중에서, 1단계에서 파악한 **핵심 타겟과 정확히 일치하거나 가장 직접적으로 관련된 정보**를 찾는다. 관련 없는 정보는 과감히 무시한다.
     4.  **최종 보고:** 3단계에서 확보한 증거만을 바탕으로 질문에 대한 답변을 생성한다. 만약 여러 증거를 확인했음에도 타겟과 관련된 정보를 정말 찾을 수 없다면, "제공된 자료에서는 해당 정보를 찾을 수 없었습니다."라고 보고한다.
@@ -115,13 +270,93 @@ def get_ai_response(query, structured_collection, raw_collection, genai_alias):
     {query}
     [탐정 edaeroAI의 최종 보고서]
     """
+        query_span.set(context_chars=len(context), prompt_chars=len(prompt))
+
+        with tracing.span("query.generation_request", prompt_chars=len(prompt)):
+            # 답변 텍스트 조각을 차례로 내보내는 스트림을 생성합니다.
+            response_stream = provider.stream(prompt, model=GENERATIVE_MODEL, priority=INTERACTIVE)
 
-    model = genai_alias.GenerativeModel(GENERATIVE_MODEL)
-    # stream=True 옵션을 사용하여 스트림 객체를 생성합니다.
-    response_stream = model.generate_content(prompt, stream=True)
-    
     # 중복 제거된 출처 리스트와 스트림 객체를 반환합니다.
     unique_sources = list({(v.get('page'), v.get('text')): v for v in sources}.values())
+    if tracing.ENABLED:
+        response_stream = _traced_stream(response_stream, query_span)
     return response_stream, unique_sources
 
-    
\ No newline at end of file
+def _retrieve(query, mentioned_major, alias_table, structured_collection, raw_collection, provider, query_span):
+    """새 질문에 대해 학과명을 찾고 정형 데이터/원본 텍스트를 검색합니다. (학과명, 정형 결과, 원본 결과)를 반환합니다."""
+    # 1. 질문에서 '학과명' 키워드 추출
+    with tracing.span("query.keyword_extraction") as s:
+        # 별칭 표(canonicalize.py로 생성)에서 먼저 찾고, 찾지 못했을 때만 Gemini에게 묻습니다.
+        major_keyword = mentioned_major
+        s.set(alias_hit=major_keyword is not None)
+        if major_keyword is None:
+            keyword_prompt = f"다음 질문에서 대학 '학과명' 또는 '전공명'을 정확히 하나만 추출해줘. 만약 학과명이 언급되지 않았다면, '없음'이라고만 대답해줘. 질문: \"{query}\""
+            response = provider.generate(keyword_prompt, model=KEYWORD_MODEL, priority=INTERACTIVE)
+            major_keyword = response.text.strip().replace(".", "")
+            if alias_table and major_keyword != "없음":
+                # '경제학과'처럼 DB와 다르게 뽑힌 이름도 대표 학과명('경제학부')으로 맞춥니다.
+                major_keyword = alias_table.resolve(major_keyword) or major_keyword
+            s.set(prompt_chars=len(keyword_prompt), **tracing.usage_attrs(response))
+    query_span.set(exact_match=major_keyword != "없음")
+
+    # 2. 키워드 존재 여부에 따라 검색 전략 변경
+    if major_keyword != "없음":
+        # '정확 검색': 메타데이터 필터링
+        with tracing.span("query.structured_get") as s:
+            all_data = structured_collection.get() # .get()은 전체 데이터를 가져옴
+            s.set(rows=len(all_data['ids']))
+        matching_docs = []
+        matching_metas = []
+        matching_ids = []
+        for i, meta in enumerate(all_data['metadatas']):
+            if major_keyword.replace(" ", "") in (meta.get('major') or '').replace(" ", ""):
+                matching_docs.append(all_data['documents'][i])
+                matching_metas.append(meta)
+                matching_ids.append(all_data['ids'][i])
+        structured_results = {'ids': [matching_ids], 'documents': [matching_docs], 'metadatas': [matching_metas]}
+
+        with tracing.span("query.embedding", chars=len(query)):
+            query_embedding = provider.embed(query, task_type="retrieval_query", priority=INTERACTIVE)
+        with tracing.span("query.chroma_raw", n_results=3):
+            raw_results = raw_collection.query(query_embeddings=[query_embedding], n_results=3)
+    else:
+        # '유사도 검색': 벡터 검색
+        with tracing.span("query.embedding", chars=len(query)):
+            query_embedding = provider.embed(query, task_type="retrieval_query", priority=INTERACTIVE)
+        with tracing.span("query.chroma_structured", n_results=10):
+            structured_results = structured_collection.query(query_embeddings=[query_embedding], n_results=10)
+        with tracing.span("query.chroma_raw", n_results=5):
+            raw_results = raw_collection.query(query_embeddings=[query_embedding], n_results=5)
+    return major_keyword, structured_results, raw_results
+
+def _traced_stream(response_stream, parent_span):
+    """스트리밍 답변을 소비하는 동안의 생성 시간과 출력 글자 수를 기록합니다."""
+    # yield 사이에 span을 열어 두면 같은 스레드의 다른 span이 이 span 아래로 잘못 연결되므로,
+    # 시간만 직접 재고 스트림이 끝난 뒤 부모 span 아래에 기록합니다.
+    start, t0 = time.time(), time.perf_counter()
+    output_chars, error = 0, None
+    try:
+        for chunk in response_stream:
+            output_chars += len(chunk)
+            yield chunk
+    except Exception as e:  # 화면이 스트림을 중간에 닫은 경우(GeneratorExit)는 오류로 치지 않습니다.
+        error = type(e).__name__
+        raise
+    finally:
+        attrs = {"output_chars": output_chars}
+        if error:
+            attrs["error"] = error
+        tracing.record("query.generation_stream", start, time.perf_counter() - t0, parent=parent_span, **attrs)
+
+def load_score_simulator():
+    """점수 시뮬레이터용 '학과 × 과목' 가중치 행렬을 로드합니다. (build_score_matrix.py로 미리 생성)"""
+    simulator = score_simulator.load_simulator()
+    if simulator is None:
+        print(f"❗️ '{score_simulator.SCORE_MATRIX_FILE}' 파일이 없습니다. build_score_matrix.py를 먼저 실행해주세요.")
+    return simulator
+
+def simulate_admission_scores(student_scores, simulator, top_k=20):
+    """학생의 과목별 점수로 모든 학과의 환산 점수를 계산하여, 유리한 순서대로 반환합니다."""
+    if simulator is None:
+        return []
+    return simulator.simulate(student_scores, top_k=top_k)
@@ -0,0 +1,260 @@
+# chroma_admin.py
+"""
+chroma_db 폴더를 관리하는 명령줄 도구입니다.
+
+    python chroma_admin.py list                       # 컬렉션별 문서 수, 디스크 크기, 별칭 표시
+    python chroma_admin.py gc --dry-run               # 지울 대상만 보여주기
+    python chroma_admin.py gc [--stale]               # 고아 세그먼트 폴더와 오래된 버전 정리 (+ 아무도 안 쓰는 컬렉션)
+    python chroma_admin.py alias structured_data structured_data__v20261019153000   # 별칭 되돌리기
+    python chroma_admin.py snapshot                   # chroma_snapshots/chroma_db_<시각>.tar.gz
+    python chroma_admin.py restore chroma_snapshots/chroma_db_20261019153000.tar.gz
+
+- 고아 세그먼트: Chroma는 컬렉션을 지워도 벡터 세그먼트 폴더(chroma_db/<uuid>/)를 남겨 둡니다.
+  chroma.sqlite3에 등록되지 않은 폴더를 찾아 지웁니다. 컬렉션이 없어진 압축 색인 폴더(chroma_db/compressed/<이름>/)도 지웁니다.
+- --stale: 별칭이 가리키지 않고, 채팅용 별칭(SERVING_ALIASES)이나 등록된 별칭의 버전도 아닌 컬렉션(예: admissions_2026)까지 지웁니다.
+- 복원은 현재 DB를 'chroma_db.before_restore_<시각>'으로 옮겨 두고 스냅샷으로 바꿉니다.
+  실행 중인 앱은 예전 DB 파일을 열고 있으므로 복원 후에는 앱을 다시 시작하세요.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import tarfile
+import argparse
+import tempfile
+import time
+import chromadb
+import collection_alias
+
+# --- 설정 ---
+DB_PATH = "chroma_db"
+SNAPSHOT_DIR = "chroma_snapshots"
+# 채팅이 조회하는 별칭 (chatbot_engine.STRUCTURED_COLLECTION, RAW_COLLECTION과 같게 유지)
+SERVING_ALIASES = ("structured_data", "raw_chunks_semantic")
+# ------------------------------------
+
+SQLITE_FILE = "chroma.sqlite3"
+SEGMENT_DIR_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def human_size(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.0f}{unit}" if unit == "B" else f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+
+
+def _require_db(db_path):
+    if not os.path.exists(os.path.join(db_path, SQLITE_FILE)):
+        print(f"❌ 에러: '{db_path}/{SQLITE_FILE}' 파일이 없습니다. DB 경로를 확인해주세요.")
+        return False
+    return True
+
+
+def segment_folders(db_path):
+    return [name for name in os.listdir(db_path)
+            if SEGMENT_DIR_PATTERN.fullmatch(name) and os.path.isdir(os.path.join(db_path, name))]
+
+
+def compressed_index_folders(db_path):
+    root = os.path.join(db_path, collection_alias.COMPRESSED_INDEX_DIR)
+    if not os.path.isdir(root):
+        return []
+    return [name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))]
+
+
+def collection_sizes(db_path, name):
+    """컬렉션이 쓰는 벡터 세그먼트 폴더 크기 합 (메타데이터는 chroma.sqlite3에 함께 들어 있음)"""
+    return sum(collection_alias.folder_size(os.path.join(db_path, segment))
+               for segment in collection_alias.segment_ids(db_path, name)
+               if os.path.isdir(os.path.join(db_path, segment)))
+
+
+# --- list ---
+
+def list_collections(db_path):
+    if not _require_db(db_path):
+        return
+    client = chromadb.PersistentClient(path=db_path)
+    aliases = collection_alias.load_aliases(db_path)
+    pointed_by = _pointed_by(aliases)
+
+    print(f"📦 '{db_path}' 컬렉션 목록")
+    for collection in sorted(client.list_collections(), key=lambda c: c.name):
+        if collection.name in pointed_by:
+            note = f"  ← {pointed_by[collection.name]}"
+        elif _alias_family(collection.name, aliases):
+            note = "  (이전 버전)"
+        else:
+            note = "  (사용 안 함)"
+        print(f"  - {collection.name}: {collection.count()}개 문서, {human_size(collection_sizes(db_path, collection.name))}{note}")
+
+    orphans = set(segment_folders(db_path)) - collection_alias.segment_ids(db_path)
+    orphan_size = sum(collection_alias.folder_size(os.path.join(db_path, name)) for name in orphans)
+    print(f"  * {SQLITE_FILE}: {human_size(os.path.getsize(os.path.join(db_path, SQLITE_FILE)))}")
+    if orphans:
+        print(f"  * 고아 세그먼트 폴더 {len(orphans)}개: {human_size(orphan_size)} (gc로 정리)")
+    print(f"  = 전체: {human_size(collection_alias.folder_size(db_path))}")
+
+
+def _pointed_by(aliases):
+    """{실제 컬렉션 이름: 별칭}. 별칭 파일에 없는 채팅용 별칭은 같은 이름의 컬렉션을 가리킵니다."""
+    return {aliases.get(alias, alias): alias for alias in (*SERVING_ALIASES, *aliases)}
+
+
+def _alias_family(name, aliases):
+    """name이 채팅용 별칭이나 등록된 별칭의 버전이면 그 별칭, 아니면 None"""
+    return next((alias for alias in (*SERVING_ALIASES, *aliases) if collection_alias.is_version_of(name, alias)), None)
+
+
+# --- gc ---
+
+def garbage_collect(db_path, dry_run=False, stale=False, keep=collection_alias.KEEP_VERSIONS):
+    if not _require_db(db_path):
+        return
+    client = chromadb.PersistentClient(path=db_path)
+    aliases = collection_alias.load_aliases(db_path)
+    names = [c.name for c in client.list_collections()]
+
+    # 1) 별칭마다 서비스 중인 버전을 빼고 오래된 버전부터 keep개만 남깁니다.
+    doomed = []
+    for alias, current in aliases.items():
+        old_versions = [n for n in collection_alias.versions(client, alias) if n != current]
+        doomed += old_versions[:max(0, len(old_versions) - (keep - 1))]
+    # 2) --stale: 별칭이 가리키지도 않고 채팅용 별칭의 버전도 아닌 컬렉션
+    if stale:
+        in_use = set(_pointed_by(aliases))
+        doomed += [n for n in names if n not in in_use and n not in doomed and _alias_family(n, aliases) is None]
+
+    freed = 0
+    for name in doomed:
+        print(f"  - 컬렉션 삭제: {name} ({human_size(collection_sizes(db_path, name))})")
+        if not dry_run:
+            freed += collection_alias.drop_collection(client, db_path, name)
+
+    # 3) chroma.sqlite3에 등록되지 않은 세그먼트 폴더 (컬렉션을 지운 뒤 남은 폴더)
+    known = collection_alias.segment_ids(db_path)
+    for folder in sorted(set(segment_folders(db_path)) - known):
+        path = os.path.join(db_path, folder)
+        size = collection_alias.folder_size(path)
+        print(f"  - 고아 세그먼트 폴더 삭제: {folder} ({human_size(size)})")
+        if not dry_run:
+            shutil.rmtree(path, ignore_errors=True)
+            freed += size
+
+    # 4) 컬렉션이 없어진 압축 색인 폴더 (drop_collection이 함께 지우기 전에 만든 DB에 남은 것)
+    for name in sorted(set(compressed_index_folders(db_path)) - set(names)):
+        path = collection_alias.compressed_index_path(db_path, name)
+        size = collection_alias.folder_size(path)
+        print(f"  - 고아 압축 색인 폴더 삭제: {collection_alias.COMPRESSED_INDEX_DIR}/{name} ({human_size(size)})")
+        if not dry_run:
+            shutil.rmtree(path, ignore_errors=True)
+            freed += size
+
+    if dry_run:
+        print("🔎 --dry-run: 아무것도 지우지 않았습니다.")
+        return
+    # 지운 컬렉션의 행이 남긴 빈 페이지를 돌려받습니다.
+    sqlite_path = os.path.join(db_path, SQLITE_FILE)
+    before = os.path.getsize(sqlite_path)
+    db = sqlite3.connect(sqlite_path)
+    try:
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    freed += max(0, before - os.path.getsize(sqlite_path))
+    print(f"✨ 정리 완료! {human_size(freed)} 확보")
+
+
+# --- alias ---
+
+def point_alias(db_path, alias, name):
+    if not _require_db(db_path):
+        return
+    client = chromadb.PersistentClient(path=db_path)
+    if name not in [c.name for c in client.list_collections()]:
+        print(f"❌ 에러: '{name}' 컬렉션이 없습니다.")
+        return
+    previous = collection_alias.set_alias(db_path, alias, name)
+    print(f"🔀 '{alias}' 별칭을 '{previous or alias}' → '{name}'(으)로 바꿨습니다.")
+
+
+# --- snapshot / restore ---
+
+def snapshot(db_path, output_dir=SNAPSHOT_DIR):
+    """SQLite 백업 API로 chroma.sqlite3를 일관된 상태로 복사하고, 등록된 세그먼트 폴더와 별칭 파일만 묶습니다."""
+    if not _require_db(db_path):
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    archive = os.path.join(output_dir, f"{os.path.basename(os.path.normpath(db_path))}_{time.strftime('%Y%m%d%H%M%S')}.tar.gz")
+    with tempfile.TemporaryDirectory(prefix="chroma_snapshot_") as staging:
+        source = sqlite3.connect(os.path.join(db_path, SQLITE_FILE))
+        target = sqlite3.connect(os.path.join(staging, SQLITE_FILE))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        for segment in collection_alias.segment_ids(staging):
+            if os.path.isdir(os.path.join(db_path, segment)):
+                shutil.copytree(os.path.join(db_path, segment), os.path.join(staging, segment))
+        if os.path.exists(collection_alias.alias_path(db_path)):
+            shutil.copy2(collection_alias.alias_path(db_path), collection_alias.alias_path(staging))
+        with tarfile.open(archive, "w:gz") as tar:
+            tar.add(staging, arcname=".")
+    print(f"📸 스냅샷 저장 완료: {archive} ({human_size(os.path.getsize(archive))})")
+    return archive
+
+
+def restore(db_path, archive):
+    if not os.path.exists(archive):
+        print(f"❌ 에러: '{archive}' 파일을 찾을 수 없습니다.")
+        return False
+    parent = os.path.dirname(os.path.abspath(db_path))
+    staging = tempfile.mkdtemp(prefix=".chroma_restore_", dir=parent)
+    with tarfile.open(archive, "r:gz") as tar:
+        tar.extractall(staging, filter="data")
+    if not os.path.exists(os.path.join(staging, SQLITE_FILE)):
+        shutil.rmtree(staging, ignore_errors=True)
+        print(f"❌ 에러: '{archive}'에 {SQLITE_FILE}가 없습니다. chroma_admin.py snapshot으로 만든 파일인지 확인해주세요.")
+        return False
+
+    # 같은 디스크 안에서 이름만 바꾸므로, DB 폴더가 비어 있는 순간이 거의 없습니다.
+    backup = None
+    if os.path.exists(db_path):
+        backup = f"{os.path.normpath(db_path)}.before_restore_{time.strftime('%Y%m%d%H%M%S')}"
+        os.rename(db_path, backup)
+    os.rename(staging, db_path)
+    print(f"✅ '{archive}'에서 복원 완료!" + (f" 이전 DB는 '{backup}'에 보관했습니다." if backup else ""))
+    print("   실행 중인 앱이 있다면 다시 시작해주세요.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="chroma_db 컬렉션 목록/정리/스냅샷/복원 도구")
+    parser.add_argument("--db", default=DB_PATH, help=f"DB 경로 (기본값: {DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="컬렉션별 문서 수와 디스크 크기")
+    gc_parser = commands.add_parser("gc", help="고아 세그먼트 폴더와 오래된 버전 정리")
+    gc_parser.add_argument("--dry-run", action="store_true", help="지울 대상만 출력")
+    gc_parser.add_argument("--stale", action="store_true", help="아무도 쓰지 않는 컬렉션도 삭제")
+    gc_parser.add_argument("--keep", type=int, default=collection_alias.KEEP_VERSIONS, help="별칭당 남길 버전 수")
+    alias_parser = commands.add_parser("alias", help="별칭이 가리키는 컬렉션 바꾸기 (되돌리기)")
+    alias_parser.add_argument("alias")
+    alias_parser.add_argument("collection")
+    snapshot_parser = commands.add_parser("snapshot", help="DB 스냅샷(.tar.gz) 만들기")
+    snapshot_parser.add_argument("--output", default=SNAPSHOT_DIR, help=f"저장 폴더 (기본값: {SNAPSHOT_DIR})")
+    restore_parser = commands.add_parser("restore", help="스냅샷으로 DB 복원")
+    restore_parser.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_collections(args.db)
+    elif args.command == "gc":
+        garbage_collect(args.db, dry_run=args.dry_run, stale=args.stale, keep=max(1, args.keep))
+    elif args.command == "alias":
+        point_alias(args.db, args.alias, args.collection)
+    elif args.command == "snapshot":
+        snapshot(args.db, args.output)
+    elif args.command == "restore":
+        restore(args.db, args.archive)
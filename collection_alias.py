@@ -0,0 +1,151 @@
+# collection_alias.py
+"""
+ChromaDB 컬렉션을 버전별로 새로 만들고, 별칭 파일 하나로 '지금 서비스 중인 버전'을 가리킵니다. (블루/그린 교체)
+
+예전에는 DB를 다시 구축할 때 컬렉션을 지우고(delete_collection) 새로 만들었기 때문에,
+구축하는 동안 들어온 채팅 질문은 없는 컬렉션이나 반쯤 채워진 컬렉션을 조회했습니다.
+이제는 'structured_data__v20261019153000'처럼 새 버전 컬렉션을 끝까지 채운 뒤에
+별칭 파일(chroma_db/collection_aliases.json)만 os.replace로 한 번에 바꿔치기합니다.
+
+- chatbot_engine은 질문마다 별칭을 다시 읽으므로, 교체 직후의 질문부터 새 버전을 봅니다.
+- 직전 버전은 KEEP_VERSIONS만큼 남겨 두어 교체 순간에 조회 중이던 요청과 되돌리기(rollback)에 씁니다.
+- 별칭 파일이 없거나 별칭이 등록되지 않았으면 이름을 그대로 씁니다. (예전 방식으로 만든 DB 호환)
+
+    collection = collection_alias.create_version(client, "structured_data")
+    ...  # collection.add(...)
+    collection_alias.promote(client, DB_PATH, "structured_data", collection.name)
+
+    collection = collection_alias.open_collection(client, DB_PATH, "structured_data")
+"""
+import os
+import json
+import shutil
+import sqlite3
+import time
+
+# --- 설정 ---
+ALIAS_FILE_NAME = "collection_aliases.json"  # DB 폴더 안에 둡니다. (스냅샷/복원 때 DB와 함께 움직이도록)
+KEEP_VERSIONS = 2  # 별칭당 남겨 두는 버전 수 (서비스 중인 버전 포함)
+COMPRESSED_INDEX_DIR = "compressed"  # DB 폴더 아래 컬렉션 이름별 압축 색인 폴더 (compressed_index.py), 컬렉션과 함께 지웁니다.
+# ------------------------------------
+
+VERSION_SEPARATOR = "__v"
+
+
+def alias_path(db_path):
+    return os.path.join(db_path, ALIAS_FILE_NAME)
+
+
+def load_aliases(db_path):
+    """{별칭: 실제 컬렉션 이름}. 별칭 파일이 없으면 빈 dict."""
+    try:
+        with open(alias_path(db_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def resolve(db_path, alias):
+    """별칭이 가리키는 실제 컬렉션 이름. 등록되지 않은 별칭은 이름 그대로 반환합니다."""
+    return load_aliases(db_path).get(alias, alias)
+
+
+def open_collection(client, db_path, alias):
+    return client.get_collection(name=resolve(db_path, alias))
+
+
+def set_alias(db_path, alias, name):
+    """별칭이 name을 가리키도록 별칭 파일을 바꿉니다. 이전에 가리키던 이름(없으면 None)을 반환합니다.
+
+    임시 파일에 다 쓴 뒤 os.replace로 바꾸므로, 읽는 쪽은 항상 이전 파일이나 새 파일 중 하나만 봅니다.
+    """
+    aliases = load_aliases(db_path)
+    previous = aliases.get(alias)
+    aliases[alias] = name
+    os.makedirs(db_path, exist_ok=True)
+    tmp_path = f"{alias_path(db_path)}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(aliases, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, alias_path(db_path))
+    return previous
+
+
+def is_version_of(name, alias):
+    return name == alias or name.startswith(alias + VERSION_SEPARATOR)
+
+
+def versions(client, alias):
+    """별칭의 모든 버전 이름을 오래된 것부터 반환합니다. 예전 방식으로 만든 별칭과 같은 이름의 컬렉션은 가장 오래된 버전으로 칩니다."""
+    names = [c.name for c in client.list_collections()]
+    legacy = [alias] if alias in names else []
+    return legacy + sorted(n for n in names if n.startswith(alias + VERSION_SEPARATOR))
+
+
+def create_version(client, alias, metadata=None):
+    """'별칭__v<시각>' 이름으로 새 버전 컬렉션을 만듭니다. 별칭은 아직 바꾸지 않습니다."""
+    existing = {c.name for c in client.list_collections()}
+    name = f"{alias}{VERSION_SEPARATOR}{time.strftime('%Y%m%d%H%M%S')}"
+    suffix = 1
+    while name in existing:  # 같은 초에 두 번 만든 경우 (번호를 0으로 채워 이름 순서가 만든 순서와 같게 합니다: _002 < _010)
+        name = f"{alias}{VERSION_SEPARATOR}{time.strftime('%Y%m%d%H%M%S')}_{suffix:03d}"
+        suffix += 1
+    return client.create_collection(name=name, metadata=metadata)
+
+
+def promote(client, db_path, alias, name, keep=KEEP_VERSIONS):
+    """별칭을 name으로 바꾸고, 서비스 중인 버전을 빼고 오래된 버전부터 keep개만 남기고 지웁니다.
+
+    반환값: (이전에 가리키던 이름, 지운 컬렉션 이름 목록)
+    """
+    previous = set_alias(db_path, alias, name)
+    old_versions = [n for n in versions(client, alias) if n != name]
+    removed = old_versions[:max(0, len(old_versions) - (keep - 1))]
+    for old in removed:
+        drop_collection(client, db_path, old)
+    return previous, removed
+
+
+# --- 세그먼트 정리 ---
+
+def segment_ids(db_path, collection_name=None):
+    """chroma.sqlite3에 등록된 세그먼트 id. collection_name을 주면 그 컬렉션의 세그먼트만 반환합니다."""
+    sqlite_path = os.path.join(db_path, "chroma.sqlite3")
+    if not os.path.exists(sqlite_path):
+        return set()
+    db = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    try:
+        if collection_name is None:
+            rows = db.execute("SELECT id FROM segments")
+        else:
+            rows = db.execute("SELECT s.id FROM segments s JOIN collections c ON s.collection = c.id WHERE c.name = ?",
+                              (collection_name,))
+        return {row[0] for row in rows}
+    finally:
+        db.close()
+
+
+def drop_collection(client, db_path, name):
+    """컬렉션을 지우고, Chroma가 남겨 두는 벡터 세그먼트 폴더와 그 컬렉션의 압축 색인 폴더까지 함께 지웁니다.
+    지운 폴더 크기(바이트)를 반환합니다.
+    """
+    segments = segment_ids(db_path, name)
+    client.delete_collection(name=name)
+    freed = 0
+    for folder in [os.path.join(db_path, segment) for segment in segments] + [compressed_index_path(db_path, name)]:
+        if os.path.isdir(folder):
+            freed += folder_size(folder)
+            shutil.rmtree(folder, ignore_errors=True)
+    return freed
+
+
+def compressed_index_path(db_path, name):
+    return os.path.join(db_path, COMPRESSED_INDEX_DIR, name)
+
+
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
@@ -0,0 +1,347 @@
+# compressed_index.py
+"""
+원본 텍스트 컬렉션의 임베딩을 '앞쪽 차원만 남기고(truncation) + 양자화(int8 또는 1비트)'한 압축 색인입니다.
+
+text-embedding-004 벡터(768차원 float32, 3KB)를 그대로 두면 대학이 늘어날수록 질문마다
+전체 차원의 거리 계산 비용과 메모리가 함께 커집니다. 압축 색인은 다음 두 단계로 검색합니다.
+
+1. 후보 찾기: 압축 벡터(예: 256차원 int8 = 256바이트)로 모든 문서의 대략적인 유사도를 계산해
+   n_results × rerank_factor개의 후보를 고릅니다.
+2. 재정렬: 후보의 원래 벡터(full.npy, mmap으로 필요한 행만 읽음)로 정확한 거리를 다시 계산합니다.
+
+색인 폴더 (chroma_db/compressed/<실제 컬렉션 이름>/):
+    index.json : 원본 컬렉션 이름, 설정, ids/documents/metadatas
+    codes.npy  : 압축 벡터 (int8: N×dims, binary: N×dims/8 비트 묶음)
+    scale.npy  : int8 양자화의 차원별 배율
+    full.npy   : 재정렬용 원래 벡터 (float32)
+
+컬렉션 버전(collection_alias.py)마다 폴더가 따로 생기므로, DB를 다시 구축하면 색인도 다시 만들어야 합니다.
+chatbot_engine은 EDAERO_RAW_INDEX=compressed이고 서비스 중인 버전의 색인이 있을 때만 압축 색인을 씁니다.
+
+    python compressed_index.py build --dims 512 --quantization int8
+    python compressed_index.py bench --sample 50        # recall@k와 지연 시간을 설정별로 비교
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+import numpy as np
+import collection_alias
+import tracing
+
+# --- 설정 ---
+DB_PATH = "chroma_db"
+COLLECTION_NAME = "raw_chunks_semantic"  # 압축 색인을 만드는 컬렉션 (별칭)
+DEFAULT_DIMS = 768  # 벤치마크(bench)로 recall을 확인한 뒤 줄이세요. (text-embedding-004는 앞쪽 차원일수록 정보가 많음)
+DEFAULT_QUANTIZATION = 'int8'  # 'int8' 또는 'binary'
+RERANK_FACTOR = 4  # 후보 수 = n_results × RERANK_FACTOR (0이면 재정렬 없이 압축 벡터 순위를 그대로 사용)
+SCORE_BLOCK_BYTES = 128 * 1024  # int8 점수 계산 때 한 번에 float32로 풀어 쓰는 압축 벡터 크기 (CPU 캐시에 들어가도록)
+# 벤치마크에서 비교할 설정
+BENCH_DIMS = (768, 512, 256, 128)
+BENCH_QUANTIZATIONS = ('int8', 'binary')
+BENCH_RERANK_FACTORS = (0, 2, 4, 10)
+BENCH_K = (3, 5)
+BENCH_OUTPUT = 'compressed_index_bench.json'
+# ------------------------------------
+
+QUANTIZATIONS = ('int8', 'binary')
+
+
+def index_path(db_path, collection_name):
+    # 컬렉션 버전이 지워질 때 색인도 함께 지워지도록 collection_alias와 같은 경로를 씁니다.
+    return collection_alias.compressed_index_path(db_path, collection_name)
+
+
+def _truncate(vectors, dims):
+    """앞쪽 dims 차원만 남기고 다시 단위 벡터로 맞춥니다."""
+    truncated = np.asarray(vectors, dtype=np.float32)[..., :dims]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.where(norms > 0, norms, 1.0)
+
+
+def quantize(vectors, dims, quantization):
+    """(codes, scale)을 반환합니다. binary는 scale이 None입니다."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"지원하지 않는 양자화 방식입니다: {quantization}")
+    truncated = _truncate(vectors, dims)
+    if quantization == 'binary':
+        return np.packbits(truncated > 0, axis=-1), None
+    # 차원별 최댓값이 127이 되도록 대칭 양자화합니다.
+    scale = np.abs(truncated).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(truncated / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+class CompressedIndex:
+    """압축 벡터로 후보를 고르고 원래 벡터로 재정렬하는 검색 색인"""
+
+    def __init__(self, ids, documents, metadatas, full, codes, scale, dims, quantization, collection=None):
+        self.ids, self.documents, self.metadatas = ids, documents, metadatas
+        self.full, self.codes, self.scale = full, codes, scale
+        self.dims, self.quantization, self.collection = dims, quantization, collection
+
+    @classmethod
+    def from_vectors(cls, ids, documents, metadatas, full, dims=DEFAULT_DIMS, quantization=DEFAULT_QUANTIZATION, collection=None):
+        full = np.asarray(full, dtype=np.float32)
+        dims = min(dims, full.shape[1])
+        codes, scale = quantize(full, dims, quantization)
+        return cls(list(ids), list(documents), list(metadatas), full, codes, scale, dims, quantization, collection)
+
+    @classmethod
+    def from_collection(cls, collection, dims=DEFAULT_DIMS, quantization=DEFAULT_QUANTIZATION):
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        return cls.from_vectors(data['ids'], data['documents'], data['metadatas'], data['embeddings'],
+                                dims, quantization, collection=collection.name)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "index.json"), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        scale_path = os.path.join(path, "scale.npy")
+        return cls(info['ids'], info['documents'], info['metadatas'],
+                   np.load(os.path.join(path, "full.npy"), mmap_mode='r'),
+                   np.load(os.path.join(path, "codes.npy")),
+                   np.load(scale_path) if os.path.exists(scale_path) else None,
+                   info['dims'], info['quantization'], info['collection'])
+
+    def save(self, path):
+        """임시 폴더에 다 쓴 뒤 이름을 바꿉니다."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "full.npy"), np.asarray(self.full, dtype=np.float32))
+        np.save(os.path.join(tmp_path, "codes.npy"), self.codes)
+        if self.scale is not None:
+            np.save(os.path.join(tmp_path, "scale.npy"), self.scale)
+        with open(os.path.join(tmp_path, "index.json"), 'w', encoding='utf-8') as f:
+            json.dump({'collection': self.collection, 'count': len(self), 'dims': self.dims,
+                       'quantization': self.quantization, 'ids': self.ids, 'documents': self.documents,
+                       'metadatas': self.metadatas}, f, ensure_ascii=False)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def code_bytes(self):
+        """문서 하나당 압축 벡터 크기(바이트)"""
+        return self.codes.shape[1] * self.codes.itemsize
+
+    def _approximate_scores(self, query):
+        """압축 벡터로 계산한 대략적인 유사도 (클수록 가까움)"""
+        q = _truncate(query, self.dims)
+        if self.quantization == 'binary':
+            bits = np.packbits(q > 0)
+            return -np.bitwise_count(np.bitwise_xor(self.codes, bits)).sum(axis=1, dtype=np.int32)
+        # codes × scale ≈ 원래 값이므로, 질의에 배율을 곱해 두면 codes를 그대로 내적할 수 있습니다.
+        q_scaled = q * self.scale
+        scores = np.empty(len(self), dtype=np.float32)
+        block_rows = max(1, SCORE_BLOCK_BYTES // self.codes.shape[1])
+        for start in range(0, len(self), block_rows):
+            block = self.codes[start:start + block_rows]
+            scores[start:start + len(block)] = block.astype(np.float32) @ q_scaled
+        return scores
+
+    def search_ids(self, query, n_results, rerank_factor=RERANK_FACTOR):
+        """(행 번호 배열, 거리 배열). rerank_factor가 0이면 거리는 압축 벡터 기준 값입니다."""
+        query = np.asarray(query, dtype=np.float32)
+        n_results = min(n_results, len(self))
+        if n_results <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        scores = self._approximate_scores(query)
+        n_candidates = min(len(self), n_results * rerank_factor) if rerank_factor else n_results
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        if not rerank_factor:
+            order = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return order, (-scores[order]).astype(np.float32)
+        # Chroma 기본 거리(제곱 L2)와 같은 값으로 재정렬합니다. (행 번호 순으로 읽어 mmap 접근을 순차적으로)
+        candidates = np.sort(candidates)
+        rows = np.asarray(self.full[candidates], dtype=np.float32)
+        distances = ((rows - query) ** 2).sum(axis=1)
+        best = np.argsort(distances, kind='stable')[:n_results]
+        return candidates[best], distances[best]
+
+    def query(self, query_embeddings, n_results=10, rerank_factor=RERANK_FACTOR):
+        """Chroma collection.query와 같은 모양의 결과를 반환합니다."""
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for query in query_embeddings:
+            rows, distances = self.search_ids(query, n_results, rerank_factor)
+            result['ids'].append([self.ids[i] for i in rows])
+            result['documents'].append([self.documents[i] for i in rows])
+            result['metadatas'].append([self.metadatas[i] for i in rows])
+            result['distances'].append([float(d) for d in distances])
+        return result
+
+
+class CompressedCollection:
+    """Chroma 컬렉션을 감싸 query만 압축 색인으로 처리합니다. 나머지 메서드(get, count 등)는 원래 컬렉션으로 넘깁니다."""
+
+    def __init__(self, collection, index, rerank_factor=RERANK_FACTOR):
+        self._collection = collection
+        self.index = index
+        self.rerank_factor = rerank_factor
+
+    def query(self, query_embeddings=None, n_results=10, **kwargs):
+        if kwargs or query_embeddings is None:
+            # where 필터 등 압축 색인이 지원하지 않는 검색은 Chroma로 보냅니다.
+            return self._collection.query(query_embeddings=query_embeddings, n_results=n_results, **kwargs)
+        return self.index.query(query_embeddings, n_results, self.rerank_factor)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def load_index(path):
+    """색인 폴더를 프로세스당 한 번만 불러옵니다. (index.json이 바뀌면 다시 불러옴) 폴더가 없으면 None."""
+    info_path = os.path.join(path, "index.json")
+    try:
+        mtime = os.path.getmtime(info_path)
+    except OSError:
+        return None
+    with _loaded_lock, tracing.span("index.load") as s:
+        cached = _loaded.get(path)
+        s.set(cache_hit=cached is not None and cached[0] == mtime)
+        if cached is None or cached[0] != mtime:
+            cached = _loaded[path] = (mtime, CompressedIndex.load(path))
+        return cached[1]
+
+
+def wrap_collection(collection, db_path=DB_PATH, rerank_factor=RERANK_FACTOR):
+    """collection(실제 버전 컬렉션)의 압축 색인이 있으면 CompressedCollection으로 감싸고, 없으면 None을 반환합니다."""
+    index = load_index(index_path(db_path, collection.name))
+    if index is None or index.collection != collection.name:
+        return None
+    return CompressedCollection(collection, index, rerank_factor)
+
+
+# --- build ---
+
+def build(db_path=DB_PATH, alias=COLLECTION_NAME, dims=DEFAULT_DIMS, quantization=DEFAULT_QUANTIZATION):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=db_path)
+    collection = collection_alias.open_collection(client, db_path, alias)
+    print(f"'{collection.name}' 컬렉션으로 압축 색인을 만듭니다... ({dims}차원, {quantization})")
+    index = CompressedIndex.from_collection(collection, dims, quantization)
+    path = index_path(db_path, collection.name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    index.save(path)
+    full_bytes = index.full.shape[1] * index.full.itemsize
+    print(f"✨ '{path}' 생성 완료! {len(index)}개 문서, 문서당 {full_bytes}바이트 → {index.code_bytes()}바이트")
+    return path
+
+
+# --- bench ---
+
+def _timed_ms(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _recall(found, truth):
+    return len(set(found) & set(truth)) / len(truth) if truth else 1.0
+
+
+def benchmark(collection, queries, ks=BENCH_K, dims_list=BENCH_DIMS, quantizations=BENCH_QUANTIZATIONS,
+              rerank_factors=BENCH_RERANK_FACTORS):
+    """queries([(질의 벡터, 제외할 id 또는 None), ...])로 설정별 recall@k와 질의당 지연 시간을 측정합니다.
+
+    정답은 원래 벡터 전체에 대한 정확한 검색(제곱 L2) 결과이고, 현재 Chroma 검색도 같은 기준으로 함께 측정합니다.
+    저장된 문서 벡터를 질의로 쓰는 경우 자기 자신(제외할 id)은 결과와 정답에서 뺍니다.
+    """
+    from benchmark import percentile
+
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    ids, full = data['ids'], np.asarray(data['embeddings'], dtype=np.float32)
+    k_max = max(ks)
+    n_fetch = min(len(ids), k_max + 1)
+
+    def top_ids(found, skip):
+        return [i for i in found if i != skip][:k_max]
+
+    truth = []
+    for vector, skip in queries:
+        distances = ((full - np.asarray(vector, dtype=np.float32)) ** 2).sum(axis=1)
+        truth.append(top_ids([ids[i] for i in np.argsort(distances, kind='stable')[:n_fetch]], skip))
+
+    def measure(search):
+        recalls, latencies = {k: [] for k in ks}, []
+        for (vector, skip), expected in zip(queries, truth):
+            found, elapsed = _timed_ms(search, vector)
+            latencies.append(elapsed)
+            found = top_ids(found, skip)
+            for k in ks:
+                recalls[k].append(_recall(found[:k], expected[:k]))
+        row = {f"recall@{k}": round(sum(v) / len(v), 4) for k, v in recalls.items()}
+        row.update(p50_ms=round(percentile(latencies, 50), 4), p95_ms=round(percentile(latencies, 95), 4))
+        return row
+
+    rows = [{"mode": "chroma", "dims": full.shape[1], "quantization": "float32", "rerank_factor": None,
+             "bytes_per_vector": full.shape[1] * full.itemsize,
+             **measure(lambda v: collection.query(query_embeddings=[v], n_results=n_fetch)['ids'][0])}]
+    for dims in dims_list:
+        for quantization in quantizations:
+            index = CompressedIndex.from_vectors(ids, data['documents'], data['metadatas'], full, dims, quantization)
+            for factor in rerank_factors:
+                rows.append({"mode": "compressed", "dims": index.dims, "quantization": quantization, "rerank_factor": factor,
+                             "bytes_per_vector": index.code_bytes(),
+                             **measure(lambda v: [ids[i] for i in index.search_ids(v, n_fetch, factor)[0]])})
+    return rows
+
+
+def print_bench(rows, ks=BENCH_K):
+    print(f"\n{'방식':<11}{'차원':>5} {'양자화':<8}{'재정렬':>5}{'바이트':>7}" + "".join(f"{f'recall@{k}':>11}" for k in ks) + f"{'p50':>10}{'p95':>10}")
+    for row in rows:
+        factor = "-" if row['rerank_factor'] is None else f"x{row['rerank_factor']}" if row['rerank_factor'] else "없음"
+        print(f"{row['mode']:<11}{row['dims']:>5} {row['quantization']:<8}{factor:>5}{row['bytes_per_vector']:>7}"
+              + "".join(f"{row[f'recall@{k}']:>11.3f}" for k in ks) + f"{row['p50_ms']:>8.3f}ms{row['p95_ms']:>8.3f}ms")
+
+
+def run_bench(db_path=DB_PATH, alias=COLLECTION_NAME, sample=50, output=BENCH_OUTPUT, seed=0):
+    """benchmark.QUESTIONS를 임베딩한 질의와, 저장된 문서 벡터 sample개를 질의로 써서 설정별로 비교합니다."""
+    import chromadb
+    import model_provider
+    from benchmark import QUESTIONS, git_commit
+
+    client = chromadb.PersistentClient(path=db_path)
+    collection = collection_alias.open_collection(client, db_path, alias)
+    provider = model_provider.get_provider()
+    queries = [(vector, None) for vector in provider.embed(QUESTIONS, task_type="retrieval_query")]
+    if sample:
+        data = collection.get(include=["embeddings"])
+        picks = np.random.default_rng(seed).choice(len(data['ids']), size=min(sample, len(data['ids'])), replace=False)
+        queries += [(data['embeddings'][i], data['ids'][i]) for i in picks]
+    print(f"'{collection.name}' 컬렉션({collection.count()}개 문서)에서 질의 {len(queries)}개로 측정합니다...")
+
+    rows = benchmark(collection, queries)
+    print_bench(rows)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "collection": collection.name,
+                   "documents": collection.count(), "queries": len(queries), "results": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n✨ 결과가 '{output}' 파일로 저장되었습니다.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="원본 텍스트 컬렉션의 압축 색인 만들기/벤치마크")
+    parser.add_argument("--db", default=DB_PATH, help=f"DB 경로 (기본값: {DB_PATH})")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help=f"컬렉션 별칭 (기본값: {COLLECTION_NAME})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="서비스 중인 버전의 압축 색인 만들기")
+    build_parser.add_argument("--dims", type=int, default=DEFAULT_DIMS, help="남길 앞쪽 차원 수")
+    build_parser.add_argument("--quantization", choices=QUANTIZATIONS, default=DEFAULT_QUANTIZATION)
+    bench_parser = commands.add_parser("bench", help="설정별 recall@k와 지연 시간 비교")
+    bench_parser.add_argument("--sample", type=int, default=50, help="질의로 쓸 저장 문서 벡터 수")
+    bench_parser.add_argument("--output", default=BENCH_OUTPUT, help="결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.db, args.collection, args.dims, args.quantization)
+    elif args.command == "bench":
+        run_bench(args.db, args.collection, args.sample, args.output)
@@ -0,0 +1,60 @@
+# document_registry.py
+"""
+이미 처리한 PDF를 내용(SHA-256) 기준으로 기록하는 Firestore 레지스트리입니다.
+
+파일 이름이 달라도 바이트가 같은 PDF라면 OCR/추출을 다시 하지 않고 기존 결과 파일을 연결합니다.
+'processed_documents/{sha256}' 문서에 결과 파일 경로와 지금까지 올라온 파일 이름들을 저장합니다.
+"""
+import hashlib
+
+# --- 설정 ---
+REGISTRY_COLLECTION = 'processed_documents'
+HASH_CHUNK_SIZE = 1024 * 1024  # 파일을 1MB씩 읽어 해시를 계산합니다.
+# ------------------------------------
+
+
+def sha256_of_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_of_file(fileobj, chunk_size=HASH_CHUNK_SIZE):
+    """파일 객체 전체를 메모리에 올리지 않고 해시를 계산한 뒤, 읽기 위치를 처음으로 되돌립니다."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def find_processed(db, sha256):
+    """같은 내용의 PDF를 처리한 기록이 있으면 그 기록(dict)을, 없으면 None을 반환합니다."""
+    doc = db.collection(REGISTRY_COLLECTION).document(sha256).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def register_processed(db, sha256, file_name, result_path):
+    """처리가 끝난 PDF의 해시와 결과 파일 경로를 기록합니다."""
+    from firebase_admin import firestore
+
+    db.collection(REGISTRY_COLLECTION).document(sha256).set({
+        'sha256': sha256,
+        'file_name': file_name,
+        'result_path': result_path,
+        'aliases': firestore.ArrayUnion([file_name]),
+        'processed_at': firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+
+
+def link_to_existing(db, sha256, file_name, record):
+    """새 파일 이름을 기존 처리 결과에 연결하고, 진행 문서를 '완료'로 표시합니다."""
+    from firebase_admin import firestore
+
+    db.collection(REGISTRY_COLLECTION).document(sha256).set({'aliases': firestore.ArrayUnion([file_name])}, merge=True)
+    db.collection('progress').document(file_name).set({
+        'status': f"완료 (기존 결과 재사용: {record.get('file_name')})",
+        'progress': 100,
+        'result_path': record.get('result_path'),
+        'linked_sha256': sha256,
+        'timestamp': firestore.SERVER_TIMESTAMP,
+    })
@@ -0,0 +1,184 @@
+# fanout.py
+"""
+PDF 한 개를 페이지 범위(샤드)로 나누어 여러 워커 함수 인스턴스에서 병렬로 처리하기 위한 도구 모음입니다.
+
+- 코디네이터(process_pdf_on_upload): 페이지 수를 세고 샤드 작업들을 태스크 큐에 넣습니다.
+- 워커(process_pdf_shard): 자기 페이지 범위만 OCR + 학과별 정보 추출을 한 뒤, 결과를 Storage에 쓰고 Firestore에 완료를 기록합니다.
+- 리듀서: 모든 샤드가 완료되면 마지막 워커 하나가 '--- Page N ---' 텍스트를 이어 붙이고 department_info를 합칩니다.
+
+작업 상태는 Firestore 'fanout_jobs/{job_id}' 문서에, 샤드 결과는 Storage 'fanout/{job_id}/' 폴더에 저장됩니다.
+로컬 테스트에서는 set_task_queue(LocalTaskQueue(handler))로 Cloud Tasks 대신 프로세스 내부 큐를 사용합니다.
+"""
+import json
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# --- 설정 ---
+SHARD_PAGES = 10  # 샤드 하나가 맡는 페이지 수 (학과별 정보 추출 청크 크기와 같게 맞춤)
+FANOUT_MIN_PAGES = 30  # 이보다 페이지가 적으면 나누지 않고 한 인스턴스에서 처리합니다.
+MAX_CONCURRENT_SHARDS = 10  # 동시에 실행되는 워커 수 상한 (Gemini 분당 요청 한도 고려)
+SHARD_MAX_ATTEMPTS = 5  # 샤드 작업 하나의 최대 시도 횟수 (Cloud Tasks 재시도 포함)
+JOBS_COLLECTION = 'fanout_jobs'
+SHARD_PREFIX = 'fanout'
+WORKER_FUNCTION = 'locations/asia-northeast3/functions/process_pdf_shard'
+# ------------------------------------
+
+
+def plan_shards(total_pages, shard_pages=SHARD_PAGES):
+    """[(시작 페이지, 끝 페이지), ...] 목록을 반환합니다. (1부터 시작, 끝 페이지 포함)"""
+    return [(start, min(start + shard_pages - 1, total_pages)) for start in range(1, total_pages + 1, shard_pages)]
+
+
+def shard_blob_path(job_id, index):
+    return f"{SHARD_PREFIX}/{job_id}/shard_{index:04d}.json"
+
+
+# --- 작업 상태 (Firestore) ---
+
+def create_job(db, job_id, file_name, bucket_name, file_hash, total_pages, total_shards):
+    from firebase_admin import firestore
+
+    db.collection(JOBS_COLLECTION).document(job_id).set({
+        'file_name': file_name, 'bucket': bucket_name, 'file_hash': file_hash,
+        'total_pages': total_pages, 'total_shards': total_shards, 'done': {},
+        'status': 'running', 'created_at': firestore.SERVER_TIMESTAMP,
+    })
+
+
+def get_job(db, job_id):
+    return db.collection(JOBS_COLLECTION).document(job_id).get().to_dict()
+
+
+def mark_shard_done(db, job_id, index):
+    """샤드 완료를 기록하고 (완료된 샤드 수, 전체 샤드 수, 작업이 이미 실패했는지)를 반환합니다.
+
+    'done' 맵에 샤드 번호를 키로 병합하므로, 같은 작업이 재시도되어도 한 번만 셉니다.
+    """
+    job_ref = db.collection(JOBS_COLLECTION).document(job_id)
+    job_ref.set({'done': {str(index): True}}, merge=True)
+    job = job_ref.get().to_dict()
+    return len(job.get('done') or {}), job['total_shards'], job.get('status') == 'failed'
+
+
+def mark_shard_failed(db, job_id, index, error):
+    """재시도를 모두 써 버린 샤드를 'failed' 맵에 기록하고 작업 전체를 실패로 표시합니다.
+
+    실패한 샤드는 끝내 완료되지 않으므로 리듀스도 실행되지 않습니다.
+    """
+    from firebase_admin import firestore
+
+    db.collection(JOBS_COLLECTION).document(job_id).set({
+        'failed': {str(index): str(error)}, 'status': 'failed', 'failed_at': firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+
+
+def is_last_attempt(retry_count, max_attempts=SHARD_MAX_ATTEMPTS):
+    """이번 시도가 마지막인지 판단합니다. retry_count는 앞서 실패한 횟수입니다. (X-CloudTasks-TaskRetryCount 헤더)"""
+    return retry_count + 1 >= max_attempts
+
+
+def claim_reduce(db, job_id):
+    """리듀스를 맡을 워커를 하나만 고릅니다. 잠금 문서를 처음 만든 워커만 True를 받습니다."""
+    from firebase_admin import firestore
+    from google.api_core.exceptions import AlreadyExists
+
+    try:
+        _reduce_lock(db, job_id).create({'claimed_at': firestore.SERVER_TIMESTAMP})
+        return True
+    except AlreadyExists:
+        return False
+
+
+def release_reduce(db, job_id):
+    """리듀스가 실패하면 잠금을 풀어, 재시도된 작업이 다시 리듀스를 맡을 수 있게 합니다."""
+    _reduce_lock(db, job_id).delete()
+
+
+def _reduce_lock(db, job_id):
+    return db.collection(JOBS_COLLECTION).document(job_id).collection('locks').document('reduce')
+
+
+def complete_job(db, job_id, result_path):
+    db.collection(JOBS_COLLECTION).document(job_id).set({'status': 'done', 'result_path': result_path}, merge=True)
+
+
+# --- 샤드 결과 (Storage) ---
+
+def shard_exists(bucket, job_id, index):
+    return bucket.blob(shard_blob_path(job_id, index)).exists()
+
+
+def write_shard(bucket, job_id, index, start_page, end_page, text, department_info):
+    shard = {'start_page': start_page, 'end_page': end_page, 'text': text, 'department_info': department_info}
+    bucket.blob(shard_blob_path(job_id, index)).upload_from_string(
+        json.dumps(shard, ensure_ascii=False), content_type='application/json')
+
+
+def iter_shards(bucket, job_id, total_shards):
+    """샤드 결과를 페이지 순서대로 하나씩 읽어옵니다. (샤드 번호 순서 = 페이지 순서)"""
+    for index in range(total_shards):
+        yield json.loads(bucket.blob(shard_blob_path(job_id, index)).download_as_bytes())
+
+
+def delete_shards(bucket, job_id):
+    for blob in bucket.list_blobs(prefix=f"{SHARD_PREFIX}/{job_id}/"):
+        blob.delete()
+
+
+# --- 태스크 큐 ---
+
+class LocalTaskQueue:
+    """Cloud Tasks 큐 대신 쓰는 프로세스 내부 큐 (로컬 테스트용).
+
+    firebase_admin.functions.TaskQueue와 같은 enqueue(task_data) 인터페이스를 가지며,
+    작업을 스레드 풀에서 실행하고 실패하면 max_attempts까지 다시 시도합니다.
+    handler가 retry_count 인자를 받으면 Cloud Tasks의 재시도 횟수 헤더처럼 앞서 실패한 횟수를 넘겨줍니다.
+    """
+
+    def __init__(self, handler, max_workers=MAX_CONCURRENT_SHARDS, max_attempts=SHARD_MAX_ATTEMPTS):
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, task_data, opts=None):
+        with self._lock:
+            task_id = f"local-{len(self._futures)}"
+            self._futures.append(self._executor.submit(self._run, task_id, task_data))
+        return task_id
+
+    def _run(self, task_id, task_data):
+        takes_retry_count = 'retry_count' in inspect.signature(self.handler).parameters
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if takes_retry_count:
+                    return self.handler(task_data, retry_count=attempt - 1)
+                return self.handler(task_data)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                print(f"    - ❗️ 작업 {task_id} 실패, 다시 시도합니다 ({attempt}/{self.max_attempts}): {e}")
+
+    def join(self):
+        """넣은 작업이 모두 끝날 때까지 기다립니다. 최종 실패한 작업이 있으면 그 예외를 다시 발생시킵니다."""
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
+        for future in futures:
+            future.result()
+
+
+_task_queue = None
+
+def get_task_queue():
+    """샤드 작업을 넣을 큐를 반환합니다. set_task_queue()로 지정한 큐가 없으면 Cloud Tasks 큐를 사용합니다."""
+    if _task_queue is not None:
+        return _task_queue
+    from firebase_admin import functions
+    return functions.task_queue(WORKER_FUNCTION)
+
+def set_task_queue(queue):
+    global _task_queue
+    _task_queue = queue
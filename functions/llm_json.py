@@ -0,0 +1,207 @@
+# llm_json.py
+"""
+LLM 응답에서 JSON을 관대하게 읽어내는 파서와, 실패한 페이지 범위만 나누어 다시 요청하는 도우미입니다.
+
+응답이 max tokens에 걸려 배열 중간에서 잘리거나, 코드 펜스/주석/설명 문장이 섞여 있어도
+완전한 객체는 하나하나 raw_decode로 살려냅니다.
+
+    records = llm_json.parse_array(response.text)      # list (+ complete / truncated / skipped 속성)
+    info = llm_json.parse_object(response.text)         # dict, 읽을 수 없으면 {}
+    records = llm_json.extract_with_bisect(pages, extract_fn, report)
+"""
+import re
+import json
+
+# --- 설정 ---
+MIN_SPLIT_PAGES = 1  # 이 페이지 수까지 나누어 다시 요청합니다.
+MAX_RETRIES = 8  # 청크 하나(extract_with_bisect 호출 한 번)에서 다시 보낼 수 있는 최대 요청 수
+# ------------------------------------
+
+_decoder = json.JSONDecoder()
+_FENCE = re.compile(r"```(?:json|JSON)?")
+# 문자열("http://..." 안의 '//'는 그대로 둠) 또는 줄 끝까지의 '//' 주석
+_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\\n])*")|//[^\n]*')
+# 최상위 객체 사이의 경계 ('}' 다음 ',' 다음 '{')
+_OBJECT_BOUNDARY = re.compile(r"\}\s*,\s*(?=\{)")
+
+
+class ParsedArray(list):
+    """살려낸 객체 목록.
+
+    complete가 False면 응답의 일부를 읽지 못했다는 뜻입니다.
+    - truncated: 배열이 닫히지 않고 끝남 (응답이 잘림)
+    - skipped: 형식이 깨져서 건너뛴 객체 수
+    """
+
+    def __init__(self, items=(), truncated=False, skipped=0):
+        super().__init__(items)
+        self.truncated = truncated
+        self.skipped = skipped
+
+    @property
+    def complete(self):
+        return not self.truncated and not self.skipped
+
+
+def clean(text):
+    """코드 펜스와 '//' 주석을 지웁니다. 줄 전체가 주석인 경우뿐 아니라 값 뒤에 붙은 주석도 지우고, 문자열 안은 건드리지 않습니다."""
+    text = _FENCE.sub("", text or "")
+    return _STRING_OR_COMMENT.sub(lambda m: m.group(1) or "", text).strip()
+
+
+def parse_array(text):
+    """JSON 배열 응답에서 완전한 객체들을 모두 살려 ParsedArray로 반환합니다."""
+    text = clean(text)
+    try:
+        value = json.loads(text)
+        if isinstance(value, list):
+            return ParsedArray(value)
+        if isinstance(value, dict):
+            # {"department_info": [...]}처럼 배열을 객체로 감싸 응답한 경우
+            lists = [v for v in value.values() if isinstance(v, list)]
+            return ParsedArray(lists[0] if len(lists) == 1 else [value])
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find("[")
+    bracketed = start >= 0
+    if not bracketed:
+        # 배열 없이 객체만 나열된 경우도 살립니다.
+        start = text.find("{") - 1
+        if start < -1:
+            return ParsedArray(truncated=True)
+    items, skipped, pos = [], 0, start + 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text):
+            return ParsedArray(items, truncated=bracketed, skipped=skipped)
+        if text[pos] == "]":
+            return ParsedArray(items, skipped=skipped)
+        try:
+            obj, pos = _decoder.raw_decode(text, pos)
+            items.append(obj)
+        except json.JSONDecodeError:
+            # 깨진 객체는 건너뛰고 다음 최상위 객체부터 다시 읽습니다.
+            boundary = _OBJECT_BOUNDARY.search(text, pos)
+            if boundary is None:
+                # 뒤에 더 읽을 객체가 없으면 응답이 잘린 것으로 봅니다.
+                return ParsedArray(items, truncated=True, skipped=skipped)
+            skipped += 1
+            pos = boundary.end()
+
+
+def parse_object(text):
+    """JSON 객체 응답을 읽습니다. 앞뒤에 설명이 붙어 있어도 첫 객체를 읽고, 실패하면 {}를 반환합니다."""
+    text = clean(text)
+    start = text.find("{")
+    if start < 0:
+        return {}
+    try:
+        value, _ = _decoder.raw_decode(text, start)
+        return value if isinstance(value, dict) else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+def page_of(record):
+    """레코드의 source_page에서 첫 페이지 번호(int)를 읽습니다. 없으면 None."""
+    match = re.search(r"\d+", str(record.get("source_page") or "")) if isinstance(record, dict) else None
+    return int(match.group(0)) if match else None
+
+
+class BisectReport:
+    """extract_with_bisect의 재시도 결과 요약"""
+
+    def __init__(self):
+        self.retries = 0            # 다시 보낸 요청 수
+        self.recovered_pages = []   # 재시도로 결과를 얻은 페이지
+        self.failed_pages = []      # 한 페이지까지 나누어도 완전히 읽지 못한 페이지
+
+    def summary(self):
+        if not self.retries and not self.failed_pages:
+            return "재시도 없음"
+        text = f"재시도 {self.retries}회, 복구한 페이지 {len(self.recovered_pages)}개 {sorted(self.recovered_pages)}"
+        if self.failed_pages:
+            text += f", 완전히 읽지 못한 페이지 {sorted(self.failed_pages)}"
+        return text
+
+
+def extract_with_bisect(pages, extract, report=None, max_retries=MAX_RETRIES, _budget=None, _partial=None):
+    """pages([(페이지 번호, 텍스트), ...])에서 레코드를 추출하고, 실패한 부분만 더 작은 범위로 다시 요청합니다.
+
+    extract(pages)는 ParsedArray를 반환해야 합니다. (예외가 나면 아무것도 읽지 못한 것으로 봅니다)
+    - 응답이 끝에서 잘렸으면: 마지막으로 읽은 레코드의 페이지 앞까지는 그대로 쓰고, 그 페이지부터만 다시 요청합니다.
+    - 그 밖의 실패는: 범위를 반으로 나누어 각각 다시 요청합니다.
+    재시도는 max_retries번까지만 하고, 그 뒤에 실패한 범위는 이전 응답에서 읽은 만큼만 사용합니다.
+    """
+    report = report if report is not None else BisectReport()
+    retry = _budget is not None
+    if retry:
+        # 다시 요청하기 전에 남은 재시도 횟수를 확인합니다. (나누어진 범위마다 한 번씩 요청하므로)
+        if _budget[0] <= 0:
+            report.failed_pages.extend(num for num, _ in pages)
+            return list(_partial or [])
+        _budget[0] -= 1
+        report.retries += 1
+    else:
+        _budget = [max_retries]
+    try:
+        records = extract(pages)
+    except Exception as e:
+        print(f"    - ❗️ {_page_range(pages)} 처리 중 오류 발생: {e}")
+        records = ParsedArray(truncated=True)
+    if retry and not records and _partial:
+        records = ParsedArray(_partial, truncated=True)  # 다시 요청한 응답이 더 나쁘면 이전 응답에서 읽은 만큼을 씁니다.
+
+    if records.complete:
+        if retry:
+            report.recovered_pages.extend(num for num, _ in pages)
+        return list(records)
+    if len(pages) <= MIN_SPLIT_PAGES or _budget[0] <= 0:
+        report.failed_pages.extend(num for num, _ in pages)
+        return list(records)
+
+    last_page = max((p for p in map(page_of, records) if p is not None), default=None)
+    if records.truncated and not records.skipped and last_page is not None and pages[0][0] < last_page <= pages[-1][0]:
+        kept = [r for r in records if page_of(r) is not None and page_of(r) < last_page]
+        remaining = [(num, text) for num, text in pages if num >= last_page]
+        partial = [r for r in records if page_of(r) is not None and page_of(r) >= last_page]
+        print(f"    - 🔁 응답이 잘려 {_page_range(remaining)}만 다시 요청합니다. ({len(kept)}개 레코드는 그대로 사용)")
+        return kept + extract_with_bisect(remaining, extract, report, _budget=_budget, _partial=partial)
+
+    half = len(pages) // 2
+    split_page = pages[half][0]
+    first = [r for r in records if page_of(r) is None or page_of(r) < split_page]
+    second = [r for r in records if page_of(r) is not None and page_of(r) >= split_page]
+    print(f"    - 🔁 {_page_range(pages)} 응답을 읽지 못해 두 범위로 나누어 다시 요청합니다.")
+    return (extract_with_bisect(pages[:half], extract, report, _budget=_budget, _partial=first)
+            + extract_with_bisect(pages[half:], extract, report, _budget=_budget, _partial=second))
+
+
+def _page_range(pages):
+    return f"{pages[0][0]}~{pages[-1][0]} 페이지" if pages else "빈 범위"
+
+
+def _self_check():
+    """python llm_json.py 로 실행하는 간단한 자체 점검 (깨진 응답 사례)"""
+    records = parse_array('[{"a":1}, // c\n{"b":2}]')
+    assert records == [{"a": 1}, {"b": 2}] and records.complete, records
+    records = parse_array('[{"url": "http://example.com"} // 끝\n]')
+    assert records == [{"url": "http://example.com"}] and records.complete, records
+
+    # 계속 실패하는 응답: 나누어 다시 보내는 요청이 max_retries번을 넘지 않아야 합니다.
+    calls = []
+    def always_broken(pages):
+        calls.append(pages)
+        return ParsedArray([{"source_page": pages[0][0]}], skipped=1)
+    pages = [(num, "") for num in range(1, 33)]
+    report = BisectReport()
+    records = extract_with_bisect(pages, always_broken, report, max_retries=5)
+    assert len(calls) == 1 + 5 and report.retries == 5, (len(calls), report.retries)
+    assert records, "재시도를 다 쓴 범위도 이전 응답에서 읽은 레코드는 남아야 합니다."
+    print("✅ llm_json 자체 점검 통과")
+
+
+if __name__ == "__main__":
+    _self_check()
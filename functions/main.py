@@ -1,15 +1,18 @@
 import os
-import json
 import time
-import re
-import firebase_admin
-from firebase_admin import credentials, storage, firestore
-import fitz  # PyMuPDF
-from PIL import Image
-import google.generativeai as genai
+import model_provider
+import document_registry
+import fanout
+import llm_json
+import page_store
+import table_extractor
+import vision_ocr
+import record_stream
+import tracing
 
 # Firebase Functions 라이브러리 임포트
-from firebase_functions import storage_fn
+from firebase_functions import storage_fn, tasks_fn
+from firebase_functions.options import RetryConfig, RateLimits
 from cloudevents.http import CloudEvent
 
 # --- RUCAS LEE님 최종 설정 ---
@@ -17,90 +20,173 @@ VISION_MODEL = 'gemini-2.5-flash'
 EXTRACTION_MODEL = 'gemini-2.5-flash'
 # ------------------------------------
 
-# 앱 초기화는 함수 밖에서 한번만 수행합니다.
-# 클라우드 환경에서는 서비스 계정 키 파일이 필요 없습니다.
-firebase_admin.initialize_app()
+# firebase_admin, PyMuPDF는 import만으로 수백 ms가 걸리므로 실제로 필요한 함수 안에서 불러옵니다.
+# (배포 시 함수 목록을 읽기 위해 모듈을 import할 때나 PDF가 아닌 파일 이벤트에서는 비용을 치르지 않습니다.)
 # Gemini API 키는 Cloud Function의 환경 변수로 설정할 것입니다.
-genai.configure(api_key=os.environ.get('GOOGLE_API_KEY'))
+# 모델 클라이언트는 model_provider가 처음 호출될 때 한번만 설정하고, 웜 인스턴스에서 재사용합니다.
 
+def _ensure_app():
+    """Firebase 앱을 처음 호출될 때 한번만 초기화합니다. 클라우드 환경에서는 서비스 계정 키 파일이 필요 없습니다."""
+    import firebase_admin
 
-def update_progress(db, filename, status, progress):
-    """Firestore에 현재 진행 상태를 업데이트합니다."""
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app()
+
+
+# 파일별 현재 단계와 시작 시각 (단계별 소요 시간 기록용)
+_stage_clock = {}
+
+def update_progress(db, filename, status, progress, stage=None, **fields):
+    """Firestore에 현재 진행 상태를 업데이트합니다.
+
+    stage가 바뀌면 직전 단계의 소요 시간(초)을 'stage_timings'에 기록하고,
+    그 밖의 fields(pages_done, pages_per_minute 등)는 문서에 그대로 병합합니다.
+    """
     if db:
+        from firebase_admin import firestore
+
+        data = {'status': status, 'progress': progress, 'timestamp': firestore.SERVER_TIMESTAMP, **fields}
+        if stage:
+            now = time.time()
+            current = _stage_clock.get(filename)
+            if current is None or current[0] != stage:
+                if current:
+                    data['stage_timings'] = {current[0]: round(now - current[1], 1)}
+                _stage_clock[filename] = (stage, now)
+                data['stage'] = stage
+        if stage == 'done' or progress < 0:
+            _stage_clock.pop(filename, None)
         doc_ref = db.collection('progress').document(filename)
-        doc_ref.set({'status': status, 'progress': progress, 'timestamp': firestore.SERVER_TIMESTAMP}, merge=True)
+        doc_ref.set(data, merge=True)
+
+def count_pages(pdf_bytes):
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return pdf_document.page_count
+
+def extract_text_with_vision(pdf_bytes, db, pdf_filename, first_page=1, last_page=None):
+    """(1단계) Vision API 텍스트 추출 및 진행 상황 보고
+
+    first_page~last_page(1부터 시작, 끝 포함) 범위만 처리할 수 있습니다. (병렬 처리 워커용)
+    """
+    import fitz  # PyMuPDF
 
-def extract_text_with_vision(pdf_bytes, db, pdf_filename):
-    """(1단계) Vision API 텍스트 추출 및 진행 상황 보고"""
     pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-    total_pages = pdf_document.page_count
-    full_text = ""
+    last_page = min(last_page or pdf_document.page_count, pdf_document.page_count)
+    total_pages = last_page - first_page + 1
+    pages = []
     base_progress, progress_range = 10, 40
+    started = time.time()
 
-    for page_num in range(total_pages):
-        current_progress = base_progress + int(((page_num + 1) / total_pages) * progress_range)
-        update_progress(db, pdf_filename, f"텍스트 추출 중 ({page_num + 1}/{total_pages} 페이지)", current_progress)
-        
-        page = pdf_document.load_page(page_num)
-        pix = page.get_pixmap(dpi=300)
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        
-        model = genai.GenerativeModel(VISION_MODEL)
-        prompt = "이 이미지는 문서의 한 페이지입니다. 이 페이지에 보이는 모든 텍스트를 빠짐없이, 순서대로 정확하게 추출해주세요."
-        
-        try:
-            response = model.generate_content([prompt, img], request_options={"timeout": 600})
-            full_text += f"\n\n--- Page {page_num + 1} ---\n{response.text}"
-            time.sleep(1)
-        except Exception as e:
-            update_progress(db, pdf_filename, f"오류: {page_num + 1} 페이지 처리 실패", current_progress)
-            full_text += f"\n\n--- Page {page_num + 1} ---\nError processing page: {e}"
+    update_progress(db, pdf_filename, f"텍스트 추출 중 (0/{total_pages} 페이지)", base_progress,
+                    stage='ocr', pages_done=0, total_pages=total_pages, pages_per_minute=0)
+    # 페이지 이미지를 크기에 맞춰 여러 장씩 묶어 한 요청으로 보내고, 묶음이 끝날 때마다 진행 상황을 기록합니다.
+    report = vision_ocr.OcrReport()
+    for batch in vision_ocr.ocr_document(pdf_document, first_page, last_page, VISION_MODEL, report):
+        pages.extend(batch)
+        pages_done = len(pages)
+        current_progress = base_progress + int((pages_done / total_pages) * progress_range)
+        elapsed_minutes = (time.time() - started) / 60
+        update_progress(db, pdf_filename, f"텍스트 추출 중 ({pages_done}/{total_pages} 페이지)", current_progress,
+                        stage='ocr', pages_done=pages_done, total_pages=total_pages,
+                        pages_per_minute=round(pages_done / elapsed_minutes, 1) if elapsed_minutes else 0)
+        for page_num, text in batch:
+            if text.startswith(vision_ocr.ERROR_PREFIX):
+                update_progress(db, pdf_filename, f"오류: {page_num} 페이지 처리 실패", current_progress)
+    print(f"    - 텍스트 추출 결과: {report.summary(total_pages)}")
     
-    return full_text
+    return page_store.join_pages(pages)
+
+def extract_tables(pdf_bytes, first_page=1, last_page=None):
+    """(1-2단계) 디지털 PDF의 모집 요강 표를 모델 호출 없이 학과별 레코드로 읽습니다."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return table_extractor.extract_tables(pdf_document, first_page, last_page)
 
 def get_common_info(full_text, db, pdf_filename):
     """(2-1단계) 전체 텍스트에서 공통 정보를 추출합니다."""
-    update_progress(db, pdf_filename, "공통 정보 분석 중...", 50)
-    model = genai.GenerativeModel(EXTRACTION_MODEL)
+    update_progress(db, pdf_filename, "공통 정보 분석 중...", 50, stage='common_info')
     prompt = f"주어진 입시요강 전체 텍스트에서 모든 지원자에게 공통적으로 적용되는 '공통 정보'를 찾아서 JSON 객체 형식으로 만들어줘. 찾아야 할 항목: \"application_period\", \"application_procedure\", \"application_fee\", \"csat_english_method\", \"csat_history_method\". 응답은 오직 JSON 객체만 포함해야 한다. --- 분석할 텍스트 ---\n{full_text}"
     try:
-        response = model.generate_content(prompt, request_options={"timeout": 600})
-        cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(cleaned_text)
+        with tracing.span("ingest.common_info", prompt_chars=len(prompt)) as s:
+            response = model_provider.get_provider().generate(prompt, model=EXTRACTION_MODEL, timeout=600)
+            s.set(output_chars=len(response.text), **tracing.usage_attrs(response))
+        return llm_json.parse_object(response.text)
     except Exception as e:
         update_progress(db, pdf_filename, "오류: 공통 정보 분석 실패", 55)
         return {}
 
-def structure_department_info_by_chunks(full_text, db, pdf_filename):
-    """(2-2단계) 전체 텍스트를 청크로 나누어 학과별 정보를 추출하고 종합합니다."""
-    update_progress(db, pdf_filename, "학과별 정보 상세 분석 준비 중...", 70)
-    pages = re.split(r'--- Page \d+ ---', full_text)
-    pages = [p.strip() for p in pages if p.strip()]
+def structure_department_info_by_chunks(full_text, db, pdf_filename, sink=None, tables=None):
+    """(2-2단계) 전체 텍스트를 청크로 나누어 학과별 정보를 추출하고 종합합니다.
+
+    sink(record_stream의 NDJSON 출력 대상)를 넘기면 청크가 끝날 때마다 레코드를 바로 내보내고
+    메모리에 모아두지 않습니다. 이때는 추출한 레코드 수를 반환합니다.
+    tables(table_extractor.TableExtraction)를 넘기면 표를 믿을 수 있는 페이지는 표에서 읽은 레코드를 쓰고 Gemini로 보내지 않습니다.
+    """
+    update_progress(db, pdf_filename, "학과별 정보 상세 분석 준비 중...", 70, stage='department_info')
+    # 원래 페이지 번호를 유지합니다. (병렬 처리 워커는 11페이지부터 시작하는 텍스트를 받을 수 있음)
+    pages = page_store.split_pages(full_text)
     
     final_department_info = []
+    if tables is not None:
+        pages = [(num, text) for num, text in pages if num not in tables.confident_pages]
+        if sink is not None:
+            sink.write_many(tables.records)
+            sink.flush()
+        else:
+            final_department_info.extend(tables.records)
     chunk_size = 10
     num_chunks = (len(pages) + chunk_size - 1) // chunk_size
+    report = llm_json.BisectReport()
+    model_records = 0
 
     for i in range(num_chunks):
         current_progress = 70 + int(((i + 1) / num_chunks) * 25)
-        update_progress(db, pdf_filename, f"학과별 정보 분석 중 (청크 {i+1}/{num_chunks})", current_progress)
-
-        start_index = i * chunk_size
-        end_index = start_index + chunk_size
-        text_chunk_with_pages = "".join([f"\n\n--- Page {p_num + 1} ---\n{pages[p_num]}" for p_num in range(start_index, min(end_index, len(pages)))])
-        
-        model = genai.GenerativeModel(EXTRACTION_MODEL)
-        prompt = f"주어진 입시요강 텍스트 일부를 분석하여, `department_info` JSON 배열 형식으로 만들어줘. 찾아야 할 항목: \"major\", \"recruitment_unit\", \"selection_category\", \"recruitment_number\", \"csat_ratios\", \"evaluation_method\", \"source_page\". 절대로 응답을 요약하거나 생략하지 말고, 찾은 모든 학과 정보를 생성해야 한다. 분석할 정보가 없다면 빈 배열 `[]`을 반환하세요. 응답은 오직 JSON 배열 형식이어야 한다. --- 분석할 텍스트 ---\n{text_chunk_with_pages}"
-        try:
-            response = model.generate_content(prompt, request_options={"timeout": 600})
-            cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-            chunk_result = json.loads(cleaned_text)
+        update_progress(db, pdf_filename, f"학과별 정보 분석 중 (청크 {i+1}/{num_chunks})", current_progress, stage='department_info')
+
+        chunk_pages = pages[i * chunk_size:(i + 1) * chunk_size]
+        # 응답이 잘리거나 깨지면 읽은 만큼은 살리고, 실패한 페이지 범위만 나누어 다시 요청합니다.
+        chunk_result = llm_json.extract_with_bisect(chunk_pages, lambda sub_pages: _extract_department_records(sub_pages, i + 1), report)
+        model_records += len(chunk_result)
+        if sink is not None:
+            sink.write_many(chunk_result)
+            sink.flush()
+        else:
             final_department_info.extend(chunk_result)
-        except Exception as e:
-            print(f"    - ❗️ 청크 {i+1} 처리 중 오류 발생: {e}")
-        time.sleep(1)
-        
-    return final_department_info
+
+    print(f"    - 학과별 정보 추출 재시도 결과: {report.summary()}")
+    if report.retries:
+        update_progress(db, pdf_filename, f"학과별 정보 분석 완료 ({report.summary()})", 95, stage='department_info',
+                        recovered_pages=sorted(report.recovered_pages), failed_pages=sorted(report.failed_pages))
+    if tables is not None:
+        print(f"    - 표 추출 결과: {tables.summary(model_records)}")
+        update_progress(db, pdf_filename, f"학과별 정보 분석 완료 ({tables.summary(model_records)})", 95, stage='department_info',
+                        table_records=len(tables.records), model_records=model_records, table_pages=sorted(tables.confident_pages))
+    return sink.count if sink is not None else final_department_info
+
+def _extract_department_records(chunk_pages, chunk_num):
+    """페이지 묶음 하나에서 학과별 정보를 추출합니다. 응답의 완전한 객체만 살린 llm_json.ParsedArray를 반환합니다."""
+    text_chunk_with_pages = page_store.join_pages(chunk_pages)
+    prompt = f"주어진 입시요강 텍스트 일부를 분석하여, `department_info` JSON 배열 형식으로 만들어줘. 찾아야 할 항목: \"major\", \"recruitment_unit\", \"selection_category\", \"recruitment_number\", \"csat_ratios\", \"evaluation_method\", \"source_page\". 절대로 응답을 요약하거나 생략하지 말고, 찾은 모든 학과 정보를 생성해야 한다. 분석할 정보가 없다면 빈 배열 `[]`을 반환하세요. 응답은 오직 JSON 배열 형식이어야 한다. --- 분석할 텍스트 ---\n{text_chunk_with_pages}"
+    with tracing.span("ingest.chunk_generate", chunk=chunk_num, pages=len(chunk_pages), prompt_chars=len(prompt)) as s:
+        response = model_provider.get_provider().generate(prompt, model=EXTRACTION_MODEL, timeout=600)
+        s.set(output_chars=len(response.text), **tracing.usage_attrs(response))
+    with tracing.span("ingest.chunk_parse", chunk=chunk_num) as s:
+        records = llm_json.parse_array(response.text)
+        s.set(records=len(records), skipped=records.skipped, truncated=int(records.truncated))
+    return records
+
+
+def _link_if_processed(db_client, file_hash, file_name):
+    """같은 내용의 PDF를 처리한 기록이 있으면 기존 결과를 연결하고 True를 반환합니다."""
+    record = document_registry.find_processed(db_client, file_hash)
+    if not record:
+        return False
+    document_registry.link_to_existing(db_client, file_hash, file_name, record)
+    print(f"'{file_name}'은 이미 처리된 '{record.get('file_name')}'과 내용이 같으므로 기존 결과를 재사용합니다.")
+    return True
 
 
 @storage_fn.on_object_finalized(region="asia-northeast3")
@@ -115,36 +201,206 @@ def process_pdf_on_upload(event: CloudEvent) -> None:
         print(f"'{file_name}'은 PDF 파일이 아니므로 무시합니다.")
         return
 
+    _ensure_app()
+    from firebase_admin import storage, firestore
+
     db_client = firestore.client()
     storage_bucket = storage.bucket(bucket_name)
 
-    update_progress(db_client, file_name, "PDF 다운로드 중...", 5)
+    # admin.py가 업로드 시 기록한 내용 해시가 있으면, 다운로드 전에 이미 처리된 문서인지 확인합니다.
+    metadata = event.data.get("metadata") or {}
+    force_reprocess = metadata.get("force_reprocess") == "true"
+    file_hash = metadata.get("sha256")
+    if file_hash and not force_reprocess and _link_if_processed(db_client, file_hash, file_name):
+        return
+
+    update_progress(db_client, file_name, "PDF 다운로드 중...", 5, stage='download')
     blob = storage_bucket.blob(file_name)
     if not blob:
         update_progress(db_client, file_name, "오류: Storage에서 파일을 찾을 수 없음", -1)
         return
-    pdf_bytes = blob.download_as_bytes()
-    
-    full_text = extract_text_with_vision(pdf_bytes, db_client, file_name)
-    
-    common_info = get_common_info(full_text, db_client, file_name)
-    department_info = structure_department_info_by_chunks(full_text, db_client, file_name)
-    
-    update_progress(db_client, file_name, "최종 JSON 파일 생성 중...", 95)
-    final_json = {
-        "university": "대학교 이름", "year": "2026", "document_title": file_name,
-        "common_info": common_info, "department_info": department_info
-    }
-    
+    with tracing.span("ingest", file=file_name):
+        with tracing.span("ingest.download") as s:
+            pdf_bytes = blob.download_as_bytes()
+            s.set(bytes=len(pdf_bytes))
+
+        # 메타데이터 없이 올라온 파일도 내용 해시로 한번 더 확인합니다.
+        if not file_hash:
+            file_hash = document_registry.sha256_of_bytes(pdf_bytes)
+            if not force_reprocess and _link_if_processed(db_client, file_hash, file_name):
+                return
+
+        # 페이지가 많으면 페이지 범위별 작업으로 나누어 여러 워커 인스턴스에서 병렬로 처리합니다.
+        total_pages = count_pages(pdf_bytes)
+        if total_pages >= fanout.FANOUT_MIN_PAGES:
+            _start_fanout(db_client, bucket_name, file_name, file_hash, total_pages)
+            return
+
+        with tracing.span("ingest.vision") as s:
+            full_text = extract_text_with_vision(pdf_bytes, db_client, file_name)
+            s.set(output_chars=len(full_text))
+        tables = extract_tables(pdf_bytes)
+
+        with _open_record_stream(storage_bucket, file_name) as sink:
+            sink.write_control('_common_info', get_common_info(full_text, db_client, file_name))
+            sink.flush()
+            with tracing.span("ingest.department_info") as s:
+                s.set(records=structure_department_info_by_chunks(full_text, db_client, file_name, sink=sink, tables=tables))
+
+    _finalize_result(db_client, storage_bucket, file_name, file_hash, sink.path, full_text)
+
+
+def _open_record_stream(storage_bucket, file_name):
+    """학과별 정보를 청크마다 덧붙일 NDJSON 스트림을 엽니다.
+
+    Storage 'results/result_{파일명}_final.ndjson'에 계속 이어 붙여지므로, 추출이 끝나기 전에도
+    'python build_structured_db.py --follow gs://버킷/results/...ndjson'으로 색인을 시작할 수 있습니다.
+    """
+    stream_filename = f"result_{os.path.splitext(file_name)[0]}_final.ndjson"
     # Cloud Function 환경에서는 /tmp/ 디렉토리에만 파일을 쓸 수 있습니다.
+    sink = record_stream.StorageNdjsonSink(storage_bucket, f"results/{stream_filename}", f"/tmp/{stream_filename}")
+    sink.write_control('_meta', {"university": "대학교 이름", "year": "2026", "document_title": file_name})
+    return sink
+
+
+def _finalize_result(db_client, storage_bucket, file_name, file_hash, stream_path, full_text):
+    """NDJSON 스트림으로 최종 JSON 파일을 만들어 Storage 'results/' 폴더에 올리고 처리 완료를 기록합니다.
+
+    출처 발췌에 쓰는 페이지 저장소(result_{파일명}_pages.bin)도 함께 올립니다.
+
+    결과 파일 경로를 반환합니다.
+    """
+    update_progress(db_client, file_name, "최종 JSON 파일 생성 중...", 95, stage='finalize')
     output_filename = f"result_{os.path.splitext(file_name)[0]}_final.json"
     local_tmp_path = f"/tmp/{output_filename}"
-    with open(local_tmp_path, 'w', encoding='utf-8') as f:
-        json.dump(final_json, f, ensure_ascii=False, indent=2)
+    record_stream.write_final_json(stream_path, local_tmp_path)
+    pages_filename = f"result_{os.path.splitext(file_name)[0]}_pages.bin"
+    pages_tmp_path = f"/tmp/{pages_filename}"
+    page_store.write_page_store(pages_tmp_path, page_store.split_pages(full_text, keep_empty=True))
     
     # 최종 결과 파일을 다시 Storage의 'results' 폴더에 업로드
     result_blob = storage_bucket.blob(f"results/{output_filename}")
     result_blob.upload_from_filename(local_tmp_path)
+    storage_bucket.blob(f"results/{pages_filename}").upload_from_filename(pages_tmp_path)
     print(f"최종 결과 파일을 Storage 'results/' 폴더에 업로드했습니다.")
-    
-    update_progress(db_client, file_name, "완료", 100)
\ No newline at end of file
+    # /tmp는 인스턴스 메모리를 차지하므로 웜 인스턴스에 남기지 않습니다.
+    for path in (stream_path, local_tmp_path, pages_tmp_path):
+        os.remove(path)
+    document_registry.register_processed(db_client, file_hash, file_name, f"results/{output_filename}")
+    _export_trace(storage_bucket, os.path.splitext(output_filename)[0])
+
+    update_progress(db_client, file_name, "완료", 100, stage='done')
+    return f"results/{output_filename}"
+
+
+def _export_trace(storage_bucket, name):
+    if tracing.ENABLED:
+        # 단계별 계측 결과도 Storage의 'traces/' 폴더에 남깁니다.
+        trace_path = f"/tmp/trace_{name}.jsonl"
+        tracing.export_jsonl(trace_path)
+        storage_bucket.blob(f"traces/{os.path.basename(trace_path)}").upload_from_filename(trace_path)
+        print(tracing.prometheus_text())
+        tracing.reset()  # 웜 인스턴스에서 다음 실행과 섞이지 않도록 비웁니다.
+
+
+# --- 병렬 처리 (코디네이터 / 워커 / 리듀서) ---
+
+def _start_fanout(db_client, bucket_name, file_name, file_hash, total_pages):
+    """(코디네이터) 페이지 범위별 샤드 작업을 만들어 태스크 큐에 넣습니다."""
+    shards = fanout.plan_shards(total_pages)
+    job_id = f"{file_hash[:16]}-{int(time.time())}"
+    fanout.create_job(db_client, job_id, file_name, bucket_name, file_hash, total_pages, len(shards))
+    update_progress(db_client, file_name, f"{total_pages}페이지를 {len(shards)}개 작업으로 나누어 처리 중 (0/{len(shards)})", 10,
+                    stage='fanout', shards_done=0, total_shards=len(shards), fanout_job=job_id)
+
+    queue = fanout.get_task_queue()
+    for index, (start_page, end_page) in enumerate(shards):
+        queue.enqueue({
+            "job_id": job_id, "bucket": bucket_name, "file_name": file_name,
+            "shard": index, "start_page": start_page, "end_page": end_page,
+        })
+    print(f"'{file_name}' ({total_pages}페이지)를 {len(shards)}개 샤드 작업으로 나누어 큐에 넣었습니다. (작업 ID: {job_id})")
+
+
+@tasks_fn.on_task_dispatched(
+    region="asia-northeast3", timeout_sec=540,
+    retry_config=RetryConfig(max_attempts=fanout.SHARD_MAX_ATTEMPTS, min_backoff_seconds=30),
+    rate_limits=RateLimits(max_concurrent_dispatches=fanout.MAX_CONCURRENT_SHARDS),
+)
+def process_pdf_shard(req: tasks_fn.CallableRequest) -> None:
+    """(워커) 태스크 큐에서 받은 페이지 범위 하나를 처리하는 Cloud Function."""
+    _ensure_app()
+    from firebase_admin import storage, firestore
+
+    retry_count = int(req.raw_request.headers.get("X-CloudTasks-TaskRetryCount", 0) or 0)
+    run_shard_task(req.data, firestore.client(), storage.bucket(req.data["bucket"]), retry_count=retry_count)
+
+
+def run_shard_task(task, db_client, storage_bucket, retry_count=0):
+    """샤드 하나를 처리하고, 마지막으로 끝난 샤드라면 리듀스까지 수행합니다.
+
+    재시도로 같은 작업이 다시 와도 이미 저장된 샤드 결과는 다시 만들지 않습니다.
+    마지막 재시도까지 실패하면 작업을 실패로 기록하고 진행 상태를 오류(-1)로 바꿉니다.
+    (그러지 않으면 진행 문서가 'fanout' 단계에 영원히 머물고 리듀스도 실행되지 않습니다.)
+    """
+    try:
+        _run_shard(task, db_client, storage_bucket)
+    except Exception as e:
+        if fanout.is_last_attempt(retry_count):
+            job_id, index = task["job_id"], task["shard"]
+            print(f"❌ 샤드 {index + 1} ({task['start_page']}~{task['end_page']} 페이지) 최종 실패: {e}")
+            fanout.mark_shard_failed(db_client, job_id, index, e)
+            update_progress(db_client, task["file_name"],
+                            f"오류: {task['start_page']}~{task['end_page']} 페이지 처리 실패 ({e})", -1,
+                            stage='fanout', failed_shard=index, fanout_job=job_id)
+        raise
+
+
+def _run_shard(task, db_client, storage_bucket):
+    job_id, index, file_name = task["job_id"], task["shard"], task["file_name"]
+    if not fanout.shard_exists(storage_bucket, job_id, index):
+        with tracing.span("ingest.shard", shard=index + 1, start_page=task["start_page"], end_page=task["end_page"]) as s:
+            pdf_bytes = storage_bucket.blob(file_name).download_as_bytes()
+            # 진행 상황은 샤드 단위로만 기록합니다. (여러 워커가 페이지 단위로 같은 문서를 덮어쓰지 않도록 db=None)
+            text = extract_text_with_vision(pdf_bytes, None, file_name, task["start_page"], task["end_page"])
+            tables = extract_tables(pdf_bytes, task["start_page"], task["end_page"])
+            department_info = structure_department_info_by_chunks(text, None, file_name, tables=tables)
+            fanout.write_shard(storage_bucket, job_id, index, task["start_page"], task["end_page"], text, department_info)
+            s.set(records=len(department_info))
+        _export_trace(storage_bucket, f"{job_id}_shard_{index:04d}")
+
+    done, total, failed = fanout.mark_shard_done(db_client, job_id, index)
+    if failed:
+        return  # 다른 샤드가 이미 최종 실패해 오류 상태를 덮어쓰지 않습니다.
+    if done < total:
+        update_progress(db_client, file_name, f"페이지 범위별 병렬 처리 중 ({done}/{total} 작업 완료)", 10 + int(done / total * 40),
+                        stage='fanout', shards_done=done, total_shards=total)
+        return
+
+    if fanout.claim_reduce(db_client, job_id):
+        try:
+            _reduce_job(db_client, storage_bucket, job_id)
+        except Exception:
+            fanout.release_reduce(db_client, job_id)
+            raise
+
+
+def _reduce_job(db_client, storage_bucket, job_id):
+    """(리듀서) 모든 샤드 결과를 페이지 순서대로 모아 최종 결과 파일을 만듭니다."""
+    job = fanout.get_job(db_client, job_id)
+    file_name = job['file_name']
+    update_progress(db_client, file_name, f"페이지 범위별 병렬 처리 완료 ({job['total_shards']}/{job['total_shards']} 작업)", 50,
+                    stage='fanout', shards_done=job['total_shards'], total_shards=job['total_shards'])
+    # 샤드를 하나씩 읽으며 학과 레코드는 바로 스트림에 내보내고, 텍스트만 이어 붙입니다.
+    text_parts = []
+    with _open_record_stream(storage_bucket, file_name) as sink:
+        for shard in fanout.iter_shards(storage_bucket, job_id, job['total_shards']):
+            text_parts.append(shard['text'])
+            sink.write_many(shard['department_info'])
+            sink.flush()
+        full_text = "".join(text_parts)
+        # 공통 정보는 문서 전체를 봐야 하므로 리듀서에서 한 번만 추출합니다.
+        sink.write_control('_common_info', get_common_info(full_text, db_client, file_name))
+    result_path = _finalize_result(db_client, storage_bucket, file_name, job['file_hash'], sink.path, full_text)
+    fanout.complete_job(db_client, job_id, result_path)
+    fanout.delete_shards(storage_bucket, job_id)
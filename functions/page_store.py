@@ -0,0 +1,160 @@
+# page_store.py
+"""
+OCR로 추출한 페이지 텍스트를 '오프셋 색인 + 텍스트 묶음' 한 파일로 저장하고, mmap으로 필요한 페이지만 읽습니다.
+
+원본 텍스트 파일('--- Page N ---' 구분자)을 매번 통째로 읽어 정규식으로 나누지 않아도,
+페이지 번호로 바로 해당 바이트 범위를 찾아 읽으므로 어느 페이지(또는 페이지 범위)든 일정한 시간에 가져옵니다.
+
+파일 형식 (result_..._pages.bin):
+    헤더      : b"EDPS", 버전(uint32), 페이지 수 N(uint32)
+    오프셋 색인: N+1개의 uint64 (텍스트 묶음 기준 바이트 위치, 페이지 n = [off[n-1], off[n]) )
+    텍스트 묶음: 모든 페이지 텍스트를 이어 붙인 UTF-8 바이트
+
+    pages = page_store.split_pages(full_text)        # [(페이지 번호, 텍스트), ...] - 모든 사용처가 쓰는 공통 파서
+    page_store.write_page_store(path, pages)
+    with page_store.PageStore(path) as store:
+        store.page(23), store.pages(11, 20), store.excerpt(23, around="도시행정학과")
+"""
+import re
+import mmap
+import struct
+
+# --- 설정 ---
+EXCERPT_CHARS = 200  # 출처에 붙이는 원문 발췌 길이
+# ------------------------------------
+
+PAGE_MARKER = re.compile(r'--- Page (\d+) ---')
+_MAGIC = b"EDPS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sII")
+_OFFSET = struct.Struct("<Q")
+
+
+def split_pages(full_text, keep_empty=False):
+    """'--- Page N ---' 구분자로 나뉜 텍스트를 [(페이지 번호, 텍스트), ...]로 나눕니다.
+
+    원래 페이지 번호를 그대로 씁니다. (병렬 처리 워커는 11페이지부터 시작하는 텍스트를 받을 수 있음)
+    keep_empty=False면 내용이 없는 페이지는 뺍니다.
+    """
+    parts = PAGE_MARKER.split(full_text)
+    pages = [(int(num), text.strip()) for num, text in zip(parts[1::2], parts[2::2])]
+    return pages if keep_empty else [(num, text) for num, text in pages if text]
+
+
+def join_pages(pages):
+    """split_pages의 반대. [(페이지 번호, 텍스트), ...]를 '--- Page N ---' 구분자 텍스트로 합칩니다."""
+    return "".join(f"\n\n--- Page {num} ---\n{text}" for num, text in pages)
+
+
+def store_path(raw_text_path):
+    """'result_..._raw_text.txt' → 'result_..._pages.bin' ('_raw_text_v4.txt' → '_pages_v4.bin')"""
+    path, count = re.subn(r"_raw_text(_v\d+)?\.txt$", r"_pages\1.bin", raw_text_path)
+    return path if count else f"{raw_text_path}.pages.bin"
+
+
+def write_page_store(path, pages):
+    """[(페이지 번호, 텍스트), ...]를 페이지 저장소 파일로 씁니다. 빠진 페이지 번호는 빈 페이지로 채웁니다."""
+    texts = {}
+    for num, text in pages:
+        texts[num] = texts.get(num, "") + text
+    page_count = max(texts, default=0)
+    blobs = [texts.get(num, "").encode('utf-8') for num in range(1, page_count + 1)]
+
+    offsets, position = [0], 0
+    for blob in blobs:
+        position += len(blob)
+        offsets.append(position)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, page_count))
+        f.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        f.write(b"".join(blobs))
+    return page_count
+
+
+def build_from_raw_text(raw_text_path, path=None):
+    """기존 원본 텍스트 파일로 페이지 저장소를 만듭니다. 만든 파일 경로를 반환합니다."""
+    path = path or store_path(raw_text_path)
+    with open(raw_text_path, 'r', encoding='utf-8') as f:
+        write_page_store(path, split_pages(f.read(), keep_empty=True))
+    return path
+
+
+class PageStore:
+    """페이지 저장소 파일을 mmap으로 열어 페이지 단위로 읽습니다."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.page_count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError(f"'{path}'은 페이지 저장소 파일이 아닙니다.")
+        self._index_start = _HEADER.size
+        self._blob_start = self._index_start + (self.page_count + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self.page_count
+
+    def _offset(self, i):
+        return _OFFSET.unpack_from(self._mm, self._index_start + i * _OFFSET.size)[0]
+
+    def page(self, num):
+        """페이지 num(1부터 시작)의 텍스트. 범위를 벗어나면 빈 문자열을 반환합니다."""
+        if not 1 <= num <= self.page_count:
+            return ""
+        start, end = self._offset(num - 1), self._offset(num)
+        return self._mm[self._blob_start + start:self._blob_start + end].decode('utf-8')
+
+    def pages(self, first, last=None):
+        """first~last 페이지(끝 포함)를 [(페이지 번호, 텍스트), ...]로 반환합니다. 빈 페이지는 뺍니다."""
+        first = max(first, 1)
+        last = min(last or self.page_count, self.page_count)
+        if first > last:
+            return []
+        # 범위 전체를 한 번에 잘라낸 뒤 색인의 오프셋으로 페이지를 나눕니다.
+        offsets = [self._offset(i) for i in range(first - 1, last + 1)]
+        chunk = self._mm[self._blob_start + offsets[0]:self._blob_start + offsets[-1]]
+        result = []
+        for num, start, end in zip(range(first, last + 1), offsets, offsets[1:]):
+            if end > start:
+                result.append((num, chunk[start - offsets[0]:end - offsets[0]].decode('utf-8')))
+        return result
+
+    def excerpt(self, num, around=None, width=EXCERPT_CHARS):
+        """페이지 num에서 around가 나오는 부분을 중심으로 width 글자를 발췌합니다. (없으면 페이지 앞부분)"""
+        text = " ".join(self.page(num).split())
+        if not text:
+            return ""
+        start = 0
+        if around:
+            hit = text.find(around)
+            if hit < 0:
+                # '음악학과 (작곡전공)'처럼 표기가 달라도 첫 단어로 한 번 더 찾아봅니다.
+                hit = text.find(str(around).split()[0])
+            if hit >= 0:
+                start = max(0, hit - width // 4)
+        end = min(len(text), start + width)
+        return ("…" if start > 0 else "") + text[start:end] + ("…" if end < len(text) else "")
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("사용법: python page_store.py <result_..._raw_text.txt>")
+        sys.exit(1)
+    output = build_from_raw_text(sys.argv[1])
+    with PageStore(output) as store:
+        print(f"✨ '{output}' 생성 완료! 총 {len(store)}페이지")
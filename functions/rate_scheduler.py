@@ -0,0 +1,214 @@
+# rate_scheduler.py
+"""
+모든 Gemini 호출이 거쳐 가는 우선순위 기반 토큰 버킷 스케줄러입니다.
+
+수집(OCR, 공통 정보/학과별 정보 추출, 임베딩)과 채팅이 같은 API 키와 할당량을 나눠 쓰므로,
+분당 요청 수(RPM)와 분당 토큰 수(TPM)를 토큰 버킷 두 개로 추적하고 요청을 우선순위대로 내보냅니다.
+
+- 우선순위: INTERACTIVE(학생 채팅) > BATCH(문서 수집). 대기열에서 항상 INTERACTIVE가 먼저 나갑니다.
+- 배치 몫: BATCH는 버킷의 BATCH_SHARE까지만 쓸 수 있어, 큰 업로드 중에도 채팅용 여유분이 남습니다.
+- 승인 제어: INTERACTIVE 요청이 INTERACTIVE_MAX_WAIT초 넘게 기다려야 하거나 대기열이 가득 차면
+  기다리지 않고 바로 Overloaded를 발생시킵니다. (BATCH는 차례가 올 때까지 기다립니다)
+- Retry-After: 429 응답을 받으면 defer()로 모든 요청을 그 시간 동안 멈춥니다.
+- 지표: stats()로 등급별 대기열 길이, 승인/거절 수, 누적 대기 시간을 확인합니다.
+
+    scheduler = rate_scheduler.get_scheduler('generate')
+    scheduler.acquire(rate_scheduler.BATCH, tokens=rate_scheduler.estimate_tokens(prompt))
+
+한도는 프로세스 단위입니다. Cloud Functions처럼 인스턴스가 여러 개 뜨는 환경에서는
+환경 변수로 인스턴스당 한도를 나누어 설정하세요.
+"""
+import os
+import heapq
+import itertools
+import threading
+import time
+import tracing
+
+# --- 설정 ---
+# 할당량 묶음별 (분당 요청 수, 분당 입력 토큰 수). 생성 모델과 임베딩 모델은 할당량이 따로 잡힙니다.
+LIMITS = {
+    'generate': (int(os.environ.get("EDAERO_RPM_LIMIT", "60")), int(os.environ.get("EDAERO_TPM_LIMIT", "1000000"))),
+    'embed': (int(os.environ.get("EDAERO_EMBED_RPM_LIMIT", "1500")), int(os.environ.get("EDAERO_EMBED_TPM_LIMIT", "1000000"))),
+}
+BATCH_SHARE = 0.7  # BATCH 요청이 쓸 수 있는 버킷 비율 (나머지는 채팅용 여유분)
+INTERACTIVE_MAX_WAIT = 20.0  # 초, 이보다 오래 기다려야 하는 채팅 요청은 바로 거절합니다.
+MAX_QUEUE_DEPTH = {0: 32, 1: 1000}  # 등급별 최대 대기 요청 수
+CHARS_PER_TOKEN = 2.0  # 한국어 위주 텍스트의 대략적인 글자/토큰 비율 (토큰 수 추정용)
+IMAGE_TOKENS = 1290  # 300dpi 페이지 이미지 한 장의 대략적인 입력 토큰 수
+# ------------------------------------
+
+INTERACTIVE, BATCH = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+
+class Overloaded(Exception):
+    """승인 제어로 요청을 받지 않았을 때 발생합니다. retry_after는 다시 시도해 볼 만한 대기 시간(초)입니다."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(contents):
+    """프롬프트(문자열 또는 [문자열, 이미지, ...])의 입력 토큰 수를 대략 추정합니다."""
+    if isinstance(contents, str):
+        return max(1, int(len(contents) / CHARS_PER_TOKEN))
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(part) if isinstance(part, (str, list, tuple)) else IMAGE_TOKENS for part in contents)
+    return IMAGE_TOKENS
+
+
+class TokenBucket:
+    """capacity만큼 쌓이고 초당 capacity/60씩 다시 채워지는 버킷 (분당 한도)"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, reserve, now):
+        """reserve를 남기고 amount를 꺼낼 수 있을 때까지 기다려야 하는 시간(초)"""
+        self._refill(now)
+        missing = amount + reserve - self.level
+        return max(0.0, missing / self.rate) if self.rate else float('inf')
+
+    def take(self, amount):
+        self.level -= amount
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateScheduler:
+    """RPM/TPM 토큰 버킷 두 개와 우선순위 대기열로 요청을 내보냅니다."""
+
+    def __init__(self, rpm, tpm, batch_share=BATCH_SHARE, interactive_max_wait=INTERACTIVE_MAX_WAIT,
+                 max_queue_depth=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.batch_share = batch_share
+        self.interactive_max_wait = interactive_max_wait
+        self.max_queue_depth = dict(max_queue_depth or MAX_QUEUE_DEPTH)
+        self._cond = threading.Condition()
+        self._queue = []  # (우선순위, 순번) 힙. 맨 앞 요청만 버킷에서 꺼낼 수 있습니다.
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._stats = {'admitted': {p: 0 for p in PRIORITY_NAMES}, 'rejected': {p: 0 for p in PRIORITY_NAMES},
+                       'wait_seconds': {p: 0.0 for p in PRIORITY_NAMES}, 'deferrals': 0}
+
+    def _reserve(self, bucket, priority):
+        return 0.0 if priority == INTERACTIVE else bucket.capacity * (1 - self.batch_share)
+
+    def _wait_time(self, priority, tokens, now):
+        return max(self._paused_until - now,
+                   self.requests.wait_time(1, self._reserve(self.requests, priority), now),
+                   self.tokens.wait_time(tokens, self._reserve(self.tokens, priority), now))
+
+    def _depth(self, priority):
+        return sum(1 for p, _ in self._queue if p == priority)
+
+    def acquire(self, priority=BATCH, tokens=1):
+        """요청 하나를 보낼 차례가 될 때까지 기다립니다. 승인된 토큰 수(버킷에서 꺼낸 양)를 반환합니다.
+
+        INTERACTIVE 요청은 오래 기다려야 하면 Overloaded를 발생시킵니다.
+        """
+        tokens = min(max(1, int(tokens)), int(self.tokens.capacity * (self.batch_share if priority == BATCH else 1)))
+        with tracing.span("scheduler.acquire", priority=PRIORITY_NAMES[priority], tokens=tokens) as s:
+            with self._cond:
+                now = time.monotonic()
+                depth = self._depth(priority)
+                s.set(queue_depth=depth)
+                if depth >= self.max_queue_depth[priority]:
+                    self._reject(priority, f"{PRIORITY_NAMES[priority]} 대기열이 가득 찼습니다 ({depth}개)")
+                if priority == INTERACTIVE:
+                    # 앞에 있는 INTERACTIVE 요청까지 고려한 대략적인 예상 대기 시간
+                    expected = self._wait_time(priority, tokens, now) + depth / max(self.requests.rate, 1e-9)
+                    if expected > self.interactive_max_wait:
+                        self._reject(priority, f"예상 대기 시간 {expected:.0f}초", retry_after=expected)
+
+                entry = (priority, next(self._seq))
+                heapq.heappush(self._queue, entry)
+                started = now
+                try:
+                    while True:
+                        now = time.monotonic()
+                        if self._queue[0] == entry:
+                            wait = self._wait_time(priority, tokens, now)
+                            if wait <= 0:
+                                break
+                        else:
+                            wait = None  # 앞 요청이 나가면 notify로 깨어납니다.
+                        self._cond.wait(timeout=wait)
+                finally:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                waited = time.monotonic() - started
+                self._stats['admitted'][priority] += 1
+                self._stats['wait_seconds'][priority] += waited
+                s.set(wait_seconds=round(waited, 3))
+        return tokens
+
+    def _reject(self, priority, reason, retry_after=None):
+        self._stats['rejected'][priority] += 1
+        raise Overloaded(f"요청이 많아 잠시 후 다시 시도해주세요. ({reason})", retry_after=retry_after)
+
+    def settle(self, estimated, actual):
+        """실제 입력 토큰 수(usage_metadata)를 알게 되면 추정치와의 차이를 버킷에 반영합니다."""
+        if not actual:
+            return
+        with self._cond:
+            if actual < estimated:
+                self.tokens.give_back(estimated - actual)
+            else:
+                self.tokens.take(actual - estimated)
+            self._cond.notify_all()
+
+    def defer(self, seconds):
+        """429 응답의 Retry-After만큼 모든 요청을 멈춥니다."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._stats['deferrals'] += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        """등급별 대기열 길이, 승인/거절 수, 누적 대기 시간(초)과 남은 버킷 양을 반환합니다."""
+        with self._cond:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                'queue_depth': {name: self._depth(p) for p, name in PRIORITY_NAMES.items()},
+                'admitted': {PRIORITY_NAMES[p]: n for p, n in self._stats['admitted'].items()},
+                'rejected': {PRIORITY_NAMES[p]: n for p, n in self._stats['rejected'].items()},
+                'wait_seconds': {PRIORITY_NAMES[p]: round(v, 3) for p, v in self._stats['wait_seconds'].items()},
+                'deferrals': self._stats['deferrals'],
+                'paused_for': round(max(0.0, self._paused_until - now), 3),
+                'requests_available': round(self.requests.level, 1),
+                'tokens_available': round(self.tokens.level),
+            }
+
+
+# --- 공용 인스턴스 ---
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(quota='generate'):
+    """할당량 묶음('generate' 또는 'embed')별로 프로세스 전체에서 공유하는 스케줄러를 반환합니다."""
+    scheduler = _schedulers.get(quota)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(quota)
+            if scheduler is None:
+                scheduler = _schedulers[quota] = RateScheduler(*LIMITS[quota])
+    return scheduler
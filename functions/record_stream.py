@@ -0,0 +1,203 @@
+# record_stream.py
+"""
+학과별 정보(department_info)를 한 줄에 레코드 하나씩 쓰는 NDJSON 스트림입니다.
+
+추출기(main.py)는 청크가 끝날 때마다 레코드를 스트림 끝에 덧붙이고, 인덱서(build_structured_db.py --follow)는
+스트림을 따라 읽으면서 도착한 레코드부터 임베딩/저장합니다. 전체 결과를 메모리에 모아둘 필요가 없습니다.
+
+스트림 형식:
+    {"_meta": {"university": ..., "year": ..., "document_title": ...}}   # 제어 줄 (키가 '_'로 시작)
+    {"_common_info": {...}}
+    {"major": "...", "recruitment_unit": "...", ...}                      # 학과 레코드
+    ...
+    {"_eof": {"records": 146}}                                            # 스트림 끝 (추출 성공)
+    {"_error": {"records": 40, "error": "..."}}                           # 추출이 중간에 실패함 (_eof 대신)
+"""
+import os
+import json
+import time
+
+# --- 설정 ---
+EOF_KEY = '_eof'
+ERROR_KEY = '_error'
+POLL_INTERVAL = 1.0  # 따라 읽기(follow) 시 새 줄을 확인하는 간격(초)
+# ------------------------------------
+
+
+class StreamAborted(RuntimeError):
+    """쓰는 쪽이 실패해 '_eof' 대신 '_error' 줄로 끝난 스트림을 읽었을 때 발생합니다."""
+
+
+def is_control(record):
+    """'_meta', '_common_info', '_eof' 같은 제어 줄인지 확인합니다."""
+    return len(record) == 1 and next(iter(record)).startswith('_')
+
+
+def _check_error(record):
+    if ERROR_KEY in record:
+        info = record[ERROR_KEY]
+        raise StreamAborted(f"스트림을 쓰던 중 오류가 발생했습니다 (레코드 {info.get('records')}개 이후): {info.get('error')}")
+
+
+class NdjsonFileSink:
+    """로컬 NDJSON 파일에 레코드를 덧붙여 쓰는 출력 대상"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def write_control(self, key, value):
+        self._file.write(json.dumps({key: value}, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        """지금까지 쓴 줄을 읽는 쪽에서 볼 수 있게 내보냅니다. (청크가 끝날 때마다 호출)"""
+        self._file.flush()
+
+    def close(self, error=None):
+        """스트림을 닫습니다. 정상 종료면 '_eof' 줄을, error(실패 사유)를 주면 '_eof' 대신 '_error' 줄을 씁니다."""
+        if not self._file.closed:
+            if error is None:
+                self.write_control(EOF_KEY, {"records": self.count})
+            else:
+                self.write_control(ERROR_KEY, {"records": self.count, "error": str(error)})
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # with 블록이 예외로 끝나면 완료된 스트림처럼 보이지 않도록 '_error'로 닫습니다.
+        self.close(error=None if exc_type is None else f"{exc_type.__name__}: {exc}")
+        return False
+
+
+class StorageNdjsonSink(NdjsonFileSink):
+    """로컬 파일에 쓰면서, flush()마다 새로 쓴 부분을 Cloud Storage 객체 뒤에 이어 붙이는 출력 대상
+
+    Storage 객체는 수정할 수 없으므로, 새 부분을 임시 객체로 올린 뒤 compose로 기존 객체와 합칩니다.
+    """
+
+    def __init__(self, bucket, blob_name, local_path):
+        super().__init__(local_path)
+        self.bucket = bucket
+        self.blob_name = blob_name
+        self._published = 0
+        bucket.blob(blob_name).upload_from_string(b"", content_type='application/x-ndjson')
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+        size = os.path.getsize(self.path)
+        if size == self._published:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._published)
+            data = f.read(size - self._published)
+        target = self.bucket.blob(self.blob_name)
+        part = self.bucket.blob(f"{self.blob_name}.part")
+        part.upload_from_string(data, content_type='application/x-ndjson')
+        target.compose([target, part])
+        part.delete()
+        self._published = size
+
+    def close(self, error=None):
+        super().close(error)
+        self.flush()
+
+
+def read_records(path):
+    """NDJSON 파일의 줄(제어 줄 포함)을 차례로 읽어옵니다. '_eof' 줄에서 멈추고, '_error' 줄이면 StreamAborted가 발생합니다."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            _check_error(record)
+            if EOF_KEY in record:
+                return
+            yield record
+
+
+def _file_reader(path):
+    def read(offset):
+        if not os.path.exists(path) or os.path.getsize(path) <= offset:
+            return b""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read()
+    return read
+
+
+def _blob_reader(blob):
+    def read(offset):
+        if not blob.exists():
+            return b""
+        blob.reload()
+        if blob.size <= offset:
+            return b""
+        return blob.download_as_bytes(start=offset)
+    return read
+
+
+def follow_records(source, poll_interval=POLL_INTERVAL, timeout=None):
+    """아직 쓰이고 있는 스트림을 따라가며 새 줄(제어 줄 포함)을 차례로 내보냅니다.
+
+    source는 로컬 파일 경로 또는 Storage blob입니다. 새 줄이 없을 때는 None을 내보내므로,
+    호출하는 쪽은 그때 쌓아둔 배치를 처리하면 됩니다. '_eof' 줄을 만나면 끝나고,
+    '_error' 줄(쓰는 쪽이 실패함)을 만나면 StreamAborted, timeout(초) 동안 새 데이터가 없으면 TimeoutError가 발생합니다.
+    """
+    read = _file_reader(source) if isinstance(source, str) else _blob_reader(source)
+    offset, buffer, last_data = 0, b"", time.monotonic()
+    while True:
+        data = read(offset)
+        if not data:
+            if timeout is not None and time.monotonic() - last_data > timeout:
+                raise TimeoutError(f"{timeout}초 동안 스트림에 새 데이터가 없습니다.")
+            yield None
+            time.sleep(poll_interval)
+            continue
+        offset += len(data)
+        last_data = time.monotonic()
+        *lines, buffer = (buffer + data).split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            _check_error(record)
+            if EOF_KEY in record:
+                return
+            yield record
+
+
+def write_final_json(ndjson_path, output_path):
+    """NDJSON 스트림을 기존 최종 JSON 형식(indent=2)으로 변환합니다.
+
+    레코드를 한 줄씩 옮겨 쓰므로 학과 수가 많아도 메모리 사용량이 일정합니다.
+    """
+    controls = {}
+    for record in read_records(ndjson_path):
+        if is_control(record):
+            controls.update(record)
+    header = {**controls.get('_meta', {}), "common_info": controls.get('_common_info', {})}
+
+    with open(output_path, 'w', encoding='utf-8') as out:
+        # json.dump(final_json, indent=2)와 같은 모양이 되도록 헤더 뒤에 department_info 배열을 이어 씁니다.
+        out.write(json.dumps(header, ensure_ascii=False, indent=2)[:-2] + ',\n  "department_info": [')
+        count = 0
+        for record in read_records(ndjson_path):
+            if is_control(record):
+                continue
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            out.write(("\n    " if count == 0 else ",\n    ") + body)
+            count += 1
+        out.write("\n  ]\n}" if count else "]\n}")
+    return count
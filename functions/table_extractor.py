@@ -0,0 +1,234 @@
+# table_extractor.py
+"""
+디지털 PDF의 모집 요강 표(모집인원, 수능 반영비율, 전형방법)를 PyMuPDF의 page.find_tables()로 읽어
+모델 호출 없이 department_info 레코드로 바꿉니다.
+
+- 머리글 매핑: 머리글 칸의 글자를 HEADER_RULES 정규식으로 레코드 항목에 연결합니다.
+  '국어', '수학' 같은 과목 칸은 csat_ratios의 키가 됩니다. 두 줄짜리 머리글('수능 반영비율(%)' 아래 '국어/수학/...')은
+  위아래 칸을 이어 붙여 해석합니다.
+- 병합된 칸: find_tables는 병합된 칸을 None으로 돌려주므로, 본문은 윗줄 값을, 머리글은 왼쪽 칸 값을 이어받습니다.
+- 신뢰도: 학과 칸과 값 칸(모집인원/반영비율/전형방법)이 매핑되고, 행의 MIN_VALID_ROW_RATIO 이상이
+  검사(학과명 있음, 모집인원은 숫자, 반영비율 칸은 숫자/등급 표기)를 통과한 표만 믿습니다.
+  학과 칸이 있는 표가 하나라도 믿을 수 없으면 그 페이지는 예전처럼 Gemini로 보냅니다.
+- 모집인원 칸이 없는 표(반영비율표, 전형방법표)는 같은 범위의 다른 표에서 나온 같은 학과 레코드의 빈 항목을 채웁니다.
+  짝이 없으면 그 표의 행을 그대로 레코드로 씁니다.
+
+스캔한 PDF처럼 표의 선이나 글자가 없는 페이지는 표가 검출되지 않으므로 모두 Gemini로 보냅니다.
+
+    tables = table_extractor.extract_tables(pdf_document, 1, pdf_document.page_count)
+    tables.records            # 모델 없이 만든 레코드
+    tables.confident_pages    # Gemini로 보내지 않아도 되는 페이지 번호
+"""
+import re
+import tracing
+
+# --- 설정 ---
+MIN_VALID_ROW_RATIO = 0.9  # 검사를 통과한 행 비율이 이보다 낮은 표는 믿지 않습니다.
+MAX_HEADER_ROWS = 2  # 머리글로 볼 수 있는 최대 줄 수
+# 머리글 → 레코드 항목. 위에서부터 차례로 검사하므로 더 구체적인 규칙을 먼저 둡니다. ('모집군'이 '모집단위'보다 먼저)
+HEADER_RULES = [
+    ('recruitment_unit', re.compile(r"모집\s*군|^군$")),
+    ('evaluation_method', re.compile(r"전형\s*방법|선발\s*방법|전형\s*요소")),
+    ('recruitment_number', re.compile(r"모집\s*인원|선발\s*인원|인원")),
+    ('selection_category', re.compile(r"전형\s*(명|유형|구분)?$")),
+    ('major', re.compile(r"모집\s*단위|학과|학부|전공")),
+]
+# 수능 반영비율의 과목 칸 (csat_ratios 키로 머리글 글자를 그대로 씁니다)
+SUBJECT_HEADER = re.compile(r"국어|수학|영어|탐구|한국사|제2외국어|직업")
+# ------------------------------------
+
+RECORD_FIELDS = ("major", "recruitment_unit", "selection_category", "recruitment_number", "csat_ratios",
+                 "evaluation_method", "source_page")
+NUMBER = re.compile(r"^(\d+)\s*(명)?$")
+NOT_RECRUITING = re.compile(r"^[-–—]$|^없음$")  # 빈 칸은 모집하지 않는 것이 아니라 읽지 못한 행으로 칩니다.
+RATIO_VALUE = re.compile(r"\d|등급|가산|감점|반영|필수|선택")
+BARE_NUMBER = re.compile(r"^\d+(\.\d+)?$")
+
+
+def clean_cell(value):
+    """칸 글자의 줄바꿈을 정리합니다. 좁은 칸에서 한글 단어 중간에 줄이 바뀐 경우는 붙입니다."""
+    if value is None:
+        return None
+    value = re.sub(r"(?<=[가-힣])\n(?=[가-힣])", "", str(value))
+    return " ".join(value.split())
+
+
+class TableExtraction:
+    """문서(또는 페이지 범위) 하나의 표 추출 결과"""
+
+    def __init__(self):
+        self.records = []             # 모델 없이 만든 department_info 레코드
+        self.confident_pages = set()  # 표를 믿을 수 있어 Gemini로 보내지 않는 페이지
+        self.pages_with_tables = 0
+        self.tables = 0
+        self.rejected_tables = 0
+
+    def summary(self, model_records=0):
+        """모델 호출 없이 추출한 행의 비율을 포함한 요약. model_records는 Gemini로 추출한 레코드 수입니다."""
+        total = len(self.records) + model_records
+        share = len(self.records) / total * 100 if total else 0.0
+        return (f"표 {self.tables}개 중 {self.tables - self.rejected_tables}개 사용, "
+                f"{len(self.confident_pages)}페이지는 모델 호출 생략, "
+                f"모델 없이 추출한 행 {len(self.records)}/{total}개 ({share:.0f}%)")
+
+
+def _fill_merged(rows):
+    """병합된 칸(None)을 윗줄 값으로 채웁니다."""
+    filled, previous = [], None
+    for row in rows:
+        row = [clean_cell(cell) for cell in row]
+        if previous is not None:
+            row = [prev if cell is None else cell for cell, prev in zip(row, previous)]
+        filled.append(row)
+        previous = row
+    return filled
+
+
+def _header_names(header_rows):
+    """머리글 줄(최대 MAX_HEADER_ROWS줄)을 칸별 이름으로 합칩니다.
+
+    가로로 병합된 칸(None)은 왼쪽 값을 이어받습니다. 단, 윗줄의 같은 칸도 비어 있을 때만 가로 병합으로 봅니다.
+    ('모집인원'처럼 위에서 세로로 병합되어 내려온 칸이 옆 과목명('영어')을 이어받지 않도록)
+    """
+    names = [""] * len(header_rows[0])
+    above = [None] * len(names)
+    for row in header_rows:
+        carried = None
+        cells = [clean_cell(cell) for cell in row]
+        for col, cell in enumerate(cells):
+            if cell is None and above[col] is None:
+                cell = carried
+            carried = cell
+            if cell and cell not in names[col]:
+                names[col] = f"{names[col]} {cell}".strip()
+        above = cells
+    return names
+
+
+def _header_depth(rows):
+    """첫 줄 아래에 숫자가 하나도 없는 줄이 있고 그 줄에 과목명이 있으면 두 줄짜리 머리글로 봅니다."""
+    if len(rows) > 1 and not any(cell and re.search(r"\d", cell) for cell in rows[1]) \
+            and any(cell and SUBJECT_HEADER.search(cell) for cell in rows[1]):
+        return min(2, MAX_HEADER_ROWS)
+    return 1
+
+
+def map_columns(names):
+    """칸 이름 목록을 {항목: 칸 번호}와 {과목 머리글: 칸 번호}로 매핑합니다."""
+    fields, subjects = {}, {}
+    for col, name in enumerate(names):
+        compact = re.sub(r"\s+", "", name or "")
+        if not compact:
+            continue
+        # 두 줄짜리 머리글은 아래 줄(더 구체적인 이름)부터 봅니다. ('수능 반영비율(%) 국어' → 과목 칸)
+        last = name.split()[-1]
+        if SUBJECT_HEADER.search(last) and not any(rule.search(last) for _, rule in HEADER_RULES):
+            subjects[last] = col
+            continue
+        field = next((f for f, rule in HEADER_RULES if rule.search(compact)), None)
+        if field and field not in fields:
+            fields[field] = col
+    return fields, subjects
+
+
+def parse_table(rows, page_num):
+    """find_tables().extract()의 행 목록을 레코드로 바꿉니다. (레코드 목록, 믿을 수 있는지, 학과 표인지)를 반환합니다."""
+    if not rows or len(rows) < 2:
+        return [], False, False
+    depth = _header_depth(rows)
+    fields, subjects = map_columns(_header_names(rows[:depth]))
+    if 'major' not in fields:
+        return [], False, False  # 학과 표가 아님 (일정표, 수능 등급표 등)
+    if not ({'recruitment_number', 'evaluation_method'} & fields.keys() or subjects):
+        return [], False, True
+
+    records, checked, valid = [], 0, 0
+    for row in _fill_merged(rows[depth:]):
+        if not any(row):
+            continue
+        # 표 중간에 머리글이 반복되는 경우(페이지를 넘어가는 긴 표)는 건너뜁니다.
+        if row[fields['major']] == clean_cell(rows[0][fields['major']]):
+            continue
+        checked += 1
+        record = {'source_page': page_num}
+        ok = bool(row[fields['major']])
+        for field, col in fields.items():
+            record[field] = row[col] or None
+        if 'recruitment_number' in fields:
+            number = record['recruitment_number'] or ""
+            if NOT_RECRUITING.match(number):
+                checked -= 1  # 모집하지 않는 모집단위 ('-')는 레코드도, 실패도 아닙니다.
+                continue
+            match = NUMBER.match(number)
+            ok = ok and match is not None
+            record['recruitment_number'] = int(match.group(1)) if match else number
+        if subjects:
+            ratios = {subject: row[col] for subject, col in subjects.items() if row[col]}
+            ok = ok and bool(ratios) and all(RATIO_VALUE.search(value) for value in ratios.values())
+            # 모델이 만든 레코드와 같은 '35%' 표기로 맞춥니다. (score_simulator가 % 기준으로 해석)
+            record['csat_ratios'] = {subject: f"{value}%" if BARE_NUMBER.match(value) else value
+                                     for subject, value in ratios.items()}
+        if ok:
+            valid += 1
+            records.append(record)
+    confident = checked > 0 and valid / checked >= MIN_VALID_ROW_RATIO
+    return records, confident, True
+
+
+def _key(record):
+    return re.sub(r"\s+", "", record.get('major') or "")
+
+
+def _join_attribute_tables(base, attributes):
+    """모집인원이 없는 표의 행으로 같은 학과 레코드의 빈 항목을 채웁니다. 짝이 없는 행은 그대로 레코드로 남깁니다."""
+    by_major = {}
+    for record in attributes:
+        by_major.setdefault(_key(record), record)
+    used = set()
+    for record in base:
+        attribute = by_major.get(_key(record))
+        if attribute is None:
+            continue
+        used.add(_key(record))
+        for field in ('csat_ratios', 'evaluation_method', 'selection_category', 'recruitment_unit'):
+            if not record.get(field) and attribute.get(field):
+                record[field] = attribute[field]
+    return base + [record for record in attributes if _key(record) not in used]
+
+
+def extract_tables(pdf_document, first_page=1, last_page=None):
+    """first_page~last_page(1부터 시작, 끝 포함)의 표를 읽어 TableExtraction을 반환합니다."""
+    last_page = min(last_page or pdf_document.page_count, pdf_document.page_count)
+    result = TableExtraction()
+    base, attributes = [], []
+    with tracing.span("ingest.tables", pages=last_page - first_page + 1) as s:
+        for page_num in range(first_page, last_page + 1):
+            try:
+                tables = pdf_document.load_page(page_num - 1).find_tables().tables
+            except Exception as e:
+                print(f"    - ❗️ {page_num} 페이지 표 검출 실패: {e}")
+                continue
+            if not tables:
+                continue
+            result.pages_with_tables += 1
+            page_records, page_confident, department_tables = [], True, 0
+            for table in tables:
+                records, confident, is_department_table = parse_table(table.extract(), page_num)
+                if not is_department_table:
+                    continue
+                department_tables += 1
+                result.tables += 1
+                if not confident:
+                    result.rejected_tables += 1
+                    page_confident = False
+                page_records.append(records)
+            if department_tables and page_confident:
+                result.confident_pages.add(page_num)
+                for records in page_records:
+                    for record in records:
+                        (base if 'recruitment_number' in record else attributes).append(record)
+        result.records = [{field: record.get(field) for field in RECORD_FIELDS}
+                          for record in _join_attribute_tables(base, attributes)]
+        s.set(tables=result.tables, rejected_tables=result.rejected_tables, confident_pages=len(result.confident_pages),
+              records=len(result.records))
+    return result
@@ -0,0 +1,227 @@
+# tracing.py
+"""
+질의응답/수집 파이프라인의 단계별 소요 시간을 기록하는 가벼운 span 계측 모듈입니다.
+
+EDAERO_TRACE=1 환경 변수(또는 tracing.enable())로 켜며, 꺼져 있을 때 span()은 아무 일도 하지 않는
+공용 객체를 돌려주므로 오버헤드가 거의 없습니다.
+
+    with tracing.span("query.alias_table") as s:
+        ...
+        s.set(cache_hit=True)
+
+기록된 span은 JSONL(export_jsonl) 또는 Prometheus 텍스트 형식(prometheus_text)으로 내보낼 수 있습니다.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+
+# --- 설정 ---
+ENABLED = os.environ.get("EDAERO_TRACE", "") not in ("", "0")
+TRACE_FILE = os.environ.get("EDAERO_TRACE_FILE", "edaero_trace.jsonl")  # flush() 시 span을 덧붙여 쓸 파일
+MAX_SPANS = 10000  # 메모리에 보관할 최대 span 수 (집계 값은 별도로 계속 누적됩니다)
+LABEL_ATTRS = {"page", "chunk", "n_results", "shard", "start_page", "end_page"}  # 합계로 누적하지 않는 식별용 속성
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# ------------------------------------
+
+_lock = threading.Lock()
+_local = threading.local()
+_spans = deque(maxlen=MAX_SPANS)
+_pending = []  # 아직 파일로 내보내지 않은 span
+_aggregates = {}  # span 이름별 {count, sum, buckets, attrs}
+
+
+class _NoopSpan:
+    """계측이 꺼져 있을 때 사용하는 공용 span"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "trace_id", "span_id", "parent_id", "start", "_t0")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """토큰 수, 글자 수, 캐시 적중 여부 등 속성을 추가합니다."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        parent = stack[-1] if stack else None
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = uuid.uuid4().hex[:8]
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._t0
+        _local.stack.pop()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _record(self, duration)
+        return False
+
+
+def span(name, **attrs):
+    """이름이 name인 span을 시작합니다. with 문과 함께 사용합니다."""
+    if not ENABLED:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def record(name, start, duration, parent=None, **attrs):
+    """이미 끝난 구간을 span으로 기록합니다. 스레드별 span 스택을 건드리지 않으므로,
+    제너레이터처럼 yield를 사이에 두고 시간을 재는 곳에서 씁니다. parent(Span)를 주면 그 아래에 연결합니다.
+
+    start는 time.time() 기준 시작 시각, duration은 초 단위 소요 시간입니다.
+    """
+    if not ENABLED:
+        return
+    s = Span(name, attrs)
+    s.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+    s.parent_id = parent.span_id if parent is not None else None
+    s.span_id = uuid.uuid4().hex[:8]
+    s.start = start
+    _record(s, duration)
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _pending.clear()
+        _aggregates.clear()
+
+
+def _record(s, duration):
+    record = {
+        "name": s.name,
+        "trace_id": s.trace_id,
+        "span_id": s.span_id,
+        "parent_id": s.parent_id,
+        "start": round(s.start, 6),
+        "duration_ms": round(duration * 1000, 3),
+        "attrs": s.attrs,
+    }
+    with _lock:
+        _spans.append(record)
+        _pending.append(record)
+        agg = _aggregates.get(s.name)
+        if agg is None:
+            agg = _aggregates[s.name] = {"count": 0, "sum": 0.0, "buckets": [0] * len(HISTOGRAM_BUCKETS), "attrs": {}}
+        agg["count"] += 1
+        agg["sum"] += duration
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if duration <= bound:
+                agg["buckets"][i] += 1
+        for key, value in s.attrs.items():
+            # 숫자/불리언 속성(글자 수, 토큰 수, 캐시 적중)은 합계로 누적합니다.
+            if isinstance(value, (int, float)) and key not in LABEL_ATTRS:
+                agg["attrs"][key] = agg["attrs"].get(key, 0) + value
+
+
+def get_spans():
+    with _lock:
+        return list(_spans)
+
+
+def summary():
+    """span 이름별 호출 수, 합계/평균 소요 시간(ms), 숫자 속성 합계를 반환합니다."""
+    with _lock:
+        return {
+            name: {
+                "count": agg["count"],
+                "total_ms": round(agg["sum"] * 1000, 3),
+                "mean_ms": round(agg["sum"] * 1000 / agg["count"], 3),
+                **{f"{k}_total": v for k, v in agg["attrs"].items()},
+            }
+            for name, agg in sorted(_aggregates.items())
+        }
+
+
+def export_jsonl(path):
+    """메모리에 보관 중인 span을 JSONL 파일로 씁니다."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in get_spans():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def flush(path=None):
+    """마지막 flush 이후 기록된 span을 TRACE_FILE에 덧붙입니다. 계측이 꺼져 있으면 아무것도 하지 않습니다."""
+    if not ENABLED:
+        return
+    with _lock:
+        records, _pending[:] = list(_pending), []
+    if records:
+        with open(path or TRACE_FILE, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(prefix="edaero"):
+    """누적된 집계 값을 Prometheus 텍스트 노출 형식으로 반환합니다."""
+    with _lock:
+        items = sorted((name, dict(agg, buckets=list(agg["buckets"]), attrs=dict(agg["attrs"]))) for name, agg in _aggregates.items())
+
+    lines = [
+        f"# HELP {prefix}_span_duration_seconds Duration of traced pipeline stages.",
+        f"# TYPE {prefix}_span_duration_seconds histogram",
+    ]
+    for name, agg in items:
+        for bound, count in zip(HISTOGRAM_BUCKETS, agg["buckets"]):
+            lines.append(f'{prefix}_span_duration_seconds_bucket{{span="{_label(name)}",le="{bound}"}} {count}')
+        lines.append(f'{prefix}_span_duration_seconds_bucket{{span="{_label(name)}",le="+Inf"}} {agg["count"]}')
+        lines.append(f'{prefix}_span_duration_seconds_sum{{span="{_label(name)}"}} {agg["sum"]:.6f}')
+        lines.append(f'{prefix}_span_duration_seconds_count{{span="{_label(name)}"}} {agg["count"]}')
+
+    lines.append(f"# HELP {prefix}_span_attribute_total Sum of numeric span attributes (chars, tokens, cache hits).")
+    lines.append(f"# TYPE {prefix}_span_attribute_total counter")
+    for name, agg in items:
+        for key, value in sorted(agg["attrs"].items()):
+            lines.append(f'{prefix}_span_attribute_total{{span="{_label(name)}",attr="{_label(key)}"}} {float(value)}')
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path):
+    """Prometheus 텍스트 형식으로 파일에 씁니다. (node_exporter textfile collector 등에서 수집)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+
+
+def usage_attrs(response):
+    """Gemini 응답의 usage_metadata에서 토큰 수를 꺼냅니다. 없으면 빈 딕셔너리를 반환합니다."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+    }
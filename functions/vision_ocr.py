@@ -0,0 +1,142 @@
+# vision_ocr.py
+"""
+PDF 페이지 이미지를 여러 장씩 묶어 Vision 모델에 한 번에 보내는 OCR 도우미입니다.
+
+짧은 페이지가 많은 요강은 토큰보다 요청 수(요청당 지연 + 분당 요청 한도)가 비용을 좌우하므로,
+페이지 이미지 여러 장을 한 요청에 담고 응답을 '--- Page N ---' 구분자로 다시 페이지별로 나눕니다.
+
+- 묶음 크기: 이미지(JPEG) 크기 합이 OCR_BATCH_MAX_BYTES, 장수가 OCR_BATCH_MAX_PAGES를 넘지 않도록
+  페이지마다 조정합니다. 글자가 적은 페이지는 많이, 빽빽한 페이지는 적게 묶입니다.
+- 응답의 구분자가 요청한 페이지 번호와 정확히 맞지 않으면(빠짐, 순서 바뀜, 잘림) 그 묶음은 한 장씩 다시 요청합니다.
+- OCR_BATCH_MAX_PAGES=1이면 예전처럼 페이지마다 한 번씩 요청합니다.
+
+    for batch in vision_ocr.ocr_document(pdf_document, 1, 36, model=VISION_MODEL, report=report):
+        pages.extend(batch)   # [(페이지 번호, 텍스트), ...]
+"""
+import os
+import model_provider
+import page_store
+import tracing
+
+# --- 설정 ---
+OCR_BATCH_MAX_PAGES = int(os.environ.get("EDAERO_OCR_BATCH_PAGES", "6"))  # 한 요청에 담는 최대 페이지 수
+OCR_BATCH_MAX_BYTES = 6 * 1024 * 1024  # 한 요청에 담는 이미지 크기 합 상한 (인라인 요청 한도 20MB보다 넉넉히 작게)
+RENDER_DPI = 300
+JPEG_QUALITY = 85
+OCR_TIMEOUT = 600
+# ------------------------------------
+
+ERROR_PREFIX = "Error processing page:"
+SINGLE_PAGE_PROMPT = "이 이미지는 문서의 한 페이지입니다. 이 페이지에 보이는 모든 텍스트를 빠짐없이, 순서대로 정확하게 추출해주세요."
+
+
+def batch_prompt(page_numbers):
+    numbers = ", ".join(str(num) for num in page_numbers)
+    return (
+        f"다음 {len(page_numbers)}개의 이미지는 문서의 연속된 페이지입니다. 페이지 번호: {numbers}\n"
+        "각 이미지 바로 앞에 '--- Page N ---' 표시가 있습니다. 페이지마다 보이는 모든 텍스트를 빠짐없이, 순서대로 정확하게 추출하되, "
+        "각 페이지의 텍스트 앞에 같은 '--- Page N ---' 줄을 그대로 써서 페이지를 구분해주세요. "
+        "페이지를 합치거나 건너뛰지 말고, 텍스트가 없는 페이지도 구분 줄은 써주세요."
+    )
+
+
+class OcrReport:
+    """OCR 요청 수와 묶음 처리 결과 요약"""
+
+    def __init__(self):
+        self.requests = 0         # 보낸 OCR 요청 수 (한 장씩 다시 보낸 요청 포함)
+        self.batched_pages = 0    # 묶음 요청으로 처리된 페이지 수
+        self.fallback_pages = []  # 묶음 응답을 나누지 못해 한 장씩 다시 요청한 페이지
+        self.failed_pages = []    # 한 장씩 요청해도 실패한 페이지
+
+    def summary(self, total_pages):
+        text = f"{total_pages}페이지를 {self.requests}번의 요청으로 처리 (묶음 처리 {self.batched_pages}페이지)"
+        if self.fallback_pages:
+            text += f", 한 장씩 다시 요청 {sorted(self.fallback_pages)}"
+        if self.failed_pages:
+            text += f", 실패 {sorted(self.failed_pages)}"
+        return text
+
+
+def render_page(pdf_document, page_index):
+    """페이지를 JPEG 이미지 파트({'mime_type', 'data'})로 렌더링합니다."""
+    with tracing.span("ingest.render", page=page_index + 1) as s:
+        pix = pdf_document.load_page(page_index).get_pixmap(dpi=RENDER_DPI)
+        data = pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+        s.set(pixels=pix.width * pix.height, bytes=len(data))
+    return {"mime_type": "image/jpeg", "data": data}
+
+
+def plan_batches(images, max_pages=None, max_bytes=OCR_BATCH_MAX_BYTES):
+    """[(페이지 번호, 이미지 파트), ...]를 크기 상한에 맞춰 묶습니다. 이미지를 하나씩 받아 묶음이 차면 바로 내보냅니다."""
+    max_pages = max_pages or OCR_BATCH_MAX_PAGES
+    batch, size = [], 0
+    for num, image in images:
+        image_size = len(image["data"])
+        if batch and (len(batch) >= max_pages or size + image_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append((num, image))
+        size += image_size
+    if batch:
+        yield batch
+
+
+def split_response(text, page_numbers):
+    """묶음 응답을 {페이지 번호: 텍스트}로 나눕니다. 구분자가 요청한 페이지와 정확히 맞지 않으면 None."""
+    sections = page_store.split_pages(text or "", keep_empty=True)
+    if [num for num, _ in sections] != list(page_numbers):
+        return None
+    return dict(sections)
+
+
+def _generate(contents, model, span_attrs, report):
+    report.requests += 1
+    with tracing.span("ingest.ocr", **span_attrs) as s:
+        response = model_provider.get_provider().generate(contents, model=model, timeout=OCR_TIMEOUT)
+        s.set(output_chars=len(response.text), **tracing.usage_attrs(response))
+    return response.text
+
+
+def ocr_single(num, image, model, report):
+    try:
+        return _generate([SINGLE_PAGE_PROMPT, image], model, {"page": num, "pages": 1}, report)
+    except Exception as e:
+        report.failed_pages.append(num)
+        return f"{ERROR_PREFIX} {e}"
+
+
+def ocr_batch(batch, model, report):
+    """페이지 묶음 하나를 OCR하여 [(페이지 번호, 텍스트), ...]를 반환합니다."""
+    if len(batch) == 1:
+        num, image = batch[0]
+        return [(num, ocr_single(num, image, model, report))]
+
+    page_numbers = [num for num, _ in batch]
+    contents = [batch_prompt(page_numbers)]
+    for num, image in batch:
+        contents += [f"--- Page {num} ---", image]
+    try:
+        sections = split_response(_generate(contents, model, {"page": page_numbers[0], "pages": len(batch)}, report),
+                                  page_numbers)
+    except Exception as e:
+        print(f"    - ❗️ {page_numbers[0]}~{page_numbers[-1]} 페이지 묶음 OCR 실패: {e}")
+        sections = None
+    if sections is not None:
+        report.batched_pages += len(batch)
+        return [(num, sections[num]) for num in page_numbers]
+
+    print(f"    - 🔁 {page_numbers[0]}~{page_numbers[-1]} 페이지 묶음 응답을 나누지 못해 한 장씩 다시 요청합니다.")
+    report.fallback_pages.extend(page_numbers)
+    return [(num, ocr_single(num, image, model, report)) for num, image in batch]
+
+
+def ocr_document(pdf_document, first_page, last_page, model, report=None, max_pages=None):
+    """first_page~last_page(1부터 시작, 끝 포함)를 렌더링하면서 묶음 단위로 OCR합니다.
+
+    묶음 하나가 끝날 때마다 [(페이지 번호, 텍스트), ...]를 내보냅니다. (진행 상황 보고용)
+    """
+    report = report if report is not None else OcrReport()
+    images = ((index + 1, render_page(pdf_document, index)) for index in range(first_page - 1, last_page))
+    for batch in plan_batches(images, max_pages=max_pages):
+        yield ocr_batch(batch, model, report)
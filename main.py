@@ -1,12 +1,16 @@
 import os
-import json
 import time
-import re
 import firebase_admin
 from firebase_admin import credentials, storage, firestore
 import fitz  # PyMuPDF
-from PIL import Image
-import google.generativeai as genai
+import canonicalize
+import model_provider
+import llm_json
+import page_store
+import table_extractor
+import vision_ocr
+import record_stream
+import tracing
 
 # --- 설정 ---
 SERVICE_ACCOUNT_FILE = 'serviceAccountKey.json'
@@ -18,8 +22,7 @@ EXTRACTION_MODEL = 'gemini-2.5-flash'
 def initialize_services():
     """API 키와 Firebase 서비스를 초기화하고 클라이언트 객체들을 반환합니다."""
     try:
-        GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-        genai.configure(api_key=GOOGLE_API_KEY)
+        model_provider.get_provider()
         print("✅ Gemini API 키가 성공적으로 설정되었습니다.")
     except KeyError:
         print("❌ 에러: GOOGLE_API_KEY 환경 변수를 설정해주세요.")
@@ -43,48 +46,72 @@ def initialize_services():
         print(f"❌ Firestore 또는 Storage 클라이언트 연결 중 오류 발생: {e}")
         return None, None
 
-def update_progress(db, filename, status, progress):
-    """Firestore에 현재 진행 상태를 업데이트합니다."""
+# 파일별 현재 단계와 시작 시각 (단계별 소요 시간 기록용)
+_stage_clock = {}
+
+def update_progress(db, filename, status, progress, stage=None, **fields):
+    """Firestore에 현재 진행 상태를 업데이트합니다.
+
+    stage가 바뀌면 직전 단계의 소요 시간(초)을 'stage_timings'에 기록하고,
+    그 밖의 fields(pages_done, pages_per_minute 등)는 문서에 그대로 병합합니다.
+    """
     if db:
+        data = {'status': status, 'progress': progress, 'timestamp': firestore.SERVER_TIMESTAMP, **fields}
+        if stage:
+            now = time.time()
+            current = _stage_clock.get(filename)
+            if current is None or current[0] != stage:
+                if current:
+                    data['stage_timings'] = {current[0]: round(now - current[1], 1)}
+                _stage_clock[filename] = (stage, now)
+                data['stage'] = stage
+        if stage == 'done' or progress < 0:
+            _stage_clock.pop(filename, None)
         doc_ref = db.collection('progress').document(filename)
-        doc_ref.set({'status': status, 'progress': progress, 'timestamp': firestore.SERVER_TIMESTAMP}, merge=True)
+        doc_ref.set(data, merge=True)
 
 def extract_text_with_vision(pdf_bytes, db, pdf_filename):
     """(1단계) Vision API 텍스트 추출 및 진행 상황 보고"""
     pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
     total_pages = pdf_document.page_count
-    full_text = ""
+    pages = []
     base_progress, progress_range = 10, 40
+    started = time.time()
 
-    for page_num in range(total_pages):
-        current_progress = base_progress + int(((page_num + 1) / total_pages) * progress_range)
-        update_progress(db, pdf_filename, f"텍스트 추출 중 ({page_num + 1}/{total_pages} 페이지)", current_progress)
-        
-        page = pdf_document.load_page(page_num)
-        pix = page.get_pixmap(dpi=300)
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        
-        model = genai.GenerativeModel(VISION_MODEL)
-        prompt = "이 이미지는 문서의 한 페이지입니다. 이 페이지에 보이는 모든 텍스트를 빠짐없이, 순서대로 정확하게 추출해주세요."
-        
-        try:
-            response = model.generate_content([prompt, img], request_options={"timeout": 600})
-            full_text += f"\n\n--- Page {page_num + 1} ---\n{response.text}"
-            time.sleep(1)
-        except Exception as e:
-            update_progress(db, pdf_filename, f"오류: {page_num + 1} 페이지 처리 실패", current_progress)
-            full_text += f"\n\n--- Page {page_num + 1} ---\nError processing page: {e}"
+    update_progress(db, pdf_filename, f"텍스트 추출 중 (0/{total_pages} 페이지)", base_progress,
+                    stage='ocr', pages_done=0, total_pages=total_pages, pages_per_minute=0)
+    # 페이지 이미지를 크기에 맞춰 여러 장씩 묶어 한 요청으로 보내고, 묶음이 끝날 때마다 진행 상황을 기록합니다.
+    report = vision_ocr.OcrReport()
+    for batch in vision_ocr.ocr_document(pdf_document, 1, total_pages, VISION_MODEL, report):
+        pages.extend(batch)
+        pages_done = len(pages)
+        current_progress = base_progress + int((pages_done / total_pages) * progress_range)
+        elapsed_minutes = (time.time() - started) / 60
+        update_progress(db, pdf_filename, f"텍스트 추출 중 ({pages_done}/{total_pages} 페이지)", current_progress,
+                        stage='ocr', pages_done=pages_done, total_pages=total_pages,
+                        pages_per_minute=round(pages_done / elapsed_minutes, 1) if elapsed_minutes else 0)
+        for page_num, text in batch:
+            if text.startswith(vision_ocr.ERROR_PREFIX):
+                update_progress(db, pdf_filename, f"오류: {page_num} 페이지 처리 실패", current_progress)
+    print(f"    - 텍스트 추출 결과: {report.summary(total_pages)}")
 
+    full_text = page_store.join_pages(pages)
     raw_text_filename = f"result_{os.path.splitext(pdf_filename)[0]}_raw_text.txt"
     with open(raw_text_filename, 'w', encoding='utf-8') as f:
         f.write(full_text)
+    # 출처 발췌처럼 페이지 하나만 필요한 곳은 원본 텍스트 대신 페이지 저장소를 읽습니다.
+    page_store.write_page_store(page_store.store_path(raw_text_filename), pages)
     
     return full_text
 
+def extract_tables(pdf_bytes):
+    """(1-2단계) 디지털 PDF의 모집 요강 표를 모델 호출 없이 학과별 레코드로 읽습니다."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return table_extractor.extract_tables(pdf_document)
+
 def get_common_info(full_text, db, pdf_filename):
     """(2-1단계) 전체 텍스트에서 공통 정보를 추출합니다."""
-    update_progress(db, pdf_filename, "공통 정보 분석 중...", 50)
-    model = genai.GenerativeModel(EXTRACTION_MODEL)
+    update_progress(db, pdf_filename, "공통 정보 분석 중...", 50, stage='common_info')
     prompt = f"""
     주어진 입시요강 전체 텍스트에서 모든 지원자에게 공통적으로 적용되는 '공통 정보'를 찾아서 JSON 객체 형식으로 만들어줘.
     찾아야 할 항목: "application_period", "application_procedure", "application_fee", "csat_english_method", "csat_history_method"
@@ -93,69 +120,101 @@ def get_common_info(full_text, db, pdf_filename):
     {full_text}
     """
     try:
-        response = model.generate_content(prompt, request_options={"timeout": 600})
-        cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-        return json.loads(cleaned_text)
+        with tracing.span("ingest.common_info", prompt_chars=len(prompt)) as s:
+            response = model_provider.get_provider().generate(prompt, model=EXTRACTION_MODEL, timeout=600)
+            s.set(output_chars=len(response.text), **tracing.usage_attrs(response))
+        return llm_json.parse_object(response.text)
     except Exception as e:
         update_progress(db, pdf_filename, "오류: 공통 정보 분석 실패", 55)
         print(f"❌ 'common_info' 정보 추출 중 오류 발생: {e}")
         return {}
 
-def structure_department_info_by_chunks(full_text, db, pdf_filename):
-    """(2-2단계) 전체 텍스트를 청크로 나누어 학과별 정보를 추출하고 종합합니다."""
-    update_progress(db, pdf_filename, "학과별 정보 상세 분석 준비 중...", 70)
-    pages = re.split(r'--- Page \d+ ---', full_text)
-    pages = [p.strip() for p in pages if p.strip()]
+def structure_department_info_by_chunks(full_text, db, pdf_filename, sink=None, tables=None):
+    """(2-2단계) 전체 텍스트를 청크로 나누어 학과별 정보를 추출하고 종합합니다.
+
+    sink(record_stream의 NDJSON 출력 대상)를 넘기면 청크가 끝날 때마다 레코드를 바로 내보내고
+    메모리에 모아두지 않습니다. 이때는 추출한 레코드 수를 반환합니다.
+    tables(table_extractor.TableExtraction)를 넘기면 표를 믿을 수 있는 페이지는 표에서 읽은 레코드를 쓰고 Gemini로 보내지 않습니다.
+    """
+    update_progress(db, pdf_filename, "학과별 정보 상세 분석 준비 중...", 70, stage='department_info')
+    pages = page_store.split_pages(full_text)
     
     final_department_info = []
+    if tables is not None:
+        pages = [(num, text) for num, text in pages if num not in tables.confident_pages]
+        if sink is not None:
+            sink.write_many(tables.records)
+            sink.flush()
+        else:
+            final_department_info.extend(tables.records)
     chunk_size = 10
     num_chunks = (len(pages) + chunk_size - 1) // chunk_size
+    report = llm_json.BisectReport()
+    model_records = 0
 
     for i in range(num_chunks):
         current_progress = 70 + int(((i + 1) / num_chunks) * 25)
-        update_progress(db, pdf_filename, f"학과별 정보 분석 중 (청크 {i+1}/{num_chunks})", current_progress)
-
-        start_index = i * chunk_size
-        end_index = start_index + chunk_size
-        text_chunk_with_pages = ""
-        for page_num in range(start_index, min(end_index, len(pages))):
-            text_chunk_with_pages += f"\n\n--- Page {page_num + 1} ---\n{pages[page_num]}"
-        
-        model = genai.GenerativeModel(EXTRACTION_MODEL)
-        prompt = f"""
-        주어진 입시요강 텍스트 일부를 분석하여, `department_info` JSON 배열 형식으로 만들어줘.
-        찾아야 할 항목: "major", "recruitment_unit", "selection_category", "recruitment_number", "csat_ratios", "evaluation_method", "source_page".
-        절대로 응답을 요약하거나 생략하지 말고, 찾은 모든 학과 정보를 생성해야 한다. 분석할 정보가 없다면 빈 배열 `[]`을 반환하세요.
-        응답은 오직 JSON 배열 형식이어야 한다.
-        --- 분석할 텍스트 ---
-        {text_chunk_with_pages}
-        """
-        try:
-            response = model.generate_content(prompt, request_options={"timeout": 600})
-            cleaned_text = response.text.strip().replace("```json", "").replace("```", "")
-            chunk_result = json.loads(cleaned_text)
+        update_progress(db, pdf_filename, f"학과별 정보 분석 중 (청크 {i+1}/{num_chunks})", current_progress, stage='department_info')
+
+        chunk_pages = pages[i * chunk_size:(i + 1) * chunk_size]
+        # 응답이 잘리거나 깨지면 읽은 만큼은 살리고, 실패한 페이지 범위만 나누어 다시 요청합니다.
+        chunk_result = llm_json.extract_with_bisect(chunk_pages, lambda sub_pages: _extract_department_records(sub_pages, i + 1), report)
+        model_records += len(chunk_result)
+        if sink is not None:
+            sink.write_many(chunk_result)
+            sink.flush()
+        else:
             final_department_info.extend(chunk_result)
-        except Exception as e:
-            print(f"    - ❗️ 청크 {i+1} 처리 중 오류 발생: {e}")
-        time.sleep(1)
-        
-    return final_department_info
+
+    print(f"    - 학과별 정보 추출 재시도 결과: {report.summary()}")
+    if report.retries:
+        update_progress(db, pdf_filename, f"학과별 정보 분석 완료 ({report.summary()})", 95, stage='department_info',
+                        recovered_pages=sorted(report.recovered_pages), failed_pages=sorted(report.failed_pages))
+    if tables is not None:
+        print(f"    - 표 추출 결과: {tables.summary(model_records)}")
+        update_progress(db, pdf_filename, f"학과별 정보 분석 완료 ({tables.summary(model_records)})", 95, stage='department_info',
+                        table_records=len(tables.records), model_records=model_records, table_pages=sorted(tables.confident_pages))
+    return sink.count if sink is not None else final_department_info
+
+def _extract_department_records(chunk_pages, chunk_num):
+    """페이지 묶음 하나에서 학과별 정보를 추출합니다. 응답의 완전한 객체만 살린 llm_json.ParsedArray를 반환합니다."""
+    text_chunk_with_pages = page_store.join_pages(chunk_pages)
+    prompt = f"""
+    주어진 입시요강 텍스트 일부를 분석하여, `department_info` JSON 배열 형식으로 만들어줘.
+    찾아야 할 항목: "major", "recruitment_unit", "selection_category", "recruitment_number", "csat_ratios", "evaluation_method", "source_page".
+    절대로 응답을 요약하거나 생략하지 말고, 찾은 모든 학과 정보를 생성해야 한다. 분석할 정보가 없다면 빈 배열 `[]`을 반환하세요.
+    응답은 오직 JSON 배열 형식이어야 한다.
+    --- 분석할 텍스트 ---
+    {text_chunk_with_pages}
+    """
+    with tracing.span("ingest.chunk_generate", chunk=chunk_num, pages=len(chunk_pages), prompt_chars=len(prompt)) as s:
+        response = model_provider.get_provider().generate(prompt, model=EXTRACTION_MODEL, timeout=600)
+        s.set(output_chars=len(response.text), **tracing.usage_attrs(response))
+    with tracing.span("ingest.chunk_parse", chunk=chunk_num) as s:
+        records = llm_json.parse_array(response.text)
+        s.set(records=len(records), skipped=records.skipped, truncated=int(records.truncated))
+    return records
 
 def main(db, bucket, pdf_filename):
     """메인 실행 함수"""
     print("--- [디버깅] main 함수 시작 ---")
     
-    update_progress(db, pdf_filename, "PDF 다운로드 중...", 5)
+    update_progress(db, pdf_filename, "PDF 다운로드 중...", 5, stage='download')
     blob = bucket.blob(pdf_filename)
     if not blob.exists():
         print(f"--- [디버깅] 오류: Storage에서 '{pdf_filename}' 파일을 찾을 수 없습니다. ---")
         update_progress(db, pdf_filename, "오류: 파일을 찾을 수 없음", -1)
         return
-    pdf_bytes = blob.download_as_bytes()
+    with tracing.span("ingest.download") as s:
+        pdf_bytes = blob.download_as_bytes()
+        s.set(bytes=len(pdf_bytes))
     print("--- [디버깅] PDF 다운로드 완료 ---")
     
-    full_text = extract_text_with_vision(pdf_bytes, db, pdf_filename)
+    with tracing.span("ingest.vision") as s:
+        full_text = extract_text_with_vision(pdf_bytes, db, pdf_filename)
+        s.set(output_chars=len(full_text))
     print(f"--- [디버깅] 텍스트 추출 완료. 총 글자 수: {len(full_text)} ---")
+    tables = extract_tables(pdf_bytes)
     
     # 텍스트 추출이 실패했는지 확인
     if len(full_text) < 100: # 텍스트가 너무 짧으면 문제가 있는 것으로 간주
@@ -163,31 +222,34 @@ def main(db, bucket, pdf_filename):
         update_progress(db, pdf_filename, "오류: 텍스트 추출 실패", -1)
         return
 
-    common_info = get_common_info(full_text, db, pdf_filename)
-    print(f"--- [디버깅] 공통 정보 추출 완료: {common_info} ---")
-    
-    department_info = structure_department_info_by_chunks(full_text, db, pdf_filename)
-    print(f"--- [디버깅] 학과별 정보 추출 완료. 총 {len(department_info)}개 학과 발견 ---")
-    
-    update_progress(db, pdf_filename, "최종 JSON 파일 생성 중...", 95)
-    final_json = {
-        "university": "대학교 이름",
-        "year": "2026",
-        "document_title": pdf_filename,
-        "common_info": common_info,
-        "department_info": department_info
-    }
+    # 학과별 정보는 청크마다 NDJSON 스트림에 덧붙입니다.
+    # 추출이 끝나기 전에도 'python build_structured_db.py --follow <ndjson 파일>'로 색인을 시작할 수 있습니다.
+    stream_filename = f"result_{os.path.splitext(pdf_filename)[0]}_final.ndjson"
+    with record_stream.NdjsonFileSink(stream_filename) as sink:
+        sink.write_control('_meta', {"university": "대학교 이름", "year": "2026", "document_title": pdf_filename})
+        common_info = get_common_info(full_text, db, pdf_filename)
+        sink.write_control('_common_info', common_info)
+        print(f"--- [디버깅] 공통 정보 추출 완료: {common_info} ---")
+
+        with tracing.span("ingest.department_info") as s:
+            department_count = structure_department_info_by_chunks(full_text, db, pdf_filename, sink=sink, tables=tables)
+            s.set(records=department_count)
+    print(f"--- [디버깅] 학과별 정보 추출 완료. 총 {department_count}개 학과 발견 ---")
     
+    update_progress(db, pdf_filename, "최종 JSON 파일 생성 중...", 95, stage='finalize')
     output_filename = f"result_{os.path.splitext(pdf_filename)[0]}_final.json"
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        json.dump(final_json, f, ensure_ascii=False, indent=2)
+    record_stream.write_final_json(stream_filename, output_filename)
     
-    print("--- [디버깅] JSON 파일 저장 완료 ---")
-    update_progress(db, pdf_filename, "완료", 100)
+    # 학과명 표기를 맞추고 중복 레코드를 합친 파일과 별칭 표를 함께 만듭니다. (build_structured_db.py가 우선 사용)
+    before, after = canonicalize.canonicalize_file(output_filename)
+    print(f"--- [디버깅] JSON 파일 저장 완료 (중복 병합: {before}개 → {after}개) ---")
+    update_progress(db, pdf_filename, "완료", 100, stage='done')
     print(f"✨ 최종 통합 JSON 생성 완료! 결과가 '{output_filename}' 파일로 저장되었습니다.")
 
 if __name__ == "__main__":
     db_client, storage_bucket = initialize_services()
     if db_client and storage_bucket:
         test_pdf_file = "2026_서울시립대학교_정시.pdf" 
-        main(db_client, storage_bucket, test_pdf_file)
\ No newline at end of file
+        with tracing.span("ingest", file=test_pdf_file):
+            main(db_client, storage_bucket, test_pdf_file)
+        tracing.flush()
\ No newline at end of file
@@ -0,0 +1,269 @@
+# model_provider.py
+"""
+생성(generate) / 스트리밍(stream) / 임베딩(embed) 호출을 한 곳으로 모은 모델 제공자 계층입니다.
+
+    provider = model_provider.get_provider()
+    text = provider.generate(prompt, model='gemini-2.5-flash').text
+    for piece in provider.stream(prompt, model='gemini-2.5-flash'):
+        ...
+    vectors = provider.embed(documents, task_type="retrieval_document")
+
+모든 호출은 rate_scheduler의 토큰 버킷 스케줄러를 거칩니다. 채팅처럼 사용자가 기다리는 호출은
+priority=rate_scheduler.INTERACTIVE로, 문서 수집은 기본값(BATCH)으로 보냅니다.
+
+EDAERO_MODEL_BACKEND 환경 변수로 백엔드를 고릅니다.
+- 'gemini' (기본값): Google Gemini API. 클라이언트 설정과 GenerativeModel 객체를 프로세스 안에서 재사용합니다.
+- 'offline': 네트워크 없이 동작하는 해싱 임베더 + 템플릿 생성기. 부하 테스트와 콜드 스타트 측정용입니다.
+"""
+import os
+import re
+import json
+import math
+import time
+import zlib
+import threading
+import rate_scheduler
+from rate_scheduler import BATCH
+
+# --- 설정 ---
+BACKEND = os.environ.get("EDAERO_MODEL_BACKEND", "gemini")
+DEFAULT_MODEL = 'gemini-2.5-flash'
+EMBEDDING_MODEL = 'models/text-embedding-004'
+EMBEDDING_DIM = 768  # text-embedding-004와 같은 차원
+EMBED_BATCH_SIZE = 100  # embed_content 한 번에 보낼 최대 문서 수
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 2.0  # 초, 재시도마다 2배씩 늘어납니다.
+# ------------------------------------
+
+
+class ModelResponse:
+    """generate()의 반환 객체. google.generativeai 응답처럼 .text와 .usage_metadata를 가집니다."""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class ModelProvider:
+    """모든 백엔드가 구현하는 공통 인터페이스
+
+    schedulers({'generate': RateScheduler, 'embed': RateScheduler})가 있으면 모든 요청(재시도 포함)이
+    스케줄러의 승인을 받은 뒤에 나갑니다. None이면 제한 없이 바로 보냅니다.
+    """
+    schedulers = None
+    max_retries = MAX_RETRIES
+    _transient_errors = ()
+
+    def generate(self, contents, model=DEFAULT_MODEL, timeout=None, priority=BATCH):
+        raise NotImplementedError
+
+    def stream(self, contents, model=DEFAULT_MODEL, timeout=None, priority=BATCH):
+        """답변 텍스트 조각(str)을 차례로 내보내는 이터레이터를 반환합니다."""
+        raise NotImplementedError
+
+    def embed(self, content, task_type, model=EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE, priority=BATCH):
+        """content가 문자열이면 벡터 하나를, 리스트면 벡터 리스트를 반환합니다. 리스트는 batch_size씩 나누어 요청합니다."""
+        if isinstance(content, str):
+            return self._embed_batch([content], task_type, model, priority)[0]
+        vectors = []
+        for i in range(0, len(content), batch_size):
+            vectors.extend(self._embed_batch(content[i:i + batch_size], task_type, model, priority))
+        return vectors
+
+    def _embed_batch(self, texts, task_type, model, priority):
+        raise NotImplementedError
+
+    def _call(self, fn, priority, contents, quota='generate'):
+        """스케줄러의 승인을 받아 fn()을 호출합니다. 일시적인 오류는 max_retries번까지 다시 시도합니다.
+
+        429 응답에 재시도 대기 시간이 있으면 그만큼 스케줄러 전체를 멈춘 뒤 다시 시도합니다.
+        """
+        scheduler = self.schedulers[quota] if self.schedulers else None
+        estimated = rate_scheduler.estimate_tokens(contents)
+        for attempt in range(self.max_retries + 1):
+            if scheduler:
+                estimated = scheduler.acquire(priority, tokens=estimated)
+            try:
+                result = fn()
+            except self._transient_errors as e:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if retry_after and scheduler:
+                    # 같은 할당량을 쓰는 다른 요청도 함께 기다립니다. 대기는 다음 acquire()에서 합니다.
+                    scheduler.defer(retry_after)
+                    print(f"    - ❗️ 요청 한도 초과, {retry_after:.1f}초 후 재시도합니다 ({attempt + 1}/{self.max_retries}): {e}")
+                    continue
+                delay = retry_after or RETRY_BASE_DELAY * (2 ** attempt)
+                print(f"    - ❗️ 일시적인 API 오류, {delay:.0f}초 후 재시도합니다 ({attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                continue
+            if scheduler:
+                usage = getattr(result, "usage_metadata", None)
+                scheduler.settle(estimated, getattr(usage, "prompt_token_count", 0) if usage else 0)
+            return result
+
+
+_RETRY_DELAY_PATTERN = re.compile(r"(?:retry in\s*|retry_delay\s*\{\s*seconds:\s*)(\d+(?:\.\d+)?)", re.I)
+
+def retry_after_seconds(error):
+    """429 오류에 담긴 재시도 대기 시간(초)을 읽습니다. ('Please retry in 12.3s', 'retry_delay { seconds: 12 }')"""
+    match = _RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+# --- Gemini 백엔드 ---
+
+class GeminiProvider(ModelProvider):
+    def __init__(self, api_key=None, max_retries=MAX_RETRIES, schedulers=None):
+        import google.generativeai as genai
+        from google.api_core import exceptions as api_exceptions
+
+        self._genai = genai
+        self._genai.configure(api_key=api_key or os.environ['GOOGLE_API_KEY'])
+        self._models = {}
+        self._lock = threading.Lock()
+        self.max_retries = max_retries
+        self.schedulers = schedulers
+        # 잠시 후 다시 시도하면 성공할 수 있는 오류들 (429, 500, 503, 504)
+        self._transient_errors = (
+            api_exceptions.ResourceExhausted,
+            api_exceptions.InternalServerError,
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.DeadlineExceeded,
+        )
+
+    def _model(self, name):
+        """GenerativeModel 객체는 모델 이름별로 한 번만 만들어 재사용합니다."""
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._models[name] = self._genai.GenerativeModel(name)
+        return model
+
+    def generate(self, contents, model=DEFAULT_MODEL, timeout=None, priority=BATCH):
+        request_options = {"timeout": timeout} if timeout else None
+        return self._call(lambda: self._model(model).generate_content(contents, request_options=request_options), priority, contents)
+
+    def stream(self, contents, model=DEFAULT_MODEL, timeout=None, priority=BATCH):
+        request_options = {"timeout": timeout} if timeout else None
+        # 요청은 여기서 바로 보내고(재시도 포함), 응답 조각은 소비할 때 받아옵니다.
+        response = self._call(lambda: self._model(model).generate_content(contents, stream=True, request_options=request_options),
+                              priority, contents)
+        return (chunk.text for chunk in response)
+
+    def _embed_batch(self, texts, task_type, model, priority):
+        result = self._call(lambda: self._genai.embed_content(model=model, content=texts, task_type=task_type),
+                            priority, texts, quota='embed')
+        return result['embedding']
+
+
+# --- 오프라인 백엔드 ---
+
+MAJOR_PATTERN = re.compile(r"[가-힣]+(?:학과|학부|전공)")
+
+
+def hashing_embedding(text, dim=EMBEDDING_DIM):
+    """글자 2-gram을 해싱하여 만든 결정적인 임베딩 (L2 정규화)"""
+    vec = [0.0] * dim
+    compact = re.sub(r"\s+", "", text)
+    for i in range(len(compact) - 1):
+        h = zlib.crc32(compact[i:i + 2].encode('utf-8'))
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec] if norm else vec
+
+
+def render_offline_response(prompt):
+    """프롬프트 종류에 따라 실제 모델과 같은 형식의 결정적인 응답을 만듭니다."""
+    if "'학과명' 또는 '전공명'을 정확히 하나만 추출" in prompt:
+        match = MAJOR_PATTERN.search(prompt.rsplit("질문:", 1)[-1])
+        return match.group(0) if match else "없음"
+    if "`department_info` JSON 배열" in prompt:
+        records, seen = [], set()
+        text = prompt.split("--- 분석할 텍스트 ---", 1)[-1]
+        for page_num, page_text in re.findall(r"--- Page (\d+) ---\n(.*?)(?=\n\n--- Page |\Z)", text, re.S):
+            for major in MAJOR_PATTERN.findall(page_text):
+                if major in seen:
+                    continue
+                seen.add(major)
+                records.append({
+                    "major": major, "recruitment_unit": "", "selection_category": "일반전형(수능 위주)",
+                    "recruitment_number": 0, "csat_ratios": {}, "evaluation_method": "",
+                    "source_page": int(page_num),
+                })
+        return "```json\n" + json.dumps(records, ensure_ascii=False) + "\n```"
+    if "'공통 정보'" in prompt:
+        keys = ["application_period", "application_procedure", "application_fee", "csat_english_method", "csat_history_method"]
+        return json.dumps({k: "" for k in keys})
+    if "페이지마다 보이는 모든 텍스트" in prompt:
+        # 여러 페이지 묶음 OCR: 요청한 페이지 번호마다 구분 줄을 붙여 응답합니다.
+        numbers = re.search(r"페이지 번호: ([\d, ]+)", prompt).group(1).split(",")
+        return "\n\n".join(f"--- Page {n.strip()} ---\n(오프라인 OCR 결과) 이 페이지의 텍스트입니다." for n in numbers)
+    if "페이지에 보이는 모든 텍스트" in prompt:
+        return "(오프라인 OCR 결과) 이 페이지의 텍스트입니다."
+    return f"제공된 자료를 바탕으로 답변드립니다. (참고 자료 {len(prompt)}자 분석)\n" + "결과를 요약하면 다음과 같습니다. " * 20
+
+
+class OfflineProvider(ModelProvider):
+    """네트워크 없이 동작하는 결정적인 백엔드. 지연 시간(초)을 주입해 실제 API 호출을 흉내낼 수 있습니다."""
+
+    def __init__(self, gen_latency=0.0, embed_latency=0.0, chunk_latency=0.0, stream_chunks=8, schedulers=None):
+        self.gen_latency = gen_latency
+        self.embed_latency = embed_latency
+        self.chunk_latency = chunk_latency
+        self.stream_chunks = stream_chunks
+        self.schedulers = schedulers  # 스케줄러 동작을 시험할 때만 지정합니다. (기본: 제한 없음)
+
+    def generate(self, contents, model=DEFAULT_MODEL, timeout=None, priority=BATCH):
+        return self._call(lambda: self._generate(contents), priority, contents)
+
+    def _generate(self, contents):
+        time.sleep(self.gen_latency)
+        prompt = contents if isinstance(contents, str) else str(contents[0])
+        return ModelResponse(render_offline_response(prompt))
+
+    def stream(self, contents, model=DEFAULT_MODEL, timeout=None, priority=BATCH):
+        text = self.generate(contents, model, timeout, priority).text
+        size = max(1, len(text) // self.stream_chunks)
+        return self._stream_pieces([text[i:i + size] for i in range(0, len(text), size)])
+
+    def _stream_pieces(self, pieces):
+        for piece in pieces:
+            time.sleep(self.chunk_latency)
+            yield piece
+
+    def _embed_batch(self, texts, task_type, model, priority):
+        return self._call(lambda: self._embed_offline(texts), priority, texts, quota='embed')
+
+    def _embed_offline(self, texts):
+        time.sleep(self.embed_latency)
+        return [hashing_embedding(t) for t in texts]
+
+
+# --- 공용 인스턴스 ---
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_provider():
+    """프로세스 전체에서 공유하는 제공자 인스턴스를 반환합니다. (처음 호출될 때 생성)
+
+    Gemini 백엔드에서 GOOGLE_API_KEY가 없으면 KeyError가 발생합니다.
+    """
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if BACKEND == "offline":
+                    _provider = OfflineProvider()
+                else:
+                    _provider = GeminiProvider(schedulers={quota: rate_scheduler.get_scheduler(quota) for quota in rate_scheduler.LIMITS})
+    return _provider
+
+def set_provider(provider):
+    """공용 인스턴스를 직접 지정합니다. (벤치마크, 로컬 실행용)"""
+    global _provider
+    _provider = provider
@@ -0,0 +1,205 @@
+# progress_monitor.py
+"""
+Firestore 'progress/{파일명}' 문서의 변경 사항을 실시간으로 받아오는 모니터입니다.
+
+문서에 on_snapshot 리스너를 걸어 변경이 생길 때만 큐로 전달받고(push), 리스너를 사용할 수 없거나
+중간에 끊기면 변경이 없을수록 간격을 늘리는 적응형 폴링으로 전환합니다.
+
+Firestore 에뮬레이터로 동작을 확인하려면:
+    firebase emulators:start --only firestore
+    python progress_monitor.py --emulator localhost:8080 --simulate
+"""
+import os
+import time
+import queue
+import argparse
+import threading
+
+# --- 설정 ---
+POLL_MIN_INTERVAL = 1.0   # 폴링 간격(초): 변경이 감지되면 이 값으로 돌아갑니다.
+POLL_MAX_INTERVAL = 15.0  # 변경이 없을 때 늘어나는 최대 폴링 간격(초)
+LISTENER_STALL_TIMEOUT = 60.0  # 이 시간 동안 리스너 이벤트가 없고 리스너가 닫혀 있으면 폴링으로 전환
+# ------------------------------------
+
+# update_progress()가 기록하는 단계 이름과 화면 표시용 이름
+STAGE_LABELS = {
+    'download': 'PDF 다운로드', 'fanout': '페이지 범위별 병렬 처리', 'ocr': '텍스트 추출', 'common_info': '공통 정보 분석',
+    'department_info': '학과별 정보 분석', 'finalize': '결과 파일 생성',
+}
+STAGE_ORDER = {stage: i for i, stage in enumerate(STAGE_LABELS)}
+
+
+def is_finished(progress_data):
+    """진행 문서가 완료(100) 또는 오류(-1) 상태인지 확인합니다."""
+    progress = (progress_data or {}).get('progress', 0)
+    return progress >= 100 or progress < 0
+
+
+class ProgressMonitor:
+    def __init__(self, doc_ref, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL):
+        self.doc_ref = doc_ref
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.mode = None  # 'listener' 또는 'polling'
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._watch = None
+        self._poll_thread = None
+
+    def start(self):
+        """on_snapshot 리스너를 등록합니다. 실패하면 폴링으로 전환합니다."""
+        try:
+            self._watch = self.doc_ref.on_snapshot(self._on_snapshot)
+            self.mode = 'listener'
+        except Exception as e:
+            print(f"❗️ 실시간 리스너 등록 실패, 폴링으로 전환합니다: {e}")
+            self.start_polling()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
+
+    def _on_snapshot(self, doc_snapshots, changes, read_time):
+        # Firestore 리스너 스레드에서 호출되므로 UI를 직접 건드리지 않고 큐에만 넣습니다.
+        for doc in doc_snapshots:
+            self._queue.put(doc.to_dict() if doc.exists else None)
+
+    def start_polling(self):
+        self.mode = 'polling'
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception:
+                pass
+            self._watch = None
+        self._poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._poll_thread.start()
+
+    def _poll_loop(self):
+        interval, last = self.min_interval, object()
+        while not self._stop.is_set():
+            try:
+                doc = self.doc_ref.get()
+                data = doc.to_dict() if doc.exists else None
+                if data != last:
+                    self._queue.put(data)
+                    last, interval = data, self.min_interval
+                else:
+                    # 변경이 없으면 조회 간격을 늘려 Firestore 읽기 횟수를 줄입니다.
+                    interval = min(interval * 2, self.max_interval)
+            except Exception as e:
+                print(f"❗️ 진행 상황 조회 실패: {e}")
+                interval = min(interval * 2, self.max_interval)
+            self._stop.wait(interval)
+
+    def _listener_alive(self):
+        return self._watch is not None and getattr(self._watch, 'is_active', True)
+
+    def updates(self, timeout=None):
+        """변경된 진행 문서(dict, 문서가 아직 없으면 None)를 차례로 내보냅니다.
+
+        완료/오류 상태가 되거나 timeout(초)이 지나면 끝납니다.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        last_event = time.monotonic()
+        while not self._stop.is_set():
+            wait = self.max_interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return
+            try:
+                data = self._queue.get(timeout=wait)
+            except queue.Empty:
+                if self.mode == 'listener' and time.monotonic() - last_event > LISTENER_STALL_TIMEOUT and not self._listener_alive():
+                    print("❗️ 실시간 리스너가 종료되어 폴링으로 전환합니다.")
+                    self.start_polling()
+                continue
+            last_event = time.monotonic()
+            yield data
+            if is_finished(data):
+                return
+
+
+def format_stage_stats(progress_data):
+    """진행 문서의 단계별 소요 시간과 페이지 처리 속도를 표시용 문자열 목록으로 만듭니다."""
+    lines = []
+    for stage, seconds in sorted((progress_data.get('stage_timings') or {}).items(), key=lambda kv: STAGE_ORDER.get(kv[0], 99)):
+        lines.append(f"{STAGE_LABELS.get(stage, stage)}: {seconds:.1f}초")
+    if progress_data.get('pages_per_minute'):
+        pages = f"{progress_data.get('pages_done', 0)}/{progress_data.get('total_pages', '?')} 페이지"
+        lines.append(f"텍스트 추출 속도: 분당 {progress_data['pages_per_minute']:.1f} 페이지 ({pages})")
+    if progress_data.get('total_shards'):
+        lines.append(f"병렬 처리: {progress_data.get('shards_done', 0)}/{progress_data['total_shards']} 작업 완료")
+    return lines
+
+
+def _simulate_pipeline(db, filename, total_pages=5, delay=0.5):
+    """에뮬레이터 확인용: main.update_progress로 실제 파이프라인과 같은 형식의 진행 상황을 기록합니다."""
+    from main import update_progress
+
+    update_progress(db, filename, "PDF 다운로드 중...", 5, stage='download')
+    time.sleep(delay)
+    started = time.time()
+    for page in range(1, total_pages + 1):
+        time.sleep(delay)
+        update_progress(db, filename, f"텍스트 추출 중 ({page}/{total_pages} 페이지)", 10 + int(page / total_pages * 40),
+                        stage='ocr', pages_done=page, total_pages=total_pages,
+                        pages_per_minute=round(page / ((time.time() - started) / 60), 1))
+    update_progress(db, filename, "공통 정보 분석 중...", 50, stage='common_info')
+    time.sleep(delay)
+    update_progress(db, filename, "학과별 정보 분석 중 (청크 1/1)", 95, stage='department_info')
+    time.sleep(delay)
+    update_progress(db, filename, "최종 JSON 파일 생성 중...", 95, stage='finalize')
+    time.sleep(delay)
+    update_progress(db, filename, "완료", 100, stage='done')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firestore 진행 상황 모니터 (에뮬레이터 확인용)")
+    parser.add_argument("--emulator", default=os.environ.get("FIRESTORE_EMULATOR_HOST", "localhost:8080"), help="Firestore 에뮬레이터 주소")
+    parser.add_argument("--project", default="demo-edaero-insight", help="에뮬레이터 프로젝트 ID")
+    parser.add_argument("--document", default="emulator_test.pdf", help="모니터링할 progress 문서 이름")
+    parser.add_argument("--simulate", action="store_true", help="가짜 파이프라인 진행 상황을 함께 기록")
+    parser.add_argument("--polling", action="store_true", help="리스너 없이 폴링 모드만 확인")
+    args = parser.parse_args()
+
+    os.environ["FIRESTORE_EMULATOR_HOST"] = args.emulator
+    import firebase_admin
+    from firebase_admin import firestore
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(options={'projectId': args.project})
+    db = firestore.client()
+    doc_ref = db.collection('progress').document(args.document)
+    doc_ref.delete()
+
+    if args.simulate:
+        threading.Thread(target=_simulate_pipeline, args=(db, args.document), daemon=True).start()
+
+    monitor = ProgressMonitor(doc_ref)
+    if args.polling:
+        monitor.start_polling()
+    else:
+        monitor.start()
+    started = time.monotonic()
+    try:
+        for data in monitor.updates(timeout=120):
+            elapsed = time.monotonic() - started
+            if data is None:
+                print(f"[{elapsed:6.2f}s] ({monitor.mode}) 문서 없음 - 처리 시작 대기 중")
+                continue
+            print(f"[{elapsed:6.2f}s] ({monitor.mode}) {data.get('progress')}% {data.get('status')}")
+            for line in format_stage_stats(data):
+                print(f"           - {line}")
+    finally:
+        monitor.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,27 @@
-import os
 import json
-import time
-import google.generativeai as genai
+import model_provider
+import llm_json
+import page_store
 
 # --- 설정 ---
 RAW_TEXT_FILE = 'result_2026_서울대학교_정시_raw.txt'
 FINAL_JSON_FILE = 'result_2026_서울대학교_정시.json'
+REFINE_MODEL = 'gemini-1.5-pro-latest'
 # ------------------------------------
 
 # 1. API 키 설정
 try:
-    GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-    genai.configure(api_key=GOOGLE_API_KEY)
+    provider = model_provider.get_provider()
     print("✅ Gemini API 키가 성공적으로 설정되었습니다.")
 except KeyError:
     print("❌ 에러: GOOGLE_API_KEY 환경 변수를 설정해주세요.")
     exit()
 
 def structure_chunk_with_gemini(text_chunk):
-    """텍스트 조각을 바탕으로 Gemini를 이용해 JSON을 생성합니다."""
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
+    """텍스트 조각을 바탕으로 Gemini를 이용해 JSON을 생성합니다.
 
+    응답에서 완전한 객체만 살린 llm_json.ParsedArray를 반환합니다. (잘린 응답이면 .complete가 False)
+    """
     prompt = f"""
     당신은 대학 입시요강 분석 전문가입니다. 아래 텍스트는 입시요강의 일부 내용입니다.
     이 텍스트를 분석하여, 아래 JSON 스키마에 따라 모든 전형 정보를 추출하고 구조화된 JSON 배열을 생성해주세요.
@@ -41,12 +42,8 @@ def structure_chunk_with_gemini(text_chunk):
     {text_chunk}
     """
 
-    try:
-        response = model.generate_content(prompt, request_options={"timeout": 600})
-        return json.loads(response.text)
-    except Exception as e:
-        print(f"  - ❗️ Gemini 청크 처리 중 오류 발생: {e}")
-        return [] # 오류 발생 시 빈 리스트 반환
+    response = provider.generate(prompt, model=REFINE_MODEL, timeout=600)
+    return llm_json.parse_array(response.text)
 
 def main():
     """메인 실행 함수"""
@@ -54,24 +51,27 @@ def main():
     with open(RAW_TEXT_FILE, 'r', encoding='utf-8') as f:
         full_text = f.read()
 
-    # 페이지 단위로 텍스트 분리
-    pages = full_text.split('--- Page ')
-    pages = [p for p in pages if p.strip()] # 빈 페이지 제거
+    # 페이지 단위로 텍스트 분리 (페이지 번호 유지, 빈 페이지 제거)
+    pages = page_store.split_pages(full_text)
 
     final_results = []
+    report = llm_json.BisectReport()
 
     # 10 페이지씩 묶어서 처리 (API 호출 횟수 조절)
     chunk_size = 10 
     num_chunks = (len(pages) + chunk_size - 1) // chunk_size
 
     for i in range(num_chunks):
-        start_index = i * chunk_size
-        end_index = start_index + chunk_size
-        text_chunk = "--- Page ".join(pages[start_index:end_index])
+        chunk_pages = pages[i * chunk_size:(i + 1) * chunk_size]
 
         print(f"\n🧠 청크 {i+1}/{num_chunks} JSON 구조화를 요청합니다...")
 
-        structured_chunk = structure_chunk_with_gemini(text_chunk)
+        # 응답이 잘리거나 깨지면 읽은 만큼은 살리고, 실패한 페이지 범위만 나누어 다시 요청합니다.
+        structured_chunk = llm_json.extract_with_bisect(
+            chunk_pages,
+            lambda sub_pages: structure_chunk_with_gemini(page_store.join_pages(sub_pages)),
+            report,
+        )
 
         if structured_chunk:
             final_results.extend(structured_chunk)
@@ -79,12 +79,12 @@ def main():
         else:
             print(f"  - ⚠️ 해당 청크에서 유효한 정보를 찾지 못했습니다.")
 
-        time.sleep(1) # API 과부하 방지
 
     # 최종 결과를 .json 파일로 저장
     with open(FINAL_JSON_FILE, 'w', encoding='utf-8') as f:
         json.dump(final_results, f, ensure_ascii=False, indent=2)
 
+    print(f"\n🔁 재시도 결과: {report.summary()}")
     print(f"\n✨ 최종 정제 완료! 총 {len(final_results)}개의 항목이 '{FINAL_JSON_FILE}' 파일로 저장되었습니다.")
 
 if __name__ == "__main__":
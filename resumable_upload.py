@@ -0,0 +1,80 @@
+# resumable_upload.py
+"""
+Cloud Storage 재개 가능(resumable) 업로드를 청크 단위로 수행합니다.
+
+업로드 세션 URL만 보관해 두면, 연결이 끊겨도 서버에 이미 저장된 바이트 다음부터 이어서 올릴 수 있습니다.
+(프로토콜: https://cloud.google.com/storage/docs/performing-resumable-uploads)
+"""
+import time
+import requests
+
+# --- 설정 ---
+CHUNK_SIZE = 8 * 1024 * 1024  # 청크 크기는 256KiB의 배수여야 합니다.
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0  # 초, 재시도마다 2배씩 늘어납니다.
+# ------------------------------------
+
+
+class UploadSessionExpired(Exception):
+    """세션 URL이 만료되었거나 취소된 경우 (처음부터 새 세션으로 올려야 함)"""
+
+
+def create_session(blob, total_size, content_type='application/pdf'):
+    """재개 가능 업로드 세션을 만들고 세션 URL을 반환합니다. blob.metadata도 함께 저장됩니다."""
+    return blob.create_resumable_upload_session(content_type=content_type, size=total_size)
+
+
+def committed_bytes(session_url, total_size):
+    """서버에 저장이 확정된 바이트 수를 조회합니다."""
+    response = requests.put(session_url, headers={'Content-Range': f'bytes */{total_size}'}, timeout=60)
+    if response.status_code in (200, 201):
+        return total_size
+    if response.status_code == 308:
+        # 'Range: bytes=0-12345' 헤더가 없으면 아직 한 바이트도 저장되지 않은 것입니다.
+        received = response.headers.get('Range')
+        return int(received.split('-')[1]) + 1 if received else 0
+    if response.status_code in (404, 410):
+        raise UploadSessionExpired(f"업로드 세션이 만료되었습니다 (HTTP {response.status_code})")
+    response.raise_for_status()
+    return 0
+
+
+def upload_chunks(session_url, fileobj, total_size, chunk_size=CHUNK_SIZE, on_progress=None, max_retries=MAX_RETRIES):
+    """세션에 저장된 위치부터 파일을 청크 단위로 이어서 올립니다.
+
+    on_progress(uploaded_bytes, total_size)로 진행 상황을 알려주며, 일시적인 네트워크 오류는
+    저장된 위치를 다시 조회한 뒤 그 지점부터 재시도합니다.
+    """
+    offset = committed_bytes(session_url, total_size)
+    retries = 0
+    while offset < total_size:
+        if on_progress:
+            on_progress(offset, total_size)
+        fileobj.seek(offset)
+        chunk = fileobj.read(chunk_size)
+        end = offset + len(chunk) - 1
+        try:
+            response = requests.put(
+                session_url, data=chunk,
+                headers={'Content-Range': f'bytes {offset}-{end}/{total_size}'}, timeout=300,
+            )
+            if response.status_code in (200, 201):
+                offset = total_size
+            elif response.status_code == 308:
+                received = response.headers.get('Range')
+                offset = int(received.split('-')[1]) + 1 if received else 0
+            elif response.status_code in (404, 410):
+                raise UploadSessionExpired(f"업로드 세션이 만료되었습니다 (HTTP {response.status_code})")
+            else:
+                response.raise_for_status()
+            retries = 0
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            if retries >= max_retries:
+                raise
+            retries += 1
+            delay = RETRY_BASE_DELAY * (2 ** (retries - 1))
+            print(f"❗️ 업로드 중 오류, {delay:.0f}초 후 이어서 올립니다 ({retries}/{max_retries}): {e}")
+            time.sleep(delay)
+            offset = committed_bytes(session_url, total_size)
+    if on_progress:
+        on_progress(total_size, total_size)
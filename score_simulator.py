@@ -0,0 +1,149 @@
+# score_simulator.py
+import os
+import re
+import json
+import numpy as np
+
+# --- 설정 ---
+SCORE_MATRIX_FILE = "score_matrix.npz"  # build_score_matrix.py 실행 후 생성되는 파일
+SUBJECTS = ["국어", "수학", "영어", "탐구"]
+RATIO_TOTAL_TOLERANCE = 1.0  # 과목별 반영비율의 합이 100%에서 이만큼(%p) 넘게 벗어나면 행렬에서 제외합니다.
+# ------------------------------------
+
+# csat_ratios의 키/값에서 과목명을 찾기 위한 패턴 ('탐구영역(사회/과학 2과목)' → '탐구')
+# '대학수학능력시험'의 '수학'은 과목이 아니므로 앞뒤를 확인합니다. ('대학수학능력시험 100%' 같은 수능 전체 비율은 해석하지 않음)
+MATH_SUBJECT = r"(?<!대학)수학(?!능력)"
+SUBJECT_PATTERNS = {
+    "국어": re.compile(r"국어"),
+    "수학": re.compile(MATH_SUBJECT),
+    "영어": re.compile(r"영어"),
+    "탐구": re.compile(r"탐구"),
+}
+PERCENT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+INLINE_RATIO_PATTERN = re.compile(rf"(국어|{MATH_SUBJECT}|영어|탐구)[^\d,]*?(\d+(?:\.\d+)?)\s*%")
+NON_CSAT_PATTERN = re.compile(r"내신|학생부")  # 수능이 아닌 반영 요소는 환산에서 제외합니다.
+
+
+def parse_csat_ratios(csat_ratios):
+    """자유 형식의 csat_ratios를 {과목: 가중치} 딕셔너리로 변환합니다. 해석할 수 없으면 빈 딕셔너리를 반환합니다."""
+    weights = {}
+    if isinstance(csat_ratios, dict):
+        for key, value in csat_ratios.items():
+            key, value = str(key), str(value)
+            if NON_CSAT_PATTERN.search(key):
+                continue
+            subject = next((s for s, p in SUBJECT_PATTERNS.items() if p.search(key)), None)
+            percent = PERCENT_PATTERN.search(value)
+            if subject and percent:
+                weights[subject] = weights.get(subject, 0.0) + float(percent.group(1))
+            else:
+                # {"반영 영역": "국어 40%, 수학 35%, 영어 25%"} 처럼 값 안에 과목별 비율이 있는 경우
+                for s, p in INLINE_RATIO_PATTERN.findall(value):
+                    weights[s] = weights.get(s, 0.0) + float(p)
+    elif isinstance(csat_ratios, str):
+        for s, p in INLINE_RATIO_PATTERN.findall(csat_ratios):
+            weights[s] = weights.get(s, 0.0) + float(p)
+    return weights
+
+
+def university_name(data):
+    """결과 JSON에서 대학교 이름을 찾습니다. ('대학교 이름' 자리표시자인 경우 문서 제목에서 추출)"""
+    name = data.get("university") or ""
+    if name and name != "대학교 이름":
+        return name
+    match = re.search(r"[가-힣A-Za-z]+대학교", data.get("document_title") or "")
+    return match.group(0) if match else name
+
+
+def build_weight_matrix(result_files):
+    """여러 결과 JSON의 department_info를 '학과 × 과목' 가중치 행렬로 변환합니다.
+
+    반환값: (가중치 행렬, 학과 정보, 해석 실패로 제외한 항목 수, 합이 100%가 아니어서 제외한 [(학과명, 합계), ...])
+    """
+    rows, labels = [], {"university": [], "major": [], "recruitment_unit": [], "selection_category": [], "source_page": []}
+    skipped, incomplete = 0, []
+    for path in result_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        university = university_name(data)
+        for item in data.get("department_info", []):
+            weights = parse_csat_ratios(item.get("csat_ratios"))
+            total = sum(weights.values())
+            if total <= 0:
+                skipped += 1
+                continue
+            if abs(total - 100) > RATIO_TOTAL_TOLERANCE:
+                # 일부 과목만 추출된 행을 100%로 다시 맞추면 남은 과목의 비중이 부풀려지므로 쓰지 않습니다.
+                incomplete.append((str(item.get("major") or ""), total))
+                continue
+            # 각 행의 합이 1이 되도록 정규화하여, 환산 점수가 입력 점수와 같은 척도(예: 백분위 0~100)가 되게 합니다.
+            rows.append([weights.get(s, 0.0) / total for s in SUBJECTS])
+            labels["university"].append(university)
+            labels["major"].append(str(item.get("major") or ""))
+            labels["recruitment_unit"].append(str(item.get("recruitment_unit") or ""))
+            labels["selection_category"].append(str(item.get("selection_category") or ""))
+            labels["source_page"].append(str(item.get("source_page") or ""))
+
+    weights = np.array(rows, dtype=np.float32).reshape(-1, len(SUBJECTS))
+    return weights, {k: np.array(v, dtype=str) for k, v in labels.items()}, skipped, incomplete
+
+
+def save_weight_matrix(path, weights, labels):
+    """가중치 행렬과 학과 정보를 .npz 파일로 저장합니다."""
+    np.savez_compressed(path, weights=weights, subjects=np.array(SUBJECTS, dtype=str), **labels)
+
+
+class ScoreSimulator:
+    """미리 만들어 둔 가중치 행렬로 모든 학과의 환산 점수를 한 번의 행렬 연산으로 계산합니다."""
+
+    def __init__(self, path=SCORE_MATRIX_FILE):
+        with np.load(path) as data:
+            self.weights = data["weights"]
+            self.subjects = [str(s) for s in data["subjects"]]
+            self.labels = {k: data[k] for k in ("university", "major", "recruitment_unit", "selection_category", "source_page")}
+        self.required = self.weights > 0
+
+    def __len__(self):
+        return self.weights.shape[0]
+
+    def simulate(self, student_scores, top_k=20):
+        """student_scores({과목: 점수})로 모든 학과의 환산 점수를 계산해 높은 순으로 반환합니다.
+
+        학생이 입력하지 않은 과목을 반영하는 학과는 결과에서 제외합니다.
+        """
+        scores = np.array([student_scores.get(s, np.nan) for s in self.subjects], dtype=np.float32)
+        missing = np.isnan(scores)
+        converted = self.weights @ np.nan_to_num(scores)
+        converted[(self.required & missing).any(axis=1)] = np.nan
+
+        valid = np.flatnonzero(~np.isnan(converted))
+        if top_k and top_k < valid.size:
+            top = valid[np.argpartition(-converted[valid], top_k - 1)[:top_k]]
+        else:
+            top = valid
+        order = top[np.argsort(-converted[top], kind="stable")]
+
+        return [
+            {
+                "university": str(self.labels["university"][i]),
+                "major": str(self.labels["major"][i]),
+                "recruitment_unit": str(self.labels["recruitment_unit"][i]),
+                "selection_category": str(self.labels["selection_category"][i]),
+                "source_page": str(self.labels["source_page"][i]),
+                "score": round(float(converted[i]), 2),
+                "weights": {s: round(float(w) * 100, 1) for s, w in zip(self.subjects, self.weights[i]) if w > 0},
+            }
+            for i in order
+        ]
+
+
+_simulator = None
+
+def load_simulator(path=SCORE_MATRIX_FILE):
+    """가중치 행렬 파일을 한 번만 읽어 재사용합니다. 파일이 없으면 None을 반환합니다."""
+    global _simulator
+    if _simulator is None:
+        if not os.path.exists(path):
+            return None
+        _simulator = ScoreSimulator(path)
+    return _simulator
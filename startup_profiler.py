@@ -0,0 +1,139 @@
+# startup_profiler.py
+"""
+Cloud Function과 Streamlit 앱의 콜드 스타트 시간을 측정합니다.
+
+진입점마다 새 파이썬 프로세스를 띄워 `python -X importtime`으로 모듈 import 시간을 모으고,
+초기화 함수(Firebase 앱 초기화, AI 리소스 로딩 등)에 걸린 시간을 따로 잽니다.
+
+사용 예:
+    python startup_profiler.py --runs 5 --output startup_new.json --compare startup_old.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from benchmark import git_commit  # 결과 파일에 같은 방식으로 커밋을 남깁니다.
+
+# --- 설정 ---
+# name: (작업 디렉토리, import할 모듈, import 후 실행할 초기화 코드)
+# - functions: 인스턴스 기동(모듈 import) + Firebase 앱 초기화
+# - functions_first_event: 첫 PDF 이벤트에서 불러오는 라이브러리(Storage/Firestore 클라이언트, PyMuPDF)까지 포함
+# - app: 첫 화면 렌더링 전에 필요한 import + 첫 질문 때의 DB 연결(load_ai_resources)
+ENTRY_POINTS = {
+    "functions": ("functions", "main", "main._ensure_app()"),
+    "functions_first_event": ("functions", "main", "main._ensure_app(); from firebase_admin import storage, firestore; import fitz"),
+    "app": (".", "chatbot_engine", "chatbot_engine.load_ai_resources()"),
+}
+TOP_N = 10
+DEFAULT_OUTPUT = 'startup_profile.json'
+# ------------------------------------
+
+PROBE = """
+import time, json
+t0 = time.perf_counter()
+import {module}
+t1 = time.perf_counter()
+try:
+    {init}
+    init_error = None
+except Exception as e:
+    init_error = repr(e)
+t2 = time.perf_counter()
+print("STARTUP_PROFILE " + json.dumps({{"import_s": t1 - t0, "init_s": t2 - t1, "init_error": init_error}}))
+"""
+
+
+def parse_importtime(stderr, entry_module):
+    """-X importtime 출력에서 진입 모듈과 그 모듈이 직접 import한 모듈들의 누적 시간(초)을 뽑아냅니다."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # 이름 앞 공백은 1칸 + 깊이*2칸입니다. (0: 최상위, 1: 최상위 모듈이 import한 모듈)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 0 and name.strip() == entry_module or depth == 1:
+            modules[name.strip()] = int(cumulative_us) / 1e6
+    return modules
+
+
+def profile_once(name):
+    cwd, module, init = ENTRY_POINTS[name]
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "startup-profiler")
+    env.setdefault("EDAERO_MODEL_BACKEND", "offline")
+    # 배포 환경에서 자동으로 채워지는 프로젝트/버킷 설정 (on_object_finalized 데코레이터가 버킷 이름을 요구합니다)
+    env.setdefault("FIREBASE_CONFIG", json.dumps({"projectId": "demo-edaero-insight", "storageBucket": "demo-edaero-insight.appspot.com"}))
+    env.setdefault("GOOGLE_CLOUD_PROJECT", "demo-edaero-insight")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, init=init)],
+        cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), cwd),
+        env=env, capture_output=True, text=True,
+    )
+    marker = [l for l in result.stdout.splitlines() if l.startswith("STARTUP_PROFILE ")]
+    if not marker:
+        raise RuntimeError(f"'{name}' 진입점 측정 실패:\n{result.stderr[-2000:]}")
+    timings = json.loads(marker[0][len("STARTUP_PROFILE "):])
+    timings["modules"] = parse_importtime(result.stderr, module)
+    return timings
+
+
+def profile(name, runs):
+    samples = [profile_once(name) for _ in range(runs)]
+    modules = {}
+    for sample in samples:
+        for module, seconds in sample["modules"].items():
+            modules.setdefault(module, []).append(seconds)
+    top = sorted(((m, statistics.median(v)) for m, v in modules.items()), key=lambda kv: -kv[1])[:TOP_N]
+    import_s = statistics.median(s["import_s"] for s in samples)
+    init_s = statistics.median(s["init_s"] for s in samples)
+    return {
+        "runs": runs,
+        "import_ms": round(import_s * 1000, 1),
+        "init_ms": round(init_s * 1000, 1),
+        "total_ms": round((import_s + init_s) * 1000, 1),
+        "init_error": samples[-1]["init_error"],
+        "top_imports_ms": {m: round(s * 1000, 1) for m, s in top},
+    }
+
+
+def print_report(result, baseline=None):
+    print(f"\n--- 콜드 스타트 프로파일 (commit {result['commit']}) ---")
+    for name, stats in result["entry_points"].items():
+        line = f"[{name}] import {stats['import_ms']:.1f}ms + init {stats['init_ms']:.1f}ms = {stats['total_ms']:.1f}ms"
+        before = (baseline or {}).get("entry_points", {}).get(name)
+        if before:
+            line += f"   (이전 {before['total_ms']:.1f}ms, {stats['total_ms'] - before['total_ms']:+.1f}ms)"
+        print(line)
+        if stats["init_error"]:
+            print(f"    ❗️ 초기화 중 오류: {stats['init_error']}")
+        for module, ms in stats["top_imports_ms"].items():
+            print(f"    {ms:>9.1f}ms  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="edaeroAI 콜드 스타트 프로파일러")
+    parser.add_argument("--entry", nargs="+", choices=list(ENTRY_POINTS), default=list(ENTRY_POINTS), help="측정할 진입점")
+    parser.add_argument("--runs", type=int, default=3, help="진입점별 반복 측정 횟수 (중앙값 사용)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="결과 JSON 파일 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    result = {
+        "commit": git_commit(),
+        "entry_points": {name: profile(name, args.runs) for name in args.entry},
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    print(f"\n✨ 결과가 '{args.output}' 파일로 저장되었습니다.")
+
+if __name__ == "__main__":
+    main()